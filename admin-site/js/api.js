@@ -72,6 +72,11 @@ const CustomerAPI = {
         return await apiRequest(API.CUSTOMER(id));
     },
 
+    search: async (q, limit = 10) => {
+        const queryString = new URLSearchParams({ q, limit }).toString();
+        return await apiRequest(`${API.CUSTOMER_SEARCH}?${queryString}`);
+    },
+
     create: async (customerData) => {
         return await apiRequest(API.CUSTOMERS, {
             method: 'POST',
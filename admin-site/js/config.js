@@ -8,6 +8,7 @@ const API = {
     STATS: `${API_BASE_URL}/api/admin/stats`,
     CHANGE_PASSWORD: `${API_BASE_URL}/api/admin/change-password`,
     CUSTOMERS: `${API_BASE_URL}/api/customers`,
+    CUSTOMER_SEARCH: `${API_BASE_URL}/api/customers/search`,
     CUSTOMER: (id) => `${API_BASE_URL}/api/customers/${id}`,
     SET_CUSTOMER_PASSWORD: (id) => `${API_BASE_URL}/api/customers/${id}/set-password`,
     CALLS: `${API_BASE_URL}/api/calls`,
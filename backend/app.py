@@ -14,6 +14,10 @@ migrate = Migrate()
 def create_app():
     app = Flask(__name__)
 
+    # orjson-backed JSON (stdlib fallback); datetimes encode as ISO 8601
+    from services.json_provider import APIJSONProvider
+    app.json = APIJSONProvider(app)
+
     # Load configuration
     app.config.from_object('config.Config')
 
@@ -38,7 +42,16 @@ def create_app():
 
     # Import models (needed for migrations) - must be after db.init_app
     with app.app_context():
-        from models import Admin, Customer, Call, CallLog
+        from models import Admin, Customer, Call, CallLog, CustomerAudio, Job, CallDailyStats
+
+        # Warm the DID -> customer routing table so the first call doesn't pay for it
+        from services.call_routing import get_call_router
+        try:
+            get_call_router().warm()
+        except Exception as e:
+            # Tables may not exist yet (e.g. first run of init_db.py)
+            db.session.rollback()
+            print(f"Routing table not warmed: {e}")
 
     # Register blueprints
     from routes.admin import admin_bp
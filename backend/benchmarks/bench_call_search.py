@@ -0,0 +1,123 @@
+"""
+Benchmark: portal call search latency for a customer with 100k+ calls
+
+Seeds a scratch database with one large customer (plus a few others),
+indexes it with rebuild_search_index(), then times search_calls() - the
+query behind /api/portal/calls/search - for common, rare and multi-word
+searches, first page and the page after it. Target: p95 well under 100 ms.
+
+    cd backend
+    python benchmarks/bench_call_search.py [--calls 100000] [-n 50]
+    DATABASE_URL=postgresql://localhost/deskringer_bench python benchmarks/bench_call_search.py
+
+Without DATABASE_URL a throwaway SQLite file is used (FTS5). Don't point it
+at a real database - it creates and fills tables.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if not os.environ.get('DATABASE_URL'):
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_call_search.db')}"
+
+from app import create_app
+from models import db, Call, Customer
+from services.call_search import rebuild_search_index, search_calls
+
+BATCH = 5000
+
+TOPICS = [
+    ("Caller asked whether you deliver on Saturday mornings", "do you do deliveries on Saturday?"),
+    ("Caller wants to reschedule a cleaning to next week", "I need to move my cleaning appointment"),
+    ("Billing question about a double charge", "I think I was charged twice last month"),
+    ("New patient asking about insurance", "do you take Delta Dental insurance?"),
+    ("Caller reported a leak under the kitchen sink", "there's water all over the kitchen floor"),
+    ("Asked for directions and parking", "where do I park when I get there?"),
+]
+FILLER = "AI: Thanks for calling, let me get a few details.\nCaller: sure, my number is the one I'm calling from.\n"
+
+SEARCHES = [
+    ("common word", "appointment"),
+    ("two words", "saturday delivery"),
+    ("rare word", "delta"),
+    ("phrase", '"kitchen floor"'),
+    ("no match", "zeppelin"),
+]
+
+
+def seed(calls):
+    db.create_all()
+    if db.session.query(db.func.count(Call.id)).scalar() >= calls:
+        return
+
+    customers = [Customer(business_name=f"Bench Business {i}", email=f"bench{i}@example.com") for i in range(5)]
+    db.session.add_all(customers)
+    db.session.flush()
+
+    now = datetime.utcnow()
+    rng = random.Random(7)
+    for start in range(0, calls, BATCH):
+        rows = []
+        for _ in range(min(BATCH, calls - start)):
+            summary, line = rng.choice(TOPICS)
+            rows.append({
+                # The first customer gets almost everything
+                'customer_id': customers[0].id if rng.random() < 0.95 else rng.choice(customers).id,
+                'caller_phone': f"+1555{rng.randrange(10 ** 7):07d}",
+                'caller_name': rng.choice(["Pat Lee", "Sam Ortiz", "Alex Kim", None]),
+                'status': 'completed',
+                'summary': summary,
+                'transcript': f"Caller: {line}\n" + FILLER * rng.randrange(2, 12),
+                'archived': rng.random() < 0.1,
+                'handled': rng.random() < 0.5,
+                'created_at': now - timedelta(seconds=rng.randrange(365 * 86400)),
+                'ended_at': now
+            })
+        db.session.execute(Call.__table__.insert(), rows)
+        db.session.commit()
+
+    started = time.perf_counter()
+    indexed = rebuild_search_index()
+    print(f"Seeded {calls:,} calls, indexed {indexed:,} in {time.perf_counter() - started:.1f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=100000)
+    parser.add_argument('--page', type=int, default=20)
+    parser.add_argument('-n', '--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        seed(args.calls)
+        customer_id = Customer.query.order_by(Customer.id).first().id
+        fields = Call.LIST_FIELDS
+        print(f"{db.engine.dialect.name}, {args.page}-row pages, {args.iterations} runs")
+        print(f"{'search':<14} {'page':>4} {'p50':>9} {'p95':>9}  matches on page")
+
+        for label, q in SEARCHES:
+            cursor = None
+            for page in (1, 2):
+                timings = []
+                for _ in range(args.iterations):
+                    started = time.perf_counter()
+                    rows, next_cursor = search_calls(customer_id, q, fields, cursor=cursor, limit=args.page)
+                    timings.append((time.perf_counter() - started) * 1000)
+                    db.session.rollback()
+
+                p95 = statistics.quantiles(timings, n=20)[-1]
+                print(f"{label:<14} {page:>4} {statistics.median(timings):>6.2f} ms {p95:>6.2f} ms  {len(rows)}")
+                cursor = next_cursor
+                if not cursor:
+                    break
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark: per-metric stats queries vs services.call_stats (daily rollup)
+
+Seeds a scratch database with a large calls table and builds the
+call_daily_stats rollup, then times the old /api/calls/stats query pattern
+(seven separate COUNT/AVG/SUM scans of calls) against call_stats(), for one
+customer and for all customers.
+
+    cd backend
+    python benchmarks/bench_call_stats.py [--calls 2000000] [--customers 500] [-n 5]
+    DATABASE_URL=postgresql://localhost/deskringer_bench python benchmarks/bench_call_stats.py
+
+Without DATABASE_URL a throwaway SQLite file is used. Don't point it at a
+real database - it creates and fills tables.
+
+Defaults on SQLite (medians of 5):
+
+    one customer   per-metric   4.3 ms   rollup   2.7 ms    1.6x
+    all customers  per-metric  2298 ms   rollup    71 ms   32.4x
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if not os.environ.get('DATABASE_URL'):
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_call_stats.db')}"
+
+from app import create_app
+from models import db, Call, Customer
+from services.call_stats import call_stats, rebuild_daily_stats
+
+STATUSES = ['completed'] * 8 + ['failed', 'no-answer']
+BATCH = 10000
+
+
+def seed(customers, calls):
+    """Fill the scratch database (skipped if it already holds enough calls)"""
+    db.create_all()
+    if db.session.query(db.func.count(Call.id)).scalar() >= calls:
+        return
+
+    db.session.execute(Customer.__table__.insert(), [
+        {'business_name': f"Bench Business {i}", 'email': f"bench{i}@example.com"}
+        for i in range(customers)
+    ])
+    customer_ids = [row.id for row in db.session.query(Customer.id)]
+
+    now = datetime.utcnow()
+    rng = random.Random(42)
+    for start in range(0, calls, BATCH):
+        db.session.execute(Call.__table__.insert(), [{
+            'customer_id': rng.choice(customer_ids),
+            'caller_phone': f"+1555{rng.randrange(10 ** 7):07d}",
+            'status': rng.choice(STATUSES),
+            'duration_seconds': rng.randrange(5, 600),
+            'callback_requested': rng.random() < 0.2,
+            'handled': rng.random() < 0.6,
+            'archived': rng.random() < 0.1,
+            'twilio_cost': round(rng.uniform(0.01, 0.5), 4),
+            'openai_cost': round(rng.uniform(0.001, 0.1), 4),
+            'created_at': now - timedelta(seconds=rng.randrange(365 * 86400))
+        } for _ in range(min(BATCH, calls - start))])
+        db.session.commit()
+        print(f"\rSeeded {min(start + BATCH, calls):,} calls", end='', flush=True)
+    print()
+
+    print(f"Built {rebuild_daily_stats():,} daily rollup rows")
+
+
+def per_metric_stats(customer_id, since):
+    """The query pattern /api/calls/stats used before (with the scoping fixed)"""
+    query = Call.query.filter(Call.created_at >= since)
+    scoped = [Call.created_at >= since]
+    if customer_id:
+        query = query.filter_by(customer_id=customer_id)
+        scoped.append(Call.customer_id == customer_id)
+
+    return {
+        'total_calls': query.count(),
+        'completed_calls': query.filter_by(status='completed').count(),
+        'failed_calls': query.filter_by(status='failed').count(),
+        'avg_duration_seconds': db.session.query(db.func.avg(Call.duration_seconds)).filter(*scoped).scalar(),
+        'callback_requests': query.filter_by(callback_requested=True).count(),
+        'twilio_cost': db.session.query(db.func.sum(Call.twilio_cost)).filter(*scoped).scalar(),
+        'openai_cost': db.session.query(db.func.sum(Call.openai_cost)).filter(*scoped).scalar()
+    }
+
+
+def _time(func, iterations):
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=2000000)
+    parser.add_argument('--customers', type=int, default=500)
+    parser.add_argument('-n', '--iterations', type=int, default=5)
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        seed(args.customers, args.calls)
+        customer_id = db.session.query(Call.customer_id).first()[0]
+        since = datetime.utcnow() - timedelta(days=30)
+
+        print(f"{db.engine.dialect.name}, {args.calls:,} calls, median of {args.iterations}")
+        for label, scope in (('one customer', customer_id), ('all customers', None)):
+            before = _time(lambda: per_metric_stats(scope, since), args.iterations)
+            after = _time(lambda: call_stats(customer_id=scope, since=since), args.iterations)
+            print(f"{label:<14} per-metric {before:9.1f} ms   rollup {after:9.1f} ms   {before / after:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Replay benchmark: full call history vs the bounded conversation window
+
+Replays recorded transcripts turn by turn and compares the history tokens
+each turn would send with the old behaviour (the whole call so far) and with
+services.conversation_window (recent turns verbatim + folded memory). No API
+calls are made; tokens are the same ~4 chars/token estimate used for the
+per-turn context budget.
+
+    cd backend
+    python benchmarks/bench_conversation_window.py transcript.txt [...]
+    python benchmarks/bench_conversation_window.py --from-db 20
+    python benchmarks/bench_conversation_window.py --synthetic 60
+
+Transcript files use the portal format ("Caller: ..." / "AI: ..." lines).
+--from-db replays the longest recorded calls (needs DATABASE_URL);
+--synthetic builds a call of N exchanges when no recordings are at hand.
+The folded memory is the caller's own words only - the rolling summary is
+left out, so the savings shown are a lower bound on what's kept in memory.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.conversation_window import window_history
+from services.prompt_context import estimate_tokens
+
+
+def parse_transcript(text):
+    """Chat messages from a "Caller: ... / AI: ..." transcript"""
+    messages = []
+    for line in text.splitlines():
+        label, _, message = line.partition(': ')
+        if label == 'Caller':
+            messages.append({"role": "user", "content": message})
+        elif label == 'AI':
+            messages.append({"role": "assistant", "content": message})
+    return messages
+
+
+def synthetic_call(exchanges):
+    """A long made-up call: details given early, small talk and questions after"""
+    messages = [
+        {"role": "user", "content": "Hi, this is Dana Whitfield, I'd like to book a furnace inspection."},
+        {"role": "assistant", "content": "Happy to help, Dana. What's the best number to reach you?"},
+        {"role": "user", "content": "You can call me back on 555-0142, that's my cell."},
+        {"role": "assistant", "content": "Got it, 555-0142. When would you like the inspection?"},
+        {"role": "user", "content": "Next Tuesday afternoon, ideally around 3pm."},
+        {"role": "assistant", "content": "Tuesday around 3pm, noted. Anything else I should know?"},
+    ]
+    for i in range(max(exchanges - 3, 0)):
+        messages.append({"role": "user", "content": (
+            f"One more question, number {i + 1}: does the inspection cover the ductwork and the "
+            f"thermostat as well, and is there anything I need to do to prepare the house beforehand?"
+        )})
+        messages.append({"role": "assistant", "content": (
+            "Yes, the technician checks the ductwork and thermostat during the visit. Just make sure "
+            "the furnace area is clear and someone over 18 is home. Anything else I can help with?"
+        )})
+    return messages
+
+
+def load_recorded_calls(limit):
+    """Chat histories of the longest recorded calls"""
+    from app import create_app
+    from models import db, CallLog
+
+    with create_app().app_context():
+        longest = db.session.query(CallLog.call_id).group_by(CallLog.call_id).order_by(
+            db.func.count(CallLog.id).desc()
+        ).limit(limit).all()
+
+        calls = []
+        for (call_id,) in longest:
+            rows = db.session.query(CallLog.speaker, CallLog.message).filter_by(
+                call_id=call_id
+            ).order_by(CallLog.created_at, CallLog.id).all()
+            calls.append((f"call {call_id}", [
+                {"role": "user" if speaker == 'caller' else "assistant", "content": message}
+                for speaker, message in rows
+            ]))
+        return calls
+
+
+def _tokens(messages):
+    return sum(estimate_tokens(message['content']) for message in messages)
+
+
+def replay(messages):
+    """Per-turn (full, windowed) history tokens for one call"""
+    turns = []
+    for end in range(0, len(messages), 2):
+        history = messages[:end]
+        turns.append((_tokens(history), _tokens(window_history(history))))
+    return turns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('transcripts', nargs='*', help='Transcript files ("Caller:" / "AI:" lines)')
+    parser.add_argument('--from-db', type=int, metavar='N', help='Replay the N longest recorded calls')
+    parser.add_argument('--synthetic', type=int, metavar='N', help='Replay a made-up call of N exchanges')
+    args = parser.parse_args()
+
+    calls = []
+    for path in args.transcripts:
+        with open(path) as f:
+            calls.append((os.path.basename(path), parse_transcript(f.read())))
+    if args.from_db:
+        calls.extend(load_recorded_calls(args.from_db))
+    if args.synthetic or not calls:
+        calls.append(("synthetic", synthetic_call(args.synthetic or 60)))
+
+    print(f"{'call':<24} {'turns':>5} {'full total':>11} {'window total':>13} {'saved':>7} "
+          f"{'last turn full':>15} {'last turn window':>17}")
+
+    all_full = all_window = 0
+    for name, messages in calls:
+        turns = replay(messages)
+        if not turns:
+            continue
+        full = sum(f for f, _ in turns)
+        window = sum(w for _, w in turns)
+        all_full += full
+        all_window += window
+        saved = 100 * (full - window) / full if full else 0.0
+        print(f"{name[:24]:<24} {len(turns):>5} {full:>11} {window:>13} {saved:>6.1f}% "
+              f"{turns[-1][0]:>15} {turns[-1][1]:>17}")
+
+    if all_full:
+        print(f"\nHistory tokens saved overall: {100 * (all_full - all_window) / all_full:.1f}%")
+
+
+if __name__ == '__main__':
+    main()
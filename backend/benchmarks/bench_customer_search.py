@@ -0,0 +1,112 @@
+"""
+Benchmark: admin customer typeahead latency, per keystroke
+
+Seeds a scratch database with customers, then replays typing a handful of
+searches one keystroke at a time (business names, contact names, emails,
+phone digits, typos) through search_customers() - the query behind
+/api/customers/search - and reports p50/p95 over every keystroke.
+Target: p95 under 20 ms.
+
+    cd backend
+    python benchmarks/bench_customer_search.py [--customers 5000] [-n 20]
+    DATABASE_URL=postgresql://localhost/deskringer_bench python benchmarks/bench_customer_search.py
+
+Without DATABASE_URL a throwaway SQLite file is used (prefix trie). Don't
+point it at a real database - it creates and fills tables.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if not os.environ.get('DATABASE_URL'):
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_customer_search.db')}"
+
+from app import create_app
+from models import db, Customer
+from services.customer_search import customer_search_text, get_customer_search_index, search_customers
+
+BATCH = 2000
+
+FIRST = ["Maria", "James", "Aisha", "Chen", "José", "Priya", "Liam", "Fatima", "Noah", "Sofia"]
+LAST = ["Smith", "Garcia", "Nguyen", "Patel", "Kowalski", "O'Brien", "Müller", "Johnson", "Kim", "Rossi"]
+KINDS = ["Dental", "Salon", "Plumbing", "Auto Repair", "Fitness", "Bakery", "Law Office", "Veterinary", "Spa", "HVAC"]
+PLACES = ["Maple", "Riverside", "Downtown", "Oak Hill", "Lakeview", "Sunset", "Harbor", "Pine Ridge", "Summit", "Elm Street"]
+
+TYPED = ["riverside dental", "garcia", "maria.kim", "555 0142", "plumbng", "oak hill spa", "kowalsky"]
+
+
+def seed(customers):
+    db.create_all()
+    if db.session.query(db.func.count(Customer.id)).scalar() >= customers:
+        return
+
+    rng = random.Random(7)
+    for start in range(0, customers, BATCH):
+        rows = []
+        for i in range(start, min(start + BATCH, customers)):
+            first, last = rng.choice(FIRST), rng.choice(LAST)
+            customer = Customer(
+                business_name=f"{rng.choice(PLACES)} {rng.choice(KINDS)} {i}",
+                contact_name=f"{first} {last}",
+                email=f"{first}.{last}{i}@example.com".lower().replace("'", ""),
+                phone=f"+1 (555) {rng.randrange(1000):03d}-{rng.randrange(10000):04d}",
+                deskringer_number=f"+1908{i:07d}"
+            )
+            rows.append({
+                'business_name': customer.business_name,
+                'contact_name': customer.contact_name,
+                'email': customer.email,
+                'phone': customer.phone,
+                'deskringer_number': customer.deskringer_number,
+                'search_text': customer_search_text(customer)
+            })
+        db.session.execute(Customer.__table__.insert(), rows)
+        db.session.commit()
+    print(f"Seeded {customers:,} customers")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--customers', type=int, default=5000)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('-n', '--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        seed(args.customers)
+
+        started = time.perf_counter()
+        if db.engine.dialect.name != 'postgresql':
+            get_customer_search_index().warm()
+            print(f"Trie built in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+        print(f"{db.engine.dialect.name}, {args.iterations} runs per keystroke")
+        print(f"{'typed':<18} {'p50':>9} {'p95':>9}  results for the full text")
+
+        everything = []
+        for typed in TYPED:
+            timings = []
+            for end in range(1, len(typed) + 1):
+                for _ in range(args.iterations):
+                    started = time.perf_counter()
+                    results = search_customers(typed[:end], args.limit)
+                    timings.append((time.perf_counter() - started) * 1000)
+                    db.session.rollback()
+
+            everything.extend(timings)
+            p95 = statistics.quantiles(timings, n=20)[-1]
+            top = results[0]['business_name'] if results else '-'
+            print(f"{typed:<18} {statistics.median(timings):>6.2f} ms {p95:>6.2f} ms  {len(results)} (top: {top})")
+
+        p95 = statistics.quantiles(everything, n=20)[-1]
+        print(f"{'all keystrokes':<18} {statistics.median(everything):>6.2f} ms {p95:>6.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
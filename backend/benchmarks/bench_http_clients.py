@@ -0,0 +1,76 @@
+"""
+Microbenchmark: per-request OpenAI client vs the shared pooled client
+
+Times the OpenAI round trip the gather path makes on every turn, once with
+a brand-new client per call (the old AIService.__init__ behaviour - new
+TCP + TLS handshake every time) and once with services.http_clients'
+shared keep-alive client.
+
+    cd backend
+    OPENAI_API_KEY=... python benchmarks/bench_http_clients.py [-n 20] [--chat]
+
+By default each iteration is a models.list() call (free, same TLS path);
+--chat sends a 1-token chat completion instead, closer to the real turn.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai import OpenAI
+from services.http_clients import get_openai_client
+
+
+def _call(client, chat):
+    if chat:
+        client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": "Say OK"}],
+            max_tokens=1
+        )
+    else:
+        client.models.list()
+
+
+def _time(make_client, iterations, chat):
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        client = make_client()
+        _call(client, chat)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def _report(label, timings):
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"{label:<22} median {statistics.median(timings):7.1f} ms   p95 {p95:7.1f} ms")
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--iterations', type=int, default=20)
+    parser.add_argument('--chat', action='store_true', help='Time a 1-token chat completion instead of models.list()')
+    args = parser.parse_args()
+
+    if not os.environ.get('OPENAI_API_KEY'):
+        sys.exit("OPENAI_API_KEY is not set")
+
+    # Warm up DNS and the shared pool so neither side pays one-off costs
+    _call(get_openai_client(), args.chat)
+
+    per_request = _time(lambda: OpenAI(api_key=os.environ.get('OPENAI_API_KEY')), args.iterations, args.chat)
+    shared = _time(get_openai_client, args.iterations, args.chat)
+
+    fresh_median = _report("new client per call", per_request)
+    shared_median = _report("shared pooled client", shared)
+    print(f"saved per call         {fresh_median - shared_median:7.1f} ms (median)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+Benchmark: call list responses - ORM rows + stdlib json vs Row tuples + orjson
+
+Seeds a scratch database, then times 50-, 500- and 5000-row responses from
+/api/calls (admin view) and /api/portal/calls through the Flask test client,
+once with Flask's default JSON provider and once with APIJSONProvider
+(services/json_provider.py). A second table isolates serialization: the old
+path (ORM objects, project(), stdlib json) against the new one (column query,
+project_rows(), orjson).
+
+    cd backend
+    python benchmarks/bench_json_responses.py [--calls 6000] [-n 10]
+    DATABASE_URL=postgresql://localhost/deskringer_bench python benchmarks/bench_json_responses.py
+
+Without DATABASE_URL a throwaway SQLite file is used. Don't point it at a
+real database - it creates and fills tables. Page sizes above 100 need
+PAGE_SIZE_MAX raised, which this script does for its own process.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if not os.environ.get('DATABASE_URL'):
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_json_responses.db')}"
+os.environ['PAGE_SIZE_MAX'] = '5000'
+
+from flask.json.provider import DefaultJSONProvider
+from flask_jwt_extended import create_access_token
+from app import create_app
+from models import db, Admin, Call, Customer
+from services.call_stats import rebuild_daily_stats
+from services.fields import load_fields, project, project_rows, select_fields
+from services.json_provider import APIJSONProvider, orjson
+
+SIZES = (50, 500, 5000)
+BATCH = 5000
+
+
+def seed(calls):
+    db.create_all()
+    if db.session.query(db.func.count(Call.id)).scalar() >= calls:
+        return
+
+    admin = Admin(email="bench-admin@example.com", name="Bench")
+    admin.set_password("bench")
+    db.session.add(admin)
+
+    customers = [Customer(business_name=f"Bench Business {i}", email=f"bench{i}@example.com") for i in range(20)]
+    db.session.add_all(customers)
+    db.session.flush()
+
+    now = datetime.utcnow()
+    rng = random.Random(7)
+    for start in range(0, calls, BATCH):
+        db.session.execute(Call.__table__.insert(), [{
+            # Most calls on the first customer so the portal list has 5000 rows
+            'customer_id': customers[0].id if rng.random() < 0.9 else rng.choice(customers).id,
+            'caller_phone': f"+1555{rng.randrange(10 ** 7):07d}",
+            'caller_name': "Pat Caller",
+            'status': 'completed',
+            'duration_seconds': rng.randrange(30, 600),
+            'summary': "Caller wants a Saturday morning cleaning; call back to confirm.",
+            'callback_requested': True,
+            'callback_number': "+15551234567",
+            'archived': False,
+            'handled': rng.random() < 0.5,
+            'created_at': now - timedelta(seconds=rng.randrange(90 * 86400)),
+            'ended_at': now
+        } for _ in range(min(BATCH, calls - start))])
+        db.session.commit()
+    rebuild_daily_stats()
+    print(f"Seeded {calls:,} calls")
+
+
+def _median_ms(run, iterations):
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def bench_endpoints(app, tokens, iterations):
+    client = app.test_client()
+    endpoints = [
+        ("/api/calls", "/api/calls?admin_view=true&per_page={n}", 'admin'),
+        ("/api/portal/calls", "/api/portal/calls?limit={n}", 'customer'),
+    ]
+    providers = [("stdlib", DefaultJSONProvider(app))]
+    if orjson is not None:
+        providers.append(("orjson", APIJSONProvider(app)))
+    else:
+        print("orjson not installed - APIJSONProvider would use stdlib json")
+
+    print(f"\n{'endpoint':<20} {'rows':>5}" + "".join(f" {name:>10}" for name, _ in providers))
+    for label, url, role in endpoints:
+        headers = {'Authorization': f"Bearer {tokens[role]}"}
+        for size in SIZES:
+            timings = []
+            for _, provider in providers:
+                app.json = provider
+
+                def run():
+                    response = client.get(url.format(n=size), headers=headers)
+                    assert response.status_code == 200, response.get_data(as_text=True)[:200]
+
+                run()  # Warm up
+                timings.append(_median_ms(run, iterations))
+            print(f"{label:<20} {size:>5}" + "".join(f" {ms:>7.2f} ms" for ms in timings))
+
+
+def bench_serialization(customer_id, iterations):
+    fields = Call.LIST_FIELDS
+    dumps = orjson.dumps if orjson is not None else lambda rows: json.dumps(rows, default=str)
+
+    def old_path(size):
+        db.session.expunge_all()
+        calls = Call.query.filter_by(customer_id=customer_id, archived=False).options(
+            load_fields(Call, fields)
+        ).order_by(Call.created_at.desc(), Call.id.desc()).limit(size).all()
+        return json.dumps([project(call, fields) for call in calls])
+
+    def new_path(size):
+        rows = db.session.query(*select_fields(Call, fields)).filter(
+            Call.customer_id == customer_id, Call.archived == False
+        ).order_by(Call.created_at.desc(), Call.id.desc()).limit(size).all()
+        return dumps(project_rows(rows, fields))
+
+    print(f"\n{'query + serialize':<20} {'rows':>5} {'ORM+json':>10} {'Row+orjson':>10}")
+    for size in SIZES:
+        old_ms = _median_ms(lambda: old_path(size), iterations)
+        new_ms = _median_ms(lambda: new_path(size), iterations)
+        print(f"{'portal call list':<20} {size:>5} {old_ms:>7.2f} ms {new_ms:>7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=6000)
+    parser.add_argument('-n', '--iterations', type=int, default=10)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        seed(args.calls)
+        admin = Admin.query.first()
+        customer_id = Customer.query.order_by(Customer.id).first().id
+        tokens = {
+            'admin': create_access_token(identity=str(admin.id)),
+            'customer': create_access_token(identity=str(customer_id), additional_claims={'type': 'customer'})
+        }
+        print(f"{db.engine.dialect.name}, median of {args.iterations}")
+
+        bench_serialization(customer_id, args.iterations)
+
+    bench_endpoints(app, tokens, args.iterations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark: full to_dict() rows vs list projections
+
+Seeds a scratch database with calls carrying realistic transcripts and
+customers with long AI configuration, then compares a 50-row page of the
+portal call list and the admin customer list serialized the old way (every
+column loaded, full to_dict()) and with the list projection (load_only on
+LIST_FIELDS, see services/fields.py): query + serialization time and JSON
+payload size.
+
+    cd backend
+    python benchmarks/bench_list_payloads.py [--calls 20000] [--page 50] [-n 20]
+    DATABASE_URL=postgresql://localhost/deskringer_bench python benchmarks/bench_list_payloads.py
+
+Without DATABASE_URL a throwaway SQLite file is used. Don't point it at a
+real database - it creates and fills tables.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if not os.environ.get('DATABASE_URL'):
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_list_payloads.db')}"
+
+from app import create_app
+from models import db, Call, Customer
+from services.fields import load_fields, project
+
+BATCH = 5000
+
+TURN = (
+    "Caller: Hi, I wanted to ask whether you have anything open on Saturday morning for a cleaning.\n"
+    "AI: We do have a few Saturday openings. Can I get your name and a good number to reach you?\n\n"
+)
+
+
+def seed(customers, calls):
+    db.create_all()
+    if db.session.query(db.func.count(Call.id)).scalar() >= calls:
+        return
+
+    faqs = [{'question': f"Question {i}?", 'answer': "A detailed answer. " * 20} for i in range(30)]
+    db.session.execute(Customer.__table__.insert(), [{
+        'business_name': f"Bench Business {i}",
+        'email': f"bench{i}@example.com",
+        'faqs': faqs,
+        'pricing_info': "Standard visit $120, deep clean $240. " * 20,
+        'services_offered': "Cleanings, whitening, fillings, crowns. " * 20,
+        'ai_instructions': "Be friendly and collect the caller's details. " * 100
+    } for i in range(customers)])
+    customer_ids = [row.id for row in db.session.query(Customer.id)]
+
+    now = datetime.utcnow()
+    rng = random.Random(7)
+    for start in range(0, calls, BATCH):
+        db.session.execute(Call.__table__.insert(), [{
+            'customer_id': rng.choice(customer_ids),
+            'caller_phone': f"+1555{rng.randrange(10 ** 7):07d}",
+            'status': 'completed',
+            'duration_seconds': rng.randrange(30, 600),
+            'summary': "Caller wants a Saturday morning cleaning; call back to confirm.",
+            'transcript': TURN * rng.randrange(4, 30),
+            'archived': False,
+            'handled': rng.random() < 0.5,
+            'created_at': now - timedelta(seconds=rng.randrange(90 * 86400))
+        } for _ in range(min(BATCH, calls - start))])
+        db.session.commit()
+    print(f"Seeded {calls:,} calls, {customers} customers")
+
+
+def _measure(build, iterations):
+    timings = []
+    for _ in range(iterations):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        payload = json.dumps(build(), default=str)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), len(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=20000)
+    parser.add_argument('--customers', type=int, default=200)
+    parser.add_argument('--page', type=int, default=50)
+    parser.add_argument('-n', '--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        seed(args.customers, args.calls)
+        customer_id = db.session.query(Call.customer_id).first()[0]
+
+        def calls_query():
+            return Call.query.filter_by(customer_id=customer_id, archived=False).order_by(
+                Call.created_at.desc(), Call.id.desc()
+            ).limit(args.page)
+
+        def customers_query():
+            return Customer.query.order_by(Customer.created_at.desc()).limit(args.page)
+
+        cases = [
+            ("portal calls, to_dict", lambda: [c.to_dict() for c in calls_query()]),
+            ("portal calls, projection", lambda: [
+                project(c, Call.LIST_FIELDS)
+                for c in calls_query().options(load_fields(Call, Call.LIST_FIELDS))
+            ]),
+            ("admin customers, to_dict", lambda: [c.to_dict() for c in customers_query()]),
+            ("admin customers, projection", lambda: [
+                project(c, Customer.LIST_FIELDS)
+                for c in customers_query().options(load_fields(Customer, Customer.LIST_FIELDS))
+            ]),
+        ]
+
+        print(f"{db.engine.dialect.name}, {args.page}-row pages, median of {args.iterations}")
+        for label, build in cases:
+            elapsed, size = _measure(build, args.iterations)
+            print(f"{label:<28} {elapsed:8.2f} ms   {size / 1024:9.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -29,6 +29,15 @@ class Config:
     # OpenAI Config
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 
+    # Public wss:// URL of stream_server.py (required for customers with call_mode='stream')
+    MEDIA_STREAM_URL = os.environ.get('MEDIA_STREAM_URL')
+
+    # Play the first sentence of each AI reply while the rest is still generating
+    GATHER_SENTENCE_STREAMING = os.environ.get('GATHER_SENTENCE_STREAMING', 'true').lower() == 'true'
+
+    # Stream TTS audio to Twilio as it is synthesized (instead of buffering the whole MP3)
+    TTS_STREAMING = os.environ.get('TTS_STREAMING', 'true').lower() == 'true'
+
     # Email Config (for notifications)
     SENDGRID_API_KEY = os.environ.get('SENDGRID_API_KEY')
     FROM_EMAIL = os.environ.get('FROM_EMAIL', 'notifications@deskringer.com')
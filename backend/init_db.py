@@ -41,11 +41,87 @@ def create_admin_user(email, password, name):
         return True
 
 
+def render_all_prompts():
+    """Pre-render greeting/transfer audio for every customer"""
+    from models import Customer
+    from services.customer_audio import render_customer_prompts
+
+    app = create_app()
+
+    with app.app_context():
+        for customer in Customer.query.all():
+            try:
+                rendered = render_customer_prompts(customer)
+                print(f"✓ {customer.business_name}: {rendered} prompt(s) rendered")
+            except Exception as e:
+                db.session.rollback()
+                print(f"✗ {customer.business_name}: {e}")
+
+
+def compile_all_prompts():
+    """Recompile every customer's stored system prompt (run after changing services/system_prompt.py)"""
+    from models import Customer
+
+    app = create_app()
+
+    with app.app_context():
+        changed = 0
+        for customer in Customer.query.all():
+            old_version = customer.system_prompt_version
+            if customer.compile_system_prompt() != old_version:
+                changed += 1
+        db.session.commit()
+        print(f"✓ Recompiled system prompts ({changed} changed)")
+
+
+def rebuild_call_stats(customer_id=None):
+    """Recompute the daily call stats rollup from the calls table"""
+    from services.call_stats import rebuild_daily_stats
+
+    app = create_app()
+
+    with app.app_context():
+        rows = rebuild_daily_stats(customer_id)
+        scope = f"customer {customer_id}" if customer_id is not None else "all customers"
+        print(f"✓ Rebuilt daily call stats for {scope} ({rows} rows)")
+
+
+def rebuild_call_search(customer_id=None):
+    """(Re)index ended calls for portal search"""
+    from services.call_search import rebuild_search_index
+
+    app = create_app()
+
+    with app.app_context():
+        count = rebuild_search_index(customer_id)
+        scope = f"customer {customer_id}" if customer_id is not None else "all customers"
+        print(f"✓ Rebuilt call search index for {scope} ({count} calls)")
+
+
+def rebuild_customer_search():
+    """Recompute every customer's search_text (admin typeahead)"""
+    from models import Customer
+
+    app = create_app()
+
+    with app.app_context():
+        customers = Customer.query.all()
+        for customer in customers:
+            customer.update_search_text()
+        db.session.commit()
+        print(f"✓ Rebuilt customer search text ({len(customers)} customers)")
+
+
 if __name__ == '__main__':
     if len(sys.argv) < 2:
         print("Usage:")
         print("  python init_db.py init              # Initialize database")
         print("  python init_db.py create-admin <email> <password> <name>")
+        print("  python init_db.py render-prompts    # Pre-render greeting audio")
+        print("  python init_db.py compile-prompts   # Recompile AI system prompts")
+        print("  python init_db.py rebuild-call-stats [customer_id]  # Backfill/rebuild daily call stats")
+        print("  python init_db.py rebuild-search-index [customer_id]  # Backfill/rebuild call search")
+        print("  python init_db.py rebuild-customer-search  # Backfill/rebuild admin customer search")
         sys.exit(1)
 
     command = sys.argv[1]
@@ -64,7 +140,22 @@ if __name__ == '__main__':
 
         create_admin_user(email, password, name)
 
+    elif command == 'render-prompts':
+        render_all_prompts()
+
+    elif command == 'compile-prompts':
+        compile_all_prompts()
+
+    elif command == 'rebuild-call-stats':
+        rebuild_call_stats(int(sys.argv[2]) if len(sys.argv) > 2 else None)
+
+    elif command == 'rebuild-search-index':
+        rebuild_call_search(int(sys.argv[2]) if len(sys.argv) > 2 else None)
+
+    elif command == 'rebuild-customer-search':
+        rebuild_customer_search()
+
     else:
         print(f"Unknown command: {command}")
-        print("Available commands: init, create-admin")
+        print("Available commands: init, create-admin, render-prompts, compile-prompts, rebuild-call-stats, rebuild-search-index, rebuild-customer-search")
         sys.exit(1)
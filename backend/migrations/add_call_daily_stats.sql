@@ -0,0 +1,19 @@
+-- Daily call totals per customer, kept up to date as calls change
+-- (see services/call_stats.py). Backfill after creating the table:
+--   python init_db.py rebuild-call-stats
+
+CREATE TABLE IF NOT EXISTS call_daily_stats (
+    customer_id INTEGER NOT NULL REFERENCES customers(id),
+    day DATE NOT NULL,
+    archived BOOLEAN NOT NULL DEFAULT FALSE,
+    calls INTEGER NOT NULL DEFAULT 0,
+    completed_calls INTEGER NOT NULL DEFAULT 0,
+    failed_calls INTEGER NOT NULL DEFAULT 0,
+    handled_calls INTEGER NOT NULL DEFAULT 0,
+    callback_requests INTEGER NOT NULL DEFAULT 0,
+    duration_seconds BIGINT NOT NULL DEFAULT 0,
+    duration_calls INTEGER NOT NULL DEFAULT 0,
+    twilio_cost DOUBLE PRECISION NOT NULL DEFAULT 0,
+    openai_cost DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY (customer_id, day, archived)
+);
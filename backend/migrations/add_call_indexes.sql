@@ -0,0 +1,26 @@
+-- Customer timezone ("calls today" in portal stats, see services/call_stats.py)
+-- and composite/partial indexes for the portal call list, now declared on
+-- Call in models.py. Run outside a transaction (CONCURRENTLY keeps the calls
+-- table writable while the indexes build).
+
+ALTER TABLE customers
+ADD COLUMN IF NOT EXISTS timezone VARCHAR(50);
+
+-- Portal list filtered by handled/unhandled, newest first
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_calls_customer_archived_handled_created
+ON calls (customer_id, archived, handled, created_at DESC);
+
+-- Portal list of all open (non-archived) calls, and their stats
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_calls_customer_open_created
+ON calls (customer_id, created_at DESC) WHERE archived = false;
+
+-- Admin listing / stats for one customer over a time range (from
+-- add_customer_portal_fields.sql, unchanged)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_calls_customer_created
+ON calls (customer_id, created_at DESC);
+
+-- Covered by the composites above, or too unselective to be used
+DROP INDEX CONCURRENTLY IF EXISTS ix_calls_customer_id;
+DROP INDEX CONCURRENTLY IF EXISTS idx_calls_customer_archived;
+DROP INDEX CONCURRENTLY IF EXISTS idx_calls_archived;
+DROP INDEX CONCURRENTLY IF EXISTS idx_calls_handled;
@@ -0,0 +1,4 @@
+-- Add per-customer call mode (gather = <Play>/<Gather> per turn, stream = real-time Media Streams)
+
+ALTER TABLE customers
+ADD COLUMN IF NOT EXISTS call_mode VARCHAR(20) DEFAULT 'gather';
@@ -0,0 +1,13 @@
+-- Full-text search over calls for the customer portal (see
+-- services/call_search.py). Run outside a transaction (CONCURRENTLY keeps
+-- the calls table writable while the index builds), then backfill:
+--   python init_db.py rebuild-search-index
+
+-- Lets the GIN index lead with customer_id
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+
+ALTER TABLE calls
+ADD COLUMN IF NOT EXISTS search_vector tsvector;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_calls_customer_search
+ON calls USING gin (customer_id, search_vector);
@@ -0,0 +1,12 @@
+-- Rolling in-call summary: extracted fields and how far the summary has got
+-- (see services/call_summary.py), plus coalescing keys for queued jobs
+
+ALTER TABLE calls
+ADD COLUMN IF NOT EXISTS callback_number VARCHAR(30),
+ADD COLUMN IF NOT EXISTS requested_time VARCHAR(100),
+ADD COLUMN IF NOT EXISTS summary_log_id INTEGER;
+
+ALTER TABLE jobs
+ADD COLUMN IF NOT EXISTS unique_key VARCHAR(100);
+
+CREATE INDEX IF NOT EXISTS ix_jobs_unique_key ON jobs (unique_key);
@@ -0,0 +1,14 @@
+-- Add pre-rendered prompt audio (greeting, transfer messages) per customer
+
+CREATE TABLE IF NOT EXISTS customer_audio (
+    id SERIAL PRIMARY KEY,
+    customer_id INTEGER NOT NULL REFERENCES customers(id) ON DELETE CASCADE,
+    kind VARCHAR(30) NOT NULL,
+    content_hash VARCHAR(64) NOT NULL,
+    text TEXT NOT NULL,
+    audio BYTEA NOT NULL,
+    created_at TIMESTAMP,
+    CONSTRAINT uq_customer_audio_customer_kind UNIQUE (customer_id, kind)
+);
+
+CREATE INDEX IF NOT EXISTS idx_customer_audio_customer_id ON customer_audio(customer_id);
@@ -0,0 +1,13 @@
+-- Typeahead customer search for the admin customer list (see
+-- services/customer_search.py). Run outside a transaction (CONCURRENTLY
+-- keeps the customers table writable while the index builds), then
+-- backfill search_text:
+--   python init_db.py rebuild-customer-search
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE customers
+ADD COLUMN IF NOT EXISTS search_text TEXT;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_customers_search_text_trgm
+ON customers USING gin (search_text gin_trgm_ops);
@@ -0,0 +1,7 @@
+-- Track when each customer row last changed, so workers reload only the
+-- customers that changed into their routing tables (services/call_routing.py)
+
+ALTER TABLE customers
+ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+
+UPDATE customers SET updated_at = COALESCE(created_at, NOW()) WHERE updated_at IS NULL;
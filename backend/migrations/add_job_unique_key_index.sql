@@ -0,0 +1,19 @@
+-- Make jobs.unique_key enforce "one live job per key" in the database, so
+-- enqueue() can INSERT ... ON CONFLICT DO NOTHING (see services/job_queue.py)
+
+-- Coalescing keys now only live while a job is queued
+UPDATE jobs SET unique_key = NULL
+WHERE job_type = 'update_call_summary' AND status <> 'queued';
+
+-- Keep the oldest live job per key if duplicates already slipped in
+UPDATE jobs SET unique_key = NULL
+WHERE unique_key IS NOT NULL AND status <> 'failed' AND id NOT IN (
+    SELECT MIN(id) FROM jobs
+    WHERE unique_key IS NOT NULL AND status <> 'failed'
+    GROUP BY unique_key
+);
+
+DROP INDEX IF EXISTS ix_jobs_unique_key;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ix_jobs_unique_key_live
+ON jobs (unique_key) WHERE status <> 'failed';
@@ -0,0 +1,18 @@
+-- Durable background job queue (post-call summaries and notifications, see services/job_queue.py)
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id SERIAL PRIMARY KEY,
+    job_type VARCHAR(50) NOT NULL,
+    payload JSON,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    run_at TIMESTAMP NOT NULL DEFAULT (NOW() AT TIME ZONE 'utc'),
+    locked_by VARCHAR(100),
+    locked_at TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT (NOW() AT TIME ZONE 'utc'),
+    finished_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ix_jobs_claim ON jobs (status, job_type, run_at);
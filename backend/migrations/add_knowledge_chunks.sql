@@ -0,0 +1,5 @@
+-- Business facts selected per turn instead of inlined in the system prompt
+-- (backfill afterwards with: python init_db.py compile-prompts)
+
+ALTER TABLE customers
+ADD COLUMN IF NOT EXISTS knowledge_chunks JSON;
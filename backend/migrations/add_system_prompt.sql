@@ -0,0 +1,6 @@
+-- Store each customer's precompiled system prompt and its version hash
+-- (backfill afterwards with: python init_db.py compile-prompts)
+
+ALTER TABLE customers
+ADD COLUMN IF NOT EXISTS system_prompt TEXT,
+ADD COLUMN IF NOT EXISTS system_prompt_version VARCHAR(16);
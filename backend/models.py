@@ -1,4 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 
@@ -34,6 +36,11 @@ class Admin(db.Model):
 class Customer(db.Model):
     """Businesses that subscribe to DeskRinger"""
     __tablename__ = 'customers'
+    __table_args__ = (
+        # Admin typeahead search (Postgres; needs pg_trgm, see below)
+        db.Index('ix_customers_search_text_trgm', 'search_text', postgresql_using='gin',
+                 postgresql_ops={'search_text': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     business_name = db.Column(db.String(200), nullable=False)
@@ -47,13 +54,21 @@ class Customer(db.Model):
     business_type = db.Column(db.String(50))  # salon, dental, gym, etc.
     business_hours = db.Column(db.JSON)  # Store hours as JSON: {monday: {open: "9:00", close: "17:00"}, ...}
     holiday_hours = db.Column(db.Text)  # Special holiday hours information
+    timezone = db.Column(db.String(50))  # IANA name, e.g. America/Chicago - "today" in portal stats (default DEFAULT_TIMEZONE)
 
     # DeskRinger phone number assigned to this customer
     deskringer_number = db.Column(db.String(20), unique=True, index=True)
 
+    # Normalized name/contact/email/phone words for admin typeahead search
+    # (see services/customer_search.py) - refresh with update_search_text()
+    search_text = db.Column(db.Text)
+
     # Forwarding settings
     forward_to_number = db.Column(db.String(20))  # Customer's actual business phone
 
+    # How calls are handled: gather (<Play>/<Gather> per turn) or stream (real-time Media Streams)
+    call_mode = db.Column(db.String(20), default='gather')
+
     # AI Configuration - Structured fields for easier customization
     greeting_message = db.Column(db.Text)  # Custom greeting
     services_offered = db.Column(db.Text)  # What services does the business provide?
@@ -65,6 +80,11 @@ class Customer(db.Model):
     # Compiled AI instructions (generated from above fields)
     ai_instructions = db.Column(db.Text)  # Full compiled instructions for AI behavior
 
+    # Full system prompt sent to the model, compiled whenever the above change
+    system_prompt = db.Column(db.Text)
+    system_prompt_version = db.Column(db.String(16))  # Hash of system_prompt
+    knowledge_chunks = db.Column(db.JSON)  # [{kind, text}] business facts selected per turn
+
     # Notification Settings
     notification_email = db.Column(db.String(120))  # Where to send call notifications (defaults to email)
     notification_phone = db.Column(db.String(20))  # Where to send SMS notifications
@@ -78,11 +98,23 @@ class Customer(db.Model):
 
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Routing table reloads (services/call_routing.py)
     trial_ends_at = db.Column(db.DateTime)
     cancelled_at = db.Column(db.DateTime)
 
+    # What the admin customer list returns (see services/fields.py) - the
+    # AI configuration, FAQs and pricing are left to the detail endpoint
+    LIST_FIELDS = (
+        'id', 'business_name', 'contact_name', 'email', 'phone', 'business_type',
+        'deskringer_number', 'forward_to_number', 'call_mode', 'timezone',
+        'notification_email', 'notification_phone', 'subscription_status',
+        'subscription_tier', 'created_at', 'trial_ends_at'
+    )
+    LIST_OPTIONAL_FIELDS = ('greeting_message', 'business_hours', 'holiday_hours')  # Only via ?fields=
+
     # Relationships
     calls = db.relationship('Call', backref='customer', lazy='dynamic', cascade='all, delete-orphan')
+    audio_prompts = db.relationship('CustomerAudio', backref='customer', lazy='dynamic', cascade='all, delete-orphan')
 
     def set_password(self, password):
         """Set password hash for customer portal access"""
@@ -94,20 +126,26 @@ class Customer(db.Model):
             return False
         return check_password_hash(self.password_hash, password)
 
-    def compile_ai_instructions(self):
-        """Compile structured fields into final AI instructions"""
-        instructions = []
+    def instruction_sections(self):
+        """
+        Structured fields as (text, kind) sections, in prompt order
+
+        kind is None for behaviour instructions that apply to every turn and
+        names the chunk (services, hours, faq, ...) for business facts that
+        only need to be in the prompt when relevant (see services/prompt_context.py).
+        """
+        sections = []
 
         # Business context
         if self.business_type:
-            instructions.append(f"Business Type: {self.business_type}")
+            sections.append((f"Business Type: {self.business_type}", None))
 
         if self.business_name:
-            instructions.append(f"Business Name: {self.business_name}")
+            sections.append((f"Business Name: {self.business_name}", None))
 
         # Services offered
         if self.services_offered:
-            instructions.append(f"\nServices Offered:\n{self.services_offered}")
+            sections.append((f"\nServices Offered:\n{self.services_offered}", 'services'))
 
         # Business hours
         if self.business_hours:
@@ -120,24 +158,24 @@ class Customer(db.Model):
                         hours_text += f"\n{day.capitalize()}: Closed"
                     elif day_info.get('open') and day_info.get('close'):
                         hours_text += f"\n{day.capitalize()}: {day_info['open']} - {day_info['close']}"
-            instructions.append(hours_text)
+            sections.append((hours_text, 'hours'))
 
         # Holiday hours
         if self.holiday_hours:
-            instructions.append(f"\nHoliday Hours:\n{self.holiday_hours}")
+            sections.append((f"\nHoliday Hours:\n{self.holiday_hours}", 'holiday_hours'))
 
         # FAQs
         if self.faqs and len(self.faqs) > 0:
-            instructions.append("\nFrequently Asked Questions:")
+            sections.append(("\nFrequently Asked Questions:", 'heading'))
             for faq in self.faqs:
                 q = faq.get('question', '')
                 a = faq.get('answer', '')
                 if q and a:
-                    instructions.append(f"Q: {q}\nA: {a}")
+                    sections.append((f"Q: {q}\nA: {a}", 'faq'))
 
         # Appointment/ticket handling
         if self.appointment_handling == 'collect_details':
-            instructions.append("""
+            sections.append(("""
 Appointment/Request Handling:
 Collect the following information from the caller:
 - Full name
@@ -147,48 +185,85 @@ Collect the following information from the caller:
 - Brief description of what they need
 - Any special requests or notes
 
-After collecting information, confirm the details with the caller and let them know someone will contact them shortly to confirm.""")
+After collecting information, confirm the details with the caller and let them know someone will contact them shortly to confirm.""", None))
         elif self.appointment_handling == 'callback':
-            instructions.append("""
+            sections.append(("""
 Appointment/Request Handling:
-Take the caller's name and phone number, then let them know someone will call them back shortly to help with their request.""")
+Take the caller's name and phone number, then let them know someone will call them back shortly to help with their request.""", None))
         elif self.appointment_handling == 'transfer':
-            instructions.append("""
+            sections.append(("""
 Appointment/Request Handling:
-Inform the caller you'll transfer them to a staff member who can help them immediately.""")
+Inform the caller you'll transfer them to a staff member who can help them immediately.""", None))
         elif self.appointment_handling == 'booking_link':
-            instructions.append("""
+            sections.append(("""
 Appointment/Request Handling:
-Provide the caller with our online booking information or website where they can schedule an appointment.""")
+Provide the caller with our online booking information or website where they can schedule an appointment.""", None))
         elif self.appointment_handling == 'call_back_later':
-            instructions.append("""
+            sections.append(("""
 Appointment/Request Handling:
-Inform the caller of our business hours and ask them to call back during those times to speak with a staff member.""")
+Inform the caller of our business hours and ask them to call back during those times to speak with a staff member.""", None))
 
         # Pricing
         if self.pricing_info:
-            instructions.append(f"\nPricing Information:\n{self.pricing_info}")
+            sections.append((f"\nPricing Information:\n{self.pricing_info}", 'pricing'))
 
         # Special instructions
         if self.special_instructions:
-            instructions.append(f"\nSpecial Instructions:\n{self.special_instructions}")
+            sections.append((f"\nSpecial Instructions:\n{self.special_instructions}", None))
 
         # Transfer/Forward number
         if self.forward_to_number:
-            instructions.append(f"""
+            sections.append((f"""
 Call Transfer:
 If a caller asks to speak with someone directly, or if you cannot answer their question, you can transfer them to: {self.forward_to_number}
-Always ask the caller if they would like to be transferred before doing so.""")
+Always ask the caller if they would like to be transferred before doing so.""", None))
 
         # General behavior
-        instructions.append("""
+        sections.append(("""
 General Behavior:
 - Be professional, friendly, and helpful
 - Speak clearly and naturally
 - If you don't know an answer, offer to transfer them to a staff member or have someone call them back
-- Always thank the caller for calling""")
+- Always thank the caller for calling""", None))
+
+        return sections
 
-        return "\n".join(instructions)
+    def compile_ai_instructions(self):
+        """Compile structured fields into final AI instructions"""
+        return "\n".join(text for text, _ in self.instruction_sections())
+
+    def compile_knowledge_chunks(self):
+        """Business facts from the structured fields, one chunk per section/FAQ"""
+        return [
+            {'kind': kind, 'text': text.strip()}
+            for text, kind in self.instruction_sections()
+            if kind not in (None, 'heading')
+        ]
+
+    def update_search_text(self):
+        """Recompute search_text (call after changing business_name, contact_name, email, phone or deskringer_number)"""
+        from services.customer_search import customer_search_text
+        self.search_text = customer_search_text(self)
+        return self.search_text
+
+    def compile_system_prompt(self):
+        """Recompile the stored system prompt (call after changing business_name or ai_instructions)"""
+        from services.system_prompt import compile_system_prompt
+
+        instructions = self.ai_instructions
+        self.knowledge_chunks = None
+
+        # Generated from the structured fields (not hand-written)? Then keep
+        # only the behaviour rules in the system prompt and pick the relevant
+        # business facts per turn
+        if instructions and instructions == self.compile_ai_instructions():
+            instructions = "\n".join(text for text, kind in self.instruction_sections() if kind is None)
+            self.knowledge_chunks = self.compile_knowledge_chunks()
+
+        self.system_prompt, self.system_prompt_version = compile_system_prompt(
+            self.business_name, instructions
+        )
+        return self.system_prompt_version
 
     def to_dict(self, include_calls=False):
         data = {
@@ -199,9 +274,11 @@ General Behavior:
             'phone': self.phone,
             'business_type': self.business_type,
             'business_hours': self.business_hours,
+            'timezone': self.timezone,
             'holiday_hours': self.holiday_hours,
             'deskringer_number': self.deskringer_number,
             'forward_to_number': self.forward_to_number,
+            'call_mode': self.call_mode or 'gather',
             'greeting_message': self.greeting_message,
             'services_offered': self.services_offered,
             'faqs': self.faqs or [],
@@ -209,6 +286,7 @@ General Behavior:
             'pricing_info': self.pricing_info,
             'special_instructions': self.special_instructions,
             'ai_instructions': self.ai_instructions,
+            'system_prompt_version': self.system_prompt_version,
             'notification_email': self.notification_email,
             'notification_phone': self.notification_phone,
             'notification_instructions': self.notification_instructions,
@@ -219,7 +297,11 @@ General Behavior:
         }
 
         if include_calls:
-            data['recent_calls'] = [call.to_dict() for call in self.calls.order_by(Call.created_at.desc()).limit(10)]
+            from services.fields import load_fields, project
+            recent = self.calls.options(load_fields(Call, Call.LIST_FIELDS)).order_by(
+                Call.created_at.desc(), Call.id.desc()
+            ).limit(10)
+            data['recent_calls'] = [project(call, Call.LIST_FIELDS) for call in recent]
 
         return data
 
@@ -227,9 +309,22 @@ General Behavior:
 class Call(db.Model):
     """Individual calls received by the AI receptionist"""
     __tablename__ = 'calls'
+    __table_args__ = (
+        # Portal list filtered by handled/unhandled, newest first
+        db.Index('ix_calls_customer_archived_handled_created', 'customer_id', 'archived', 'handled',
+                 db.text('created_at DESC')),
+        # Portal list of all open (non-archived) calls, and their stats
+        db.Index('ix_calls_customer_open_created', 'customer_id', db.text('created_at DESC'),
+                 postgresql_where=db.text('archived = false'), sqlite_where=db.text('archived = 0')),
+        # Admin listing / stats for one customer over a time range
+        db.Index('idx_calls_customer_created', 'customer_id', db.text('created_at DESC')),
+        # Portal search, one customer's calls (Postgres; needs btree_gin, see below)
+        db.Index('ix_calls_customer_search', 'customer_id', 'search_vector',
+                 postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False, index=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False)  # Indexed by the composites above
 
     # Call details
     caller_phone = db.Column(db.String(20), nullable=False)
@@ -245,10 +340,13 @@ class Call(db.Model):
     direction = db.Column(db.String(20), default='inbound')  # inbound, outbound
 
     # AI interaction
-    transcript = db.Column(db.Text)
+    transcript = db.Column(db.Text)  # Materialized from CallLog when the call ends (see get_transcript)
     summary = db.Column(db.Text)  # AI-generated summary
     intent = db.Column(db.String(50))  # appointment, question, complaint, etc.
     callback_requested = db.Column(db.Boolean, default=False)
+    callback_number = db.Column(db.String(30))  # Number the caller asked to be called back on
+    requested_time = db.Column(db.String(100))  # Appointment/callback time the caller asked for
+    summary_log_id = db.Column(db.Integer)  # Last CallLog id folded into the rolling summary
 
     # Customer portal tracking
     handled = db.Column(db.Boolean, default=False)  # Has customer marked this as handled?
@@ -264,9 +362,58 @@ class Call(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     ended_at = db.Column(db.DateTime)
 
+    # Full-text search (Postgres), written when the call ends - see
+    # services/call_search.py. SQLite keeps an FTS5 table instead.
+    search_vector = db.deferred(db.Column(TSVECTOR().with_variant(db.Text(), 'sqlite')))
+
+    # What call lists return (see services/fields.py) - the transcript is
+    # left to the detail endpoints (summary is capped at 200 characters)
+    LIST_FIELDS = (
+        'id', 'customer_id', 'caller_phone', 'caller_name', 'duration_seconds', 'status',
+        'intent', 'summary', 'callback_requested', 'callback_number', 'requested_time',
+        'handled', 'handled_at', 'archived', 'archived_at', 'created_at', 'ended_at'
+    )
+    LIST_OPTIONAL_FIELDS = ('twilio_call_sid', 'transcript')  # Only via ?fields=
+
     # Relationships
     logs = db.relationship('CallLog', backref='call', lazy='dynamic', cascade='all, delete-orphan')
 
+    @staticmethod
+    def transcript_from_logs(call_id):
+        """Build the "Caller: ...\nAI: ..." transcript from a call's CallLog rows"""
+        rows = db.session.query(CallLog.speaker, CallLog.message).filter_by(
+            call_id=call_id
+        ).order_by(CallLog.created_at, CallLog.id).all()
+
+        exchanges = []
+        for speaker, message in rows:
+            if speaker == 'caller' or not exchanges:
+                exchanges.append([])
+            label = 'Caller' if speaker == 'caller' else 'AI'
+            exchanges[-1].append(f"{label}: {message}")
+
+        return "\n\n".join("\n".join(lines) for lines in exchanges)
+
+    def render_transcript(self):
+        """Transcript built from this call's CallLog rows"""
+        return self.transcript_from_logs(self.id)
+
+    def materialize_transcript(self):
+        """Store the final transcript once the call has ended"""
+        self.transcript = self.render_transcript()
+        return self.transcript
+
+    def get_transcript(self):
+        """
+        Stored transcript, or derived from CallLog while the call is in progress
+
+        Also takes a Row from a column query (needs id and transcript), as
+        Call.get_transcript(row).
+        """
+        if self.transcript is not None:
+            return self.transcript
+        return Call.transcript_from_logs(self.id)
+
     def to_dict(self, include_logs=False, admin_view=False):
         """
         Convert call to dictionary
@@ -285,6 +432,8 @@ class Call(db.Model):
             'status': self.status,
             'intent': self.intent,
             'callback_requested': self.callback_requested,
+            'callback_number': self.callback_number,
+            'requested_time': self.requested_time,
             'handled': self.handled,
             'handled_at': self.handled_at.isoformat() if self.handled_at else None,
             'archived': self.archived,
@@ -300,7 +449,7 @@ class Call(db.Model):
             data['summary'] = self.summary
         else:
             # Customer portal view - include full transcript
-            data['transcript'] = self.transcript
+            data['transcript'] = self.get_transcript()
             data['summary'] = self.summary
 
         if include_logs:
@@ -311,6 +460,19 @@ class Call(db.Model):
         return data
 
 
+# ix_calls_customer_search leads with customer_id, which GIN only takes with btree_gin
+event.listen(
+    Call.__table__, 'before_create',
+    DDL("CREATE EXTENSION IF NOT EXISTS btree_gin").execute_if(dialect='postgresql')
+)
+
+# ix_customers_search_text_trgm uses trigram operators
+event.listen(
+    Customer.__table__, 'before_create',
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect='postgresql')
+)
+
+
 class CallLog(db.Model):
     """Detailed logs of AI interactions during a call"""
     __tablename__ = 'call_logs'
@@ -334,3 +496,105 @@ class CallLog(db.Model):
             'message': self.message,
             'timestamp': self.timestamp.isoformat() if self.timestamp else None
         }
+
+
+class CustomerAudio(db.Model):
+    """Pre-rendered prompt audio (greeting, transfer messages) for a customer"""
+    __tablename__ = 'customer_audio'
+    __table_args__ = (
+        db.UniqueConstraint('customer_id', 'kind', name='uq_customer_audio_customer_kind'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False, index=True)
+
+    # Which prompt this is: greeting, transfer, transfer_unavailable, transfer_failed
+    kind = db.Column(db.String(30), nullable=False)
+
+    # Hash of the text + TTS settings (same as the TTS cache key) - used to
+    # version the asset URL so Twilio never plays stale audio
+    content_hash = db.Column(db.String(64), nullable=False)
+    text = db.Column(db.Text, nullable=False)
+    audio = db.Column(db.LargeBinary, nullable=False)  # MP3 audio data
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'customer_id': self.customer_id,
+            'kind': self.kind,
+            'content_hash': self.content_hash,
+            'text': self.text,
+            'size_bytes': len(self.audio) if self.audio else 0,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+# Rows whose unique_key still blocks enqueueing another job with that key
+JOB_LIVE_KEY = db.text("status <> 'failed'")
+
+
+class Job(db.Model):
+    """Durable background job (post-call summaries, notifications) - see services/job_queue.py"""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # Claim query: next queued job of a type that is due
+        db.Index('ix_jobs_claim', 'status', 'job_type', 'run_at'),
+        # enqueue() inserts ON CONFLICT DO NOTHING against this
+        db.Index('ix_jobs_unique_key_live', 'unique_key', unique=True,
+                 postgresql_where=JOB_LIVE_KEY, sqlite_where=JOB_LIVE_KEY),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON)
+    unique_key = db.Column(db.String(100))  # At most one live job per key (see enqueue)
+
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Not before (backoff)
+
+    # Claim info
+    locked_by = db.Column(db.String(100))  # host:pid:thread of the worker running it
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'payload': self.payload,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_at': self.run_at.isoformat() if self.run_at else None,
+            'locked_by': self.locked_by,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class CallDailyStats(db.Model):
+    """Per-customer daily call totals, kept up to date as calls change - see services/call_stats.py"""
+    __tablename__ = 'call_daily_stats'
+
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)  # UTC day the call came in
+    archived = db.Column(db.Boolean, primary_key=True, default=False)  # Calls the customer archived are kept apart
+
+    calls = db.Column(db.Integer, nullable=False, default=0)
+    completed_calls = db.Column(db.Integer, nullable=False, default=0)
+    failed_calls = db.Column(db.Integer, nullable=False, default=0)
+    handled_calls = db.Column(db.Integer, nullable=False, default=0)
+    callback_requests = db.Column(db.Integer, nullable=False, default=0)
+
+    duration_seconds = db.Column(db.BigInteger, nullable=False, default=0)  # Sum over calls with a duration
+    duration_calls = db.Column(db.Integer, nullable=False, default=0)  # Calls with a duration (for the average)
+    twilio_cost = db.Column(db.Float, nullable=False, default=0)
+    openai_cost = db.Column(db.Float, nullable=False, default=0)
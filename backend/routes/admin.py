@@ -104,35 +104,38 @@ def get_stats():
     """Get dashboard statistics"""
     # Verify admin is authenticated (identity will be string from JWT)
     admin_id = int(get_jwt_identity())
-    from models import Customer, Call
-    from sqlalchemy import func
+    from services.call_stats import call_stats, customer_counts
 
-    total_customers = Customer.query.count()
-    active_customers = Customer.query.filter_by(subscription_status='active').count()
-    trial_customers = Customer.query.filter_by(subscription_status='trial').count()
+    stats = call_stats()
 
-    total_calls = Call.query.count()
+    return jsonify({
+        'customers': customer_counts(),
+        'calls': {
+            'total': stats['total_calls'],
+            'today': stats['calls_today'],
+            'avg_duration_seconds': stats['avg_duration_seconds']
+        }
+    }), 200
 
-    from datetime import date
-    today = date.today()
-    calls_today = Call.query.filter(
-        func.date(Call.created_at) == today
-    ).count()
 
-    # Average call duration
-    avg_duration = db.session.query(func.avg(Call.duration_seconds)).scalar() or 0
+@admin_bp.route('/metrics', methods=['GET'])
+@jwt_required()
+def get_metrics():
+    """Get runtime performance metrics for this worker process"""
+    from services.tts_cache import get_tts_cache
+    from services.ai_service import get_usage_stats
+    from services.job_queue import get_queue_stats
+    from services.faq_index import get_faq_stats
+    from services.prompt_context import get_context_stats
+    from services.conversation_window import get_window_stats
 
     return jsonify({
-        'customers': {
-            'total': total_customers,
-            'active': active_customers,
-            'trial': trial_customers
-        },
-        'calls': {
-            'total': total_calls,
-            'today': calls_today,
-            'avg_duration_seconds': round(avg_duration, 2)
-        }
+        'tts_cache': get_tts_cache().get_stats(),
+        'llm_tokens': get_usage_stats(),
+        'faq_index': get_faq_stats(),
+        'prompt_context': get_context_stats(),
+        'conversation_window': get_window_stats(),
+        'jobs': get_queue_stats()
     }), 200
 
 
@@ -200,7 +203,7 @@ def test_email():
         notification_service = NotificationService()
 
         # Build test email
-        from sendgrid import SendGridAPIClient
+        from services.http_clients import send_email
         from sendgrid.helpers.mail import Mail, From
 
         message = Mail(
@@ -245,8 +248,7 @@ def test_email():
             """
         )
 
-        sg = SendGridAPIClient(os.environ.get('SENDGRID_API_KEY'))
-        response = sg.send(message)
+        response = send_email(message)
 
         return jsonify({
             'success': True,
@@ -2,39 +2,90 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from models import db, Call, CallLog, Customer
 from sqlalchemy import desc, func
+from datetime import datetime, timedelta
+from services.call_stats import call_stats, count_calls
+from services.pagination import InvalidCursor, keyset_page, page_size
+from services.fields import InvalidFields, parse_fields, project_rows, select_fields
+from services.call_routing import get_call_router
 
 calls_bp = Blueprint('calls', __name__)
 
+
+def _computed_fields(calls, fields):
+    """List fields that aren't plain columns, for one page of call Rows"""
+    computed = {'transcript': Call.get_transcript}
+
+    # Business names from the routing table's cached map - not a lazy
+    # call.customer load per row
+    if 'customer_business_name' in fields:
+        names = get_call_router().business_names(call.customer_id for call in calls)
+        computed['customer_business_name'] = lambda call: names.get(call.customer_id)
+
+    return computed
+
+
+def _list_fields(raw, admin_view, full_default=False):
+    """
+    Fields for a call list (raises InvalidFields)
+
+    full_default: without ?fields=, return every field the list offers (the
+    record the endpoint returned before it had ?fields=)
+    """
+    if admin_view:
+        default = Call.LIST_FIELDS + ('customer_business_name',)
+        allowed = default + ('twilio_call_sid',)
+    else:
+        default = Call.LIST_FIELDS
+        allowed = default + Call.LIST_OPTIONAL_FIELDS
+    return parse_fields(raw, allowed if full_default else default, allowed)
+
+
 @calls_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_calls():
     """Get all calls with optional filtering"""
     customer_id = request.args.get('customer_id', type=int)
     status = request.args.get('status')
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 50, type=int)
+    per_page = page_size(request.args.get('per_page', type=int))
+    cursor = request.args.get('cursor')  # next_cursor/prev_cursor from the previous page
+    include_total = request.args.get('include_total', 'false').lower() == 'true'
     admin_view = request.args.get('admin_view', 'false').lower() == 'true'
 
-    query = Call.query
+    # Summary fields by default; ?fields= to narrow it. Admins see the
+    # business name but never the transcript
+    try:
+        fields = _list_fields(request.args.get('fields'), admin_view)
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Plain columns, serialized straight from the Row tuples
+    query = db.session.query(*select_fields(Call, fields, extra=('created_at', 'customer_id')))
 
     if customer_id:
-        query = query.filter_by(customer_id=customer_id)
+        query = query.filter(Call.customer_id == customer_id)
 
     if status:
-        query = query.filter_by(status=status)
+        query = query.filter(Call.status == status)
 
-    # Order by most recent first
-    query = query.order_by(desc(Call.created_at))
+    # Most recent first, continuing from the cursor
+    try:
+        calls, next_cursor, prev_cursor = keyset_page(query, Call, cursor, per_page)
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
 
-    # Paginate
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Total from the daily rollup where it can answer; an exact COUNT only on request
+    total = count_calls(customer_id or None, status=status)
+    if total is None and include_total:
+        total = query.count()
+
+    computed = _computed_fields(calls, fields)
 
     return jsonify({
-        'calls': [call.to_dict(admin_view=admin_view) for call in pagination.items],
-        'total': pagination.total,
-        'page': page,
-        'pages': pagination.pages,
-        'per_page': per_page
+        'calls': project_rows(calls, fields, computed),
+        'total': total,
+        'per_page': per_page,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor
     }), 200
 
 
@@ -64,7 +115,7 @@ def get_call_transcript(call_id):
 
     return jsonify({
         'call_id': call_id,
-        'transcript': call.transcript,
+        'transcript': call.get_transcript(),
         'logs': [log.to_dict() for log in logs]
     }), 200
 
@@ -76,49 +127,22 @@ def get_call_stats():
     customer_id = request.args.get('customer_id', type=int)
     days = request.args.get('days', 30, type=int)  # Last N days
 
-    from datetime import datetime, timedelta
-
     start_date = datetime.utcnow() - timedelta(days=days)
 
-    query = Call.query.filter(Call.created_at >= start_date)
-
-    if customer_id:
-        query = query.filter_by(customer_id=customer_id)
-
-    total_calls = query.count()
-
-    # Calls by status
-    completed_calls = query.filter_by(status='completed').count()
-    failed_calls = query.filter_by(status='failed').count()
-
-    # Average duration
-    avg_duration = db.session.query(func.avg(Call.duration_seconds)).filter(
-        Call.created_at >= start_date
-    ).scalar() or 0
-
-    # Callback requests
-    callback_requests = query.filter_by(callback_requested=True).count()
-
-    # Total costs
-    total_twilio_cost = db.session.query(func.sum(Call.twilio_cost)).filter(
-        Call.created_at >= start_date
-    ).scalar() or 0
-
-    total_openai_cost = db.session.query(func.sum(Call.openai_cost)).filter(
-        Call.created_at >= start_date
-    ).scalar() or 0
+    # Every metric from the daily rollup, all scoped to the customer (if given)
+    stats = call_stats(customer_id=customer_id, since=start_date)
 
     return jsonify({
         'period_days': days,
-        'total_calls': total_calls,
-        'completed_calls': completed_calls,
-        'failed_calls': failed_calls,
-        'avg_duration_seconds': round(avg_duration, 2),
-        'callback_requests': callback_requests,
+        'total_calls': stats['total_calls'],
+        'completed_calls': stats['completed_calls'],
+        'failed_calls': stats['failed_calls'],
+        'avg_duration_seconds': stats['avg_duration_seconds'],
+        'callback_requests': stats['callback_requests'],
         'costs': {
-            'twilio': round(total_twilio_cost, 2),
-            'openai': round(total_openai_cost, 2),
-            'total': round(total_twilio_cost + total_openai_cost, 2)
+            'twilio': stats['twilio_cost'],
+            'openai': stats['openai_cost'],
+            'total': round(stats['twilio_cost'] + stats['openai_cost'], 2)
         }
     }), 200
 
@@ -127,16 +151,26 @@ def get_call_stats():
 @jwt_required()
 def get_recent_calls():
     """Get most recent calls for dashboard"""
-    limit = request.args.get('limit', 10, type=int)
+    limit = page_size(request.args.get('limit', type=int), default=10)
     customer_id = request.args.get('customer_id', type=int)
+    admin_view = request.args.get('admin_view', 'false').lower() == 'true'
 
-    query = Call.query
+    # Full records (the portal view with transcripts) unless ?fields= narrows
+    # it - dashboard clients rely on that
+    try:
+        fields = _list_fields(request.args.get('fields'), admin_view, full_default=True)
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
+
+    query = db.session.query(*select_fields(Call, fields, extra=('customer_id',)))
 
     if customer_id:
-        query = query.filter_by(customer_id=customer_id)
+        query = query.filter(Call.customer_id == customer_id)
 
     calls = query.order_by(desc(Call.created_at)).limit(limit).all()
 
+    computed = _computed_fields(calls, fields)
+
     return jsonify({
-        'calls': [call.to_dict() for call in calls]
+        'calls': project_rows(calls, fields, computed)
     }), 200
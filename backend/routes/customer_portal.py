@@ -5,6 +5,13 @@ These routes are for customers to access their own data via the customer portal
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from models import db, Customer, Call, CallLog
+from services.customer_audio import PROMPT_FIELDS, schedule_prompt_render
+from services.call_routing import get_call_router
+from services.call_search import safe_snippet, search_calls
+from services.customer_search import SEARCH_FIELDS, get_customer_search_index
+from services.call_stats import call_stats, count_calls, is_valid_timezone, record_call_change, snapshot
+from services.pagination import InvalidCursor, keyset_page, offset_page, page_size
+from services.fields import InvalidFields, parse_fields, project_rows, select_fields
 from datetime import datetime
 
 customer_portal_bp = Blueprint('customer_portal', __name__)
@@ -63,32 +70,82 @@ def get_customer_calls():
 
     # Get query parameters for filtering
     status = request.args.get('status')  # 'handled', 'unhandled', 'all'
-    limit = request.args.get('limit', 50, type=int)
-    offset = request.args.get('offset', 0, type=int)
-
-    # Build query - exclude archived by default
-    query = Call.query.filter_by(customer_id=customer_id, archived=False)
+    limit = page_size(request.args.get('limit', type=int))
+    cursor = request.args.get('cursor')  # next_cursor/prev_cursor from the previous page
+    offset = max(request.args.get('offset', 0, type=int), 0)  # Older clients; cursor takes precedence
+
+    # Summary fields by default; ?fields= to narrow it or to add the transcript
+    try:
+        fields = parse_fields(
+            request.args.get('fields'), Call.LIST_FIELDS, Call.LIST_FIELDS + Call.LIST_OPTIONAL_FIELDS
+        )
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Build query - exclude archived by default, select only what's returned
+    # (plain columns, serialized straight from the Row tuples)
+    query = db.session.query(*select_fields(Call, fields, extra=('created_at',))).filter(
+        Call.customer_id == customer_id, Call.archived == False
+    )
 
     # Filter by status if provided
-    if status == 'handled':
-        query = query.filter_by(handled=True)
-    elif status == 'unhandled':
-        query = query.filter_by(handled=False)
+    handled = {'handled': True, 'unhandled': False}.get(status)
+    if handled is not None:
+        query = query.filter(Call.handled == handled)
+
+    # Most recent first, continuing from the cursor
+    try:
+        if offset and not cursor:
+            calls, next_cursor, prev_cursor = offset_page(query, Call, offset, limit)
+        else:
+            calls, next_cursor, prev_cursor = keyset_page(query, Call, cursor, limit)
+            offset = 0
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'calls': project_rows(calls, fields, {'transcript': Call.get_transcript}),
+        'total': count_calls(customer_id, include_archived=False, handled=handled),  # From the daily rollup
+        'limit': limit,
+        'offset': offset,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor
+    }), 200
 
-    # Order by most recent first
-    query = query.order_by(Call.created_at.desc())
 
-    # Get total count before pagination
-    total_count = query.count()
+@customer_portal_bp.route('/calls/search', methods=['GET'])
+@jwt_required()
+def search_customer_calls():
+    """Full-text search over the current customer's calls, best match first"""
+    customer_id = int(get_jwt_identity())
 
-    # Apply pagination
-    calls = query.limit(limit).offset(offset).all()
+    q = (request.args.get('q') or '').strip()
+    if not q:
+        return jsonify({'error': 'Search query required'}), 400
+
+    status = request.args.get('status')  # 'handled', 'unhandled', 'all'
+    limit = page_size(request.args.get('limit', type=int), default=20)
+    cursor = request.args.get('cursor')  # next_cursor from the previous page
 
+    try:
+        fields = parse_fields(
+            request.args.get('fields'), Call.LIST_FIELDS, Call.LIST_FIELDS + ('twilio_call_sid',)
+        )
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
+
+    handled = {'handled': True, 'unhandled': False}.get(status)
+
+    try:
+        calls, next_cursor = search_calls(customer_id, q, fields, handled=handled, cursor=cursor, limit=limit)
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Snippets are HTML-escaped except for their <mark> highlights
     return jsonify({
-        'calls': [call.to_dict() for call in calls],
-        'total': total_count,
+        'calls': project_rows(calls, fields + ('rank', 'snippet'), {'snippet': lambda call: safe_snippet(call.snippet)}),
         'limit': limit,
-        'offset': offset
+        'next_cursor': next_cursor
     }), 200
 
 
@@ -132,8 +189,10 @@ def mark_call_handled(call_id):
     if not call:
         return jsonify({'error': 'Call not found'}), 404
 
+    before = snapshot(call)
     call.handled = True
     call.handled_at = datetime.utcnow()
+    record_call_change(before, call)
     db.session.commit()
 
     return jsonify({
@@ -154,8 +213,10 @@ def mark_call_unhandled(call_id):
     if not call:
         return jsonify({'error': 'Call not found'}), 404
 
+    before = snapshot(call)
     call.handled = False
     call.handled_at = None
+    record_call_change(before, call)
     db.session.commit()
 
     return jsonify({
@@ -176,6 +237,10 @@ def update_customer_settings():
 
     data = request.get_json()
 
+    # Validate before touching the customer, so a 400 leaves nothing half-applied
+    if data.get('timezone') and not is_valid_timezone(data['timezone']):
+        return jsonify({'error': 'Invalid timezone'}), 400
+
     # Update allowed fields
     if 'business_name' in data:
         customer.business_name = data['business_name']
@@ -185,6 +250,8 @@ def update_customer_settings():
         customer.phone = data['phone']
     if 'business_type' in data:
         customer.business_type = data['business_type']
+    if 'timezone' in data:
+        customer.timezone = data['timezone']
     if 'business_hours' in data:
         customer.business_hours = data['business_hours']
     if 'holiday_hours' in data:
@@ -208,13 +275,23 @@ def update_customer_settings():
 
     # Compile AI instructions from structured fields
     customer.ai_instructions = customer.compile_ai_instructions()
+    customer.compile_system_prompt()
 
     if 'notification_email' in data:
         customer.notification_email = data['notification_email']
     if 'notification_phone' in data:
         customer.notification_phone = data['notification_phone']
 
+    if any(field in data for field in SEARCH_FIELDS):
+        customer.update_search_text()
+
     db.session.commit()
+    get_call_router().invalidate(customer.id)
+    get_customer_search_index().invalidate(customer.id)
+
+    # Re-render prompt/FAQ audio ahead of the next call if its text may have changed
+    if any(field in data for field in PROMPT_FIELDS):
+        schedule_prompt_render(customer.id)
 
     return jsonify({
         'message': 'Settings updated successfully',
@@ -270,8 +347,10 @@ def bulk_archive_calls():
         return jsonify({'error': 'Some calls not found or do not belong to you'}), 404
 
     for call in calls:
+        before = snapshot(call)
         call.archived = True
         call.archived_at = datetime.utcnow()
+        record_call_change(before, call)
 
     db.session.commit()
 
@@ -292,8 +371,10 @@ def archive_call(call_id):
     if not call:
         return jsonify({'error': 'Call not found'}), 404
 
+    before = snapshot(call)
     call.archived = True
     call.archived_at = datetime.utcnow()
+    record_call_change(before, call)
     db.session.commit()
 
     return jsonify({
@@ -312,32 +393,15 @@ def get_customer_stats():
     if not customer:
         return jsonify({'error': 'Customer not found'}), 404
 
-    from sqlalchemy import func
-
-    # Only count non-archived calls
-    total_calls = Call.query.filter_by(customer_id=customer_id, archived=False).count()
-    handled_calls = Call.query.filter_by(customer_id=customer_id, handled=True, archived=False).count()
-    unhandled_calls = Call.query.filter_by(customer_id=customer_id, handled=False, archived=False).count()
-
-    # Calls today (non-archived)
-    from datetime import date
-    today = date.today()
-    calls_today = Call.query.filter_by(customer_id=customer_id, archived=False).filter(
-        func.date(Call.created_at) == today
-    ).count()
-
-    # Average call duration (non-archived)
-    avg_duration = db.session.query(func.avg(Call.duration_seconds)).filter(
-        Call.customer_id == customer_id,
-        Call.archived == False
-    ).scalar() or 0
+    # Only count non-archived calls (read from the daily rollup)
+    stats = call_stats(customer_id=customer_id, timezone_name=customer.timezone, include_archived=False)
 
     return jsonify({
-        'total_calls': total_calls,
-        'handled_calls': handled_calls,
-        'unhandled_calls': unhandled_calls,
-        'calls_today': calls_today,
-        'avg_duration_seconds': round(avg_duration, 2),
+        'total_calls': stats['total_calls'],
+        'handled_calls': stats['handled_calls'],
+        'unhandled_calls': stats['unhandled_calls'],
+        'calls_today': stats['calls_today'],
+        'avg_duration_seconds': stats['avg_duration_seconds'],
         'subscription_status': customer.subscription_status,
         'subscription_tier': customer.subscription_tier
     }), 200
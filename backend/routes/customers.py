@@ -1,6 +1,11 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from models import db, Customer
+from services.customer_audio import PROMPT_FIELDS, schedule_prompt_render
+from services.call_routing import get_call_router
+from services.call_stats import is_valid_timezone
+from services.customer_search import SEARCH_FIELDS, get_customer_search_index, search_customers
+from services.fields import InvalidFields, load_fields, parse_fields, project
 from datetime import datetime, timedelta
 
 customers_bp = Blueprint('customers', __name__)
@@ -13,7 +18,16 @@ def get_customers():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 50, type=int)
 
-    query = Customer.query
+    # Summary fields by default (no AI configuration); ?fields= to narrow it
+    try:
+        fields = parse_fields(
+            request.args.get('fields'), Customer.LIST_FIELDS,
+            Customer.LIST_FIELDS + Customer.LIST_OPTIONAL_FIELDS
+        )
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
+
+    query = Customer.query.options(load_fields(Customer, fields, extra=('created_at',)))
 
     if status:
         query = query.filter_by(subscription_status=status)
@@ -25,7 +39,7 @@ def get_customers():
     pagination = query.paginate(page=page, per_page=per_page, error_out=False)
 
     return jsonify({
-        'customers': [customer.to_dict() for customer in pagination.items],
+        'customers': [project(customer, fields) for customer in pagination.items],
         'total': pagination.total,
         'page': page,
         'pages': pagination.pages,
@@ -33,6 +47,16 @@ def get_customers():
     }), 200
 
 
+@customers_bp.route('/search', methods=['GET'])
+@jwt_required()
+def search_customers_typeahead():
+    """Customers matching ?q= (name, contact, email, phone, DeskRinger number), best first"""
+    q = request.args.get('q', '')
+    limit = max(1, min(request.args.get('limit', 10, type=int), 25))
+
+    return jsonify({'customers': search_customers(q, limit)}), 200
+
+
 @customers_bp.route('/<int:customer_id>', methods=['GET'])
 @jwt_required()
 def get_customer(customer_id):
@@ -60,6 +84,9 @@ def create_customer():
     if Customer.query.filter_by(email=data['email']).first():
         return jsonify({'error': 'Email already exists'}), 400
 
+    if data.get('timezone') and not is_valid_timezone(data['timezone']):
+        return jsonify({'error': 'Invalid timezone'}), 400
+
     # Generate temporary password (12 characters, mix of letters and numbers)
     temp_password = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(12))
 
@@ -72,6 +99,7 @@ def create_customer():
         deskringer_number=data.get('deskringer_number'),
         business_type=data.get('business_type'),
         business_hours=data.get('business_hours'),
+        timezone=data.get('timezone'),
         forward_to_number=data.get('forward_to_number'),
         greeting_message=data.get('greeting_message', f'Thank you for calling {data["business_name"]}. How can I help you today?'),
         ai_instructions=data.get('ai_instructions'),
@@ -82,9 +110,16 @@ def create_customer():
 
     # Set the temporary password
     customer.set_password(temp_password)
+    customer.compile_system_prompt()
+    customer.update_search_text()
 
     db.session.add(customer)
     db.session.commit()
+    get_call_router().invalidate(customer.id)
+    get_customer_search_index().invalidate(customer.id)
+
+    # Render greeting audio before the first call comes in
+    schedule_prompt_render(customer.id)
 
     # Send welcome email with credentials
     send_welcome = data.get('send_welcome_email', True)  # Default to True
@@ -105,7 +140,7 @@ def create_customer():
 def send_welcome_email(customer, temp_password):
     """Send welcome email to new customer with login credentials"""
     import os
-    from sendgrid import SendGridAPIClient
+    from services.http_clients import send_email
     from sendgrid.helpers.mail import Mail, From
 
     if not os.environ.get('SENDGRID_API_KEY'):
@@ -195,8 +230,7 @@ def send_welcome_email(customer, temp_password):
         html_content=html_content
     )
 
-    sg = SendGridAPIClient(os.environ.get('SENDGRID_API_KEY'))
-    response = sg.send(message)
+    response = send_email(message)
     print(f"Welcome email sent to {customer.email}: {response.status_code}")
 
 
@@ -214,17 +248,32 @@ def update_customer(customer_id):
     # Update allowed fields
     allowed_fields = [
         'business_name', 'contact_name', 'email', 'phone', 'deskringer_number',
-        'business_type', 'business_hours', 'forward_to_number',
+        'business_type', 'business_hours', 'forward_to_number', 'call_mode',
         'greeting_message', 'ai_instructions', 'subscription_status',
         'subscription_tier', 'notification_email', 'notification_phone',
-        'notification_instructions'
+        'notification_instructions', 'timezone'
     ]
 
+    if data.get('timezone') and not is_valid_timezone(data['timezone']):
+        return jsonify({'error': 'Invalid timezone'}), 400
+
     for field in allowed_fields:
         if field in data:
             setattr(customer, field, data[field])
 
+    if 'business_name' in data or 'ai_instructions' in data:
+        customer.compile_system_prompt()
+
+    if any(field in data for field in SEARCH_FIELDS):
+        customer.update_search_text()
+
     db.session.commit()
+    get_call_router().invalidate(customer.id)
+    get_customer_search_index().invalidate(customer.id)
+
+    # Re-render prompt/FAQ audio ahead of the next call if its text may have changed
+    if any(field in data for field in PROMPT_FIELDS):
+        schedule_prompt_render(customer.id)
 
     return jsonify({
         'message': 'Customer updated successfully',
@@ -266,11 +315,16 @@ def update_customer_settings(customer_id):
 
     if 'ai_instructions' in data:
         customer.ai_instructions = data['ai_instructions']
+        customer.compile_system_prompt()
 
     if 'business_hours' in data:
         customer.business_hours = data['business_hours']
 
     db.session.commit()
+    get_call_router().invalidate(customer.id)
+
+    if any(field in data for field in PROMPT_FIELDS):
+        schedule_prompt_render(customer.id)
 
     return jsonify({
         'message': 'Settings updated successfully',
@@ -6,12 +6,17 @@ from flask_jwt_extended import jwt_required
 from models import db, Customer
 import stripe
 import os
-
-stripe.api_key = os.environ.get('STRIPE_SECRET_KEY')
+from services.http_clients import configure_stripe
 
 stripe_admin_bp = Blueprint('stripe_admin', __name__)
 
 
+@stripe_admin_bp.before_request
+def use_pooled_stripe_client():
+    """Set the API key and pooled HTTP client for this worker process"""
+    configure_stripe()
+
+
 @stripe_admin_bp.route('/create-payment-link/<int:customer_id>', methods=['POST'])
 @jwt_required()
 def create_payment_link(customer_id):
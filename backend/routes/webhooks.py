@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify, current_app, send_file
+from flask import Blueprint, Response, request, jsonify, current_app, send_file, stream_with_context
 from models import db, Customer, Call, CallLog
 from datetime import datetime
 from io import BytesIO
@@ -6,9 +6,25 @@ from urllib.parse import quote
 import html
 import os
 from twilio.request_validator import RequestValidator
+from services.customer_audio import prompt_audio_url, prompt_audio_urls, TRANSFER_MESSAGE
+from services.tts_prefetch import prefetch_speech
+from services.reply_continuation import continue_reply, record_reply, wait_for_rest
+from services.call_routing import get_call_router
+from services.call_state import get_call_state_cache
+from services.call_jobs import enqueue_post_call
+from services.call_stats import record_call_change, snapshot
+from services.conversation_window import load_call_details, needs_memory, window_history
 
 webhooks_bp = Blueprint('webhooks', __name__)
 
+# Fallback phrases played after every AI turn (cached/prefetched like any other TTS)
+STILL_THERE_MESSAGE = "Are you still there? Anything else I can help with?"
+GOODBYE_MESSAGE = "Okay, thanks for calling! Have a great day!"
+
+# Twilio CallStatus values after which no more turns will be logged
+CALL_ENDED_STATUSES = ('completed', 'busy', 'failed', 'no-answer', 'canceled')
+
+
 def validate_twilio_request():
     """Validate that the request is actually from Twilio"""
     validator = RequestValidator(os.environ.get('TWILIO_AUTH_TOKEN'))
@@ -40,8 +56,9 @@ def twilio_voice_webhook():
     call_sid = request.values.get('CallSid')
     call_status = request.values.get('CallStatus')
 
-    # Find customer by their DeskRinger number
-    customer = Customer.query.filter_by(deskringer_number=to_number).first()
+    # Find customer by their DeskRinger number (in-memory routing table -
+    # the only DB work on pickup is the Call insert below)
+    customer = get_call_router().lookup(to_number)
 
     if not customer:
         # No customer found for this number
@@ -59,16 +76,35 @@ def twilio_voice_webhook():
         status='in_progress'
     )
     db.session.add(call)
+    record_call_change(None, call)
     db.session.commit()
 
-    # Return TwiML response to start AI conversation with OpenAI
-    greeting = customer.greeting_message or f"Thank you for calling {customer.business_name}. How can I help you today?"
+    # Real-time mode: hand the call to the Media Streams server
+    media_stream_url = current_app.config.get('MEDIA_STREAM_URL')
+    if customer.call_mode == 'stream':
+        if media_stream_url:
+            twiml = f'''<?xml version="1.0" encoding="UTF-8"?>
+    <Response>
+        <Connect>
+            <Stream url="{html.escape(media_stream_url)}">
+                <Parameter name="call_id" value="{call.id}"/>
+            </Stream>
+        </Connect>
+    </Response>'''
+            return twiml, 200, {'Content-Type': 'text/xml'}
+
+        print(f"MEDIA_STREAM_URL not set - using gather mode for customer {customer.id}")
+
+    # Keep the conversation in memory so gather turns don't re-read CallLog
+    get_call_state_cache().start(call_sid, call.id, customer)
 
+    # Return TwiML response to start AI conversation with OpenAI
     api_base_url = current_app.config['API_BASE_URL']
-    gather_url = f"{api_base_url}/api/webhooks/twilio/gather"
+    gather_url = f"{api_base_url}/api/webhooks/twilio/gather?turn=0"
 
-    # Use OpenAI TTS voice via <Play> for the greeting (URL encode the text)
-    greeting_audio_url = f"{api_base_url}/api/webhooks/twilio/tts?text={quote(greeting)}&amp;call_id={call.id}"
+    # Play the pre-rendered greeting (falls back to on-demand TTS if it
+    # hasn't been rendered yet)
+    greeting_audio_url = prompt_audio_urls(customer, api_base_url, customer.rendered_prompts)['greeting']
 
     twiml = f'''<?xml version="1.0" encoding="UTF-8"?>
     <Response>
@@ -95,122 +131,207 @@ def twilio_gather_webhook():
     if not validate_twilio_request():
         return jsonify({'error': 'Invalid request signature'}), 403
 
-    from services.ai_service import AIService
+    from services.ai_service import AIService, FALLBACK_RESPONSE, TRANSFER_MARKER
 
     speech_result = request.values.get('SpeechResult')
     call_sid = request.values.get('CallSid')
+    turn = request.args.get('turn', type=int)
 
-    # Find the call
-    call = Call.query.filter_by(twilio_call_sid=call_sid).first()
+    # Find the call's conversation state (rebuilt from the DB only if this
+    # worker doesn't have it or it's behind)
+    state = get_call_state_cache().get(call_sid, expected_turn=turn)
 
-    if not call:
+    if not state:
         return '''<?xml version="1.0" encoding="UTF-8"?>
         <Response>
             <Say>I'm sorry, there was an error. Goodbye.</Say>
             <Hangup/>
         </Response>''', 200, {'Content-Type': 'text/xml'}
 
-    # Log the caller's speech
+    # Log the caller's speech (committed now so its id can identify this turn)
     caller_message = speech_result or '[No speech detected]'
-    log = CallLog(
-        call_id=call.id,
+    caller_log = CallLog(
+        call_id=state.call_id,
         speaker='caller',
         message=caller_message
     )
-    db.session.add(log)
+    db.session.add(caller_log)
+    db.session.commit()
 
-    # Get conversation history from previous call logs
-    previous_logs = CallLog.query.filter_by(call_id=call.id).order_by(CallLog.created_at).all()
-    conversation_history = []
-    for prev_log in previous_logs[:-1]:  # Exclude the current message we just added
-        role = "user" if prev_log.speaker == "caller" else "assistant"
-        conversation_history.append({"role": role, "content": prev_log.message})
+    api_base_url = current_app.config['API_BASE_URL']
+    customer = state.customer
+    next_turn = state.turn_count + 1
 
-    # Get AI response using GPT-4
-    ai_service = AIService()
-    ai_response = ai_service.get_response(call.customer, caller_message, conversation_history)
+    # Known question (FAQ, hours, pricing)? Play the stored answer and skip the model
+    faq_match = (
+        customer.faq_index.match(speech_result, customer.timezone)
+        if speech_result and customer.faq_index else None
+    )
+    if faq_match:
+        record_reply(state.call_id, faq_match.answer)
+        state.append_turn(caller_message, faq_match.answer)
+        prefetch_speech(STILL_THERE_MESSAGE, GOODBYE_MESSAGE)
 
-    # Check if AI wants to transfer the call
-    if ai_response == "__TRANSFER_CALL__":
-        # Log the transfer request
-        transfer_message = "Transferring you to a staff member now. Please hold."
-        log = CallLog(
-            call_id=call.id,
-            speaker='ai',
-            message=transfer_message
+        audio_url = prompt_audio_url(
+            customer.id, faq_match.kind, faq_match.answer, api_base_url, customer.rendered_prompts
         )
-        db.session.add(log)
+        return _conversation_twiml(
+            state.call_id, api_base_url, next_turn, reply_audio_url=audio_url
+        ), 200, {'Content-Type': 'text/xml'}
 
-        if call.transcript:
-            call.transcript += f"\n\nCaller: {caller_message}\nAI: {transfer_message}"
-        else:
-            call.transcript = f"Caller: {caller_message}\nAI: {transfer_message}"
+    # Recent turns verbatim, older ones folded into a short memory
+    history = list(state.messages)
+    details = load_call_details(state.call_id) if needs_memory(history) else None
 
-        db.session.commit()
+    # Stream the AI response from GPT-4 sentence by sentence
+    ai_service = AIService()
+    sentences = ai_service.stream_response(customer, caller_message, window_history(history, details))
+    first_sentence = next(sentences, None) or FALLBACK_RESPONSE
 
-        # Return TwiML to transfer the call
-        api_base_url = current_app.config['API_BASE_URL']
-        transfer_number = call.customer.forward_to_number
+    # Check if AI wants to transfer the call
+    if first_sentence == TRANSFER_MARKER:
+        record_reply(state.call_id, TRANSFER_MESSAGE)
+        state.append_turn(caller_message, TRANSFER_MESSAGE)
+        return _transfer_twiml(state.call_id, customer, api_base_url), 200, {'Content-Type': 'text/xml'}
+
+    # Start synthesizing the reply now rather than when Twilio fetches it
+    prefetch_speech(first_sentence, STILL_THERE_MESSAGE, GOODBYE_MESSAGE)
+
+    if not current_app.config['GATHER_SENTENCE_STREAMING']:
+        # Wait for the complete reply and play it in one go
+        rest = []
+        transfer = False
+        for sentence in sentences:
+            if sentence == TRANSFER_MARKER:
+                transfer = True
+                break
+            rest.append(sentence)
+        ai_response = " ".join([first_sentence] + rest)
+
+        if transfer:
+            ai_message = f"{ai_response} {TRANSFER_MESSAGE}"
+            record_reply(state.call_id, ai_message)
+            state.append_turn(caller_message, ai_message)
+            return _transfer_twiml(state.call_id, customer, api_base_url, ai_response), 200, {'Content-Type': 'text/xml'}
+
+        record_reply(state.call_id, ai_response)
+        state.append_turn(caller_message, ai_response)
+        return _conversation_twiml(state.call_id, api_base_url, next_turn, ai_response), 200, {'Content-Type': 'text/xml'}
+
+    # Play the first sentence now; the rest keeps generating in the background
+    continue_reply(state, caller_log.id, caller_message, first_sentence, sentences)
+
+    audio_url = f"{api_base_url}/api/webhooks/twilio/tts?text={quote(first_sentence)}&amp;call_id={state.call_id}"
+    continue_url = (
+        f"{api_base_url}/api/webhooks/twilio/continue"
+        f"?log={caller_log.id}&amp;turn={next_turn}&amp;first={len(first_sentence)}"
+    )
 
-        if not transfer_number:
-            # No transfer number configured - fallback
-            print(f"No transfer number configured for customer {call.customer.id}")
-            twiml = f'''<?xml version="1.0" encoding="UTF-8"?>
-            <Response>
-                <Play>{api_base_url}/api/webhooks/twilio/tts?text={quote("I'm sorry, but I'm unable to transfer you at this time. Please call back later.")}&amp;call_id={call.id}</Play>
-                <Hangup/>
-            </Response>'''
-        else:
-            print(f"Transferring call {call.id} to {transfer_number}")
-            # Use the DeskRinger number as callerId instead of the caller's phone
-            # This avoids caller ID verification issues
-            twiml = f'''<?xml version="1.0" encoding="UTF-8"?>
-            <Response>
-                <Play>{api_base_url}/api/webhooks/twilio/tts?text={quote(transfer_message)}&amp;call_id={call.id}</Play>
-                <Dial timeout="30" callerId="{call.customer.deskringer_number}">
-                    <Number>{transfer_number}</Number>
-                </Dial>
-                <Play>{api_base_url}/api/webhooks/twilio/tts?text={quote("Sorry, we couldn't reach anyone. Please try calling back later.")}&amp;call_id={call.id}</Play>
-                <Hangup/>
-            </Response>'''
+    twiml = f'''<?xml version="1.0" encoding="UTF-8"?>
+    <Response>
+        <Play>{audio_url}</Play>
+        <Redirect method="POST">{continue_url}</Redirect>
+    </Response>'''
 
-        return twiml, 200, {'Content-Type': 'text/xml'}
+    return twiml, 200, {'Content-Type': 'text/xml'}
 
-    # Log AI response
-    log = CallLog(
-        call_id=call.id,
-        speaker='ai',
-        message=ai_response
-    )
-    db.session.add(log)
 
-    # Update the Call transcript with the full conversation
-    if call.transcript:
-        call.transcript += f"\n\nCaller: {caller_message}\nAI: {ai_response}"
-    else:
-        call.transcript = f"Caller: {caller_message}\nAI: {ai_response}"
+@webhooks_bp.route('/twilio/continue', methods=['POST'])
+def twilio_continue_webhook():
+    """
+    Play the rest of a streamed AI reply, then listen for the caller again
+    Twilio is redirected here after the first sentence finishes playing
+    """
+    # Validate request is from Twilio
+    if not validate_twilio_request():
+        return jsonify({'error': 'Invalid request signature'}), 403
 
-    db.session.commit()
+    call_sid = request.values.get('CallSid')
+    caller_log_id = request.args.get('log', type=int)
+    next_turn = request.args.get('turn', type=int)
+    first_length = request.args.get('first', 0, type=int)
+
+    state = get_call_state_cache().get(call_sid)
+
+    if not state or not caller_log_id:
+        return '''<?xml version="1.0" encoding="UTF-8"?>
+        <Response>
+            <Say>I'm sorry, there was an error. Goodbye.</Say>
+            <Hangup/>
+        </Response>''', 200, {'Content-Type': 'text/xml'}
 
-    # Use OpenAI TTS for natural-sounding response
     api_base_url = current_app.config['API_BASE_URL']
-    audio_url = f"{api_base_url}/api/webhooks/twilio/tts?text={quote(ai_response)}&amp;call_id={call.id}"
-    gather_url = f"{api_base_url}/api/webhooks/twilio/gather"
+    rest = wait_for_rest(state.call_id, caller_log_id, first_length)
+
+    if rest and rest.transfer:
+        return _transfer_twiml(state.call_id, state.customer, api_base_url, rest.text), 200, {'Content-Type': 'text/xml'}
+
+    return _conversation_twiml(
+        state.call_id, api_base_url, next_turn, rest.text if rest else None
+    ), 200, {'Content-Type': 'text/xml'}
+
+
+def _conversation_twiml(call_id, api_base_url, turn, reply_text=None, reply_audio_url=None):
+    """TwiML that plays the reply (if any) and listens for the caller's next turn"""
+    # turn = completed turns so far, lets the next gather spot a stale state
+    gather_url = f"{api_base_url}/api/webhooks/twilio/gather?turn={turn}"
+
+    play_reply = ''
+    if reply_audio_url:
+        # Pre-rendered answer (FAQ index)
+        play_reply = f"<Play>{reply_audio_url}</Play>"
+    elif reply_text:
+        # Use OpenAI TTS for natural-sounding response
+        audio_url = f"{api_base_url}/api/webhooks/twilio/tts?text={quote(reply_text)}&amp;call_id={call_id}"
+        play_reply = f"<Play>{audio_url}</Play>"
 
     # Continue conversation or end call based on context
-    twiml = f'''<?xml version="1.0" encoding="UTF-8"?>
+    return f'''<?xml version="1.0" encoding="UTF-8"?>
     <Response>
-        <Play>{audio_url}</Play>
+        {play_reply}
         <Gather input="speech" action="{gather_url}" method="POST" timeout="5" speechTimeout="2.0" profanityFilter="false">
         </Gather>
-        <Play>{api_base_url}/api/webhooks/twilio/tts?text={quote("Are you still there? Anything else I can help with?")}&amp;call_id={call.id}</Play>
+        <Play>{api_base_url}/api/webhooks/twilio/tts?text={quote(STILL_THERE_MESSAGE)}&amp;call_id={call_id}</Play>
         <Gather input="speech" action="{gather_url}" method="POST" timeout="5" speechTimeout="2.0" profanityFilter="false">
         </Gather>
-        <Play>{api_base_url}/api/webhooks/twilio/tts?text={quote("Okay, thanks for calling! Have a great day!")}&amp;call_id={call.id}</Play>
+        <Play>{api_base_url}/api/webhooks/twilio/tts?text={quote(GOODBYE_MESSAGE)}&amp;call_id={call_id}</Play>
         <Hangup/>
     </Response>'''
 
-    return twiml, 200, {'Content-Type': 'text/xml'}
+
+def _transfer_twiml(call_id, customer, api_base_url, reply_text=None):
+    """TwiML that (optionally) finishes reply_text and transfers the caller to staff"""
+    transfer_number = customer.forward_to_number
+    prompt_urls = prompt_audio_urls(customer, api_base_url, customer.rendered_prompts)
+
+    play_reply = ''
+    if reply_text:
+        audio_url = f"{api_base_url}/api/webhooks/twilio/tts?text={quote(reply_text)}&amp;call_id={call_id}"
+        play_reply = f"<Play>{audio_url}</Play>"
+
+    if not transfer_number:
+        # No transfer number configured - fallback
+        print(f"No transfer number configured for customer {customer.id}")
+        return f'''<?xml version="1.0" encoding="UTF-8"?>
+            <Response>
+                {play_reply}
+                <Play>{prompt_urls['transfer_unavailable']}</Play>
+                <Hangup/>
+            </Response>'''
+
+    print(f"Transferring call {call_id} to {transfer_number}")
+    # Use the DeskRinger number as callerId instead of the caller's phone
+    # This avoids caller ID verification issues
+    return f'''<?xml version="1.0" encoding="UTF-8"?>
+            <Response>
+                {play_reply}
+                <Play>{prompt_urls['transfer']}</Play>
+                <Dial timeout="30" callerId="{customer.deskringer_number}">
+                    <Number>{transfer_number}</Number>
+                </Dial>
+                <Play>{prompt_urls['transfer_failed']}</Play>
+                <Hangup/>
+            </Response>'''
 
 
 @webhooks_bp.route('/twilio/tts', methods=['GET'])
@@ -218,6 +339,10 @@ def twilio_tts_endpoint():
     """
     Generate speech audio using OpenAI TTS
     Twilio will request this URL to get the audio
+
+    In streaming mode (TTS_STREAMING, or ?stream=1/0 to override) audio is
+    sent with chunked transfer as OpenAI produces it, so Twilio can start
+    playback on the first frames.
     """
     from services.ai_service import AIService
 
@@ -226,9 +351,31 @@ def twilio_tts_endpoint():
     if not text:
         return jsonify({'error': 'No text provided'}), 400
 
+    stream = request.args.get('stream')
+    if stream is None:
+        streaming = current_app.config['TTS_STREAMING']
+    else:
+        streaming = stream.lower() in ('1', 'true')
+
     try:
-        # Generate speech using OpenAI TTS
         ai_service = AIService()
+
+        if streaming:
+            audio_stream = ai_service.stream_speech(text)
+
+            # Pull the first chunk here so upstream errors still become a 500
+            first_chunk = next(audio_stream, b'')
+
+            def generate():
+                yield first_chunk
+                yield from audio_stream
+
+            return Response(
+                stream_with_context(generate()),
+                mimetype='audio/mpeg'
+            )
+
+        # Generate speech using OpenAI TTS
         audio_data = ai_service.text_to_speech(text)
 
         # Return as audio file
@@ -244,6 +391,44 @@ def twilio_tts_endpoint():
         return jsonify({'error': str(e)}), 500
 
 
+@webhooks_bp.route('/twilio/audio/<int:customer_id>/<kind>/<content_hash>.mp3', methods=['GET'])
+def twilio_prompt_audio(customer_id, kind, content_hash):
+    """
+    Serve a customer's pre-rendered prompt audio
+    The hash in the URL versions the asset, so it can be cached forever
+    """
+    from models import CustomerAudio
+    from services.tts_cache import get_tts_cache
+
+    # The content hash doubles as the TTS cache key
+    cache = get_tts_cache()
+    audio_data = cache.get(content_hash)
+
+    if audio_data is None:
+        prompt = CustomerAudio.query.filter_by(
+            customer_id=customer_id,
+            kind=kind,
+            content_hash=content_hash
+        ).first()
+
+        if not prompt:
+            return jsonify({'error': 'Audio not found'}), 404
+
+        audio_data = prompt.audio
+        try:
+            cache.put(content_hash, audio_data)
+        except OSError as e:
+            print(f"TTS cache write failed: {e}")
+
+    response = send_file(
+        BytesIO(audio_data),
+        mimetype='audio/mpeg',
+        as_attachment=False
+    )
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
 @webhooks_bp.route('/twilio/status', methods=['POST'])
 def twilio_status_webhook():
     """
@@ -254,10 +439,15 @@ def twilio_status_webhook():
     call_duration = request.values.get('CallDuration', type=int)
     recording_url = request.values.get('RecordingUrl')
 
+    # The conversation is over - free its in-memory state
+    if call_status in CALL_ENDED_STATUSES:
+        get_call_state_cache().evict(call_sid)
+
     # Find the call
     call = Call.query.filter_by(twilio_call_sid=call_sid).first()
 
     if call:
+        before = snapshot(call)
         call.status = call_status
         call.duration_seconds = call_duration
         call.twilio_recording_url = recording_url
@@ -267,27 +457,14 @@ def twilio_status_webhook():
         if call_duration:
             call.twilio_cost = (call_duration / 60) * 0.0085
 
-        db.session.commit()
+        # Transcript, search index, summary and notifications run on the job
+        # workers (worker.py), queued in the same transaction so Twilio gets
+        # its response right away
+        if call_status in CALL_ENDED_STATUSES:
+            enqueue_post_call(call)
 
-        # Send notifications if call completed successfully
-        if call_status == 'completed' and call.customer:
-            try:
-                from services.notification_service import NotificationService
-                notification_service = NotificationService()
-
-                # Generate summary of the call
-                summary = notification_service.generate_summary(call.customer, call)
-
-                # Save summary to call record for customer portal
-                call.summary = summary
-                db.session.commit()
-
-                # Send email and/or SMS notification
-                notification_service.send_call_notification(call.customer, call, summary)
-
-                print(f"Notifications sent for call {call.id}")
-            except Exception as e:
-                print(f"Error sending notifications for call {call.id}: {e}")
+        record_call_change(before, call)
+        db.session.commit()
 
     return jsonify({'status': 'ok'}), 200
 
@@ -9,23 +9,160 @@ NATURAL CONVERSATION OPTIMIZATION:
 - timeout=5s: Patient - gives time to think/respond
 - Adaptive prompt: Handles mistakes, corrections, pauses gracefully
 - TTS speed=0.95: Natural conversational pacing
+- TTS cache: repeated phrases are served from memory/disk, not re-synthesized
+- Streaming TTS: audio is forwarded to Twilio as OpenAI produces it
+- TTS prefetch: reply audio is synthesized before Twilio asks for it
+- Sentence streaming: the first sentence plays while the rest is generated
 - Second-chance fallbacks: Never hangs up abruptly
+- Pooled OpenAI client: no TCP/TLS handshake per webhook hit
+- Precompiled system prompt: compiled once per settings change, not per turn
+- Relevance-filtered context: only the business facts this turn needs
+- Token accounting: per-turn prompt/cached/completion tokens (get_usage_stats)
 
 Expected latency: 4-6s with natural, adaptive conversation flow
 """
-import os
-from openai import OpenAI
+import queue
+import re
+import threading
+import time
+from services.http_clients import get_openai_client
+from services.prompt_context import record_context
+from services.system_prompt import PROMPT_CACHE_MIN_TOKENS, compile_system_prompt
+from services.tts_cache import get_tts_cache, tts_cache_key
+
+# Returned by get_response when the model asks to transfer the call
+TRANSFER_MARKER = "__TRANSFER_CALL__"
+
+# Said when the model returns no text
+FALLBACK_RESPONSE = "I'm sorry, could you repeat that?"
+
+# Sentence end: terminal punctuation followed by whitespace (so "3.5" or
+# "Dr." at the very end of a partial stream isn't split prematurely)
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+def split_sentences(buffer):
+    """
+    Split streamed text into complete sentences and the unfinished remainder
+
+    Returns:
+        (list of complete sentences, remaining text)
+    """
+    parts = _SENTENCE_END.split(buffer)
+    return [p.strip() for p in parts[:-1] if p.strip()], parts[-1]
+
+
+_usage = {
+    'turns': 0,
+    'prompt_tokens': 0,
+    'cached_tokens': 0,
+    'completion_tokens': 0,
+    'cache_eligible_turns': 0,  # Prompt long enough for OpenAI to cache
+    'cache_hit_turns': 0  # Some of the prompt was served from the cache
+}
+_usage_lock = threading.Lock()
+
+
+def record_usage(usage, prompt_version=None):
+    """
+    Account for the tokens of one chat completion
+
+    Args:
+        usage: CompletionUsage from the OpenAI response (or final stream chunk)
+        prompt_version: system_prompt_version the turn was sent with
+    """
+    if usage is None:
+        return
+
+    details = getattr(usage, 'prompt_tokens_details', None)
+    if isinstance(details, dict):
+        cached = details.get('cached_tokens') or 0
+    else:
+        cached = getattr(details, 'cached_tokens', 0) or 0
+
+    with _usage_lock:
+        _usage['turns'] += 1
+        _usage['prompt_tokens'] += usage.prompt_tokens or 0
+        _usage['cached_tokens'] += cached
+        _usage['completion_tokens'] += usage.completion_tokens or 0
+        if (usage.prompt_tokens or 0) >= PROMPT_CACHE_MIN_TOKENS:
+            _usage['cache_eligible_turns'] += 1
+        if cached:
+            _usage['cache_hit_turns'] += 1
+
+    print(f"LLM turn: prompt={usage.prompt_tokens} cached={cached} "
+          f"completion={usage.completion_tokens} prompt_version={prompt_version}")
+
+
+def get_usage_stats():
+    """
+    Token totals for this worker process, with the prompt-cache hit rate
+
+    Turns under PROMPT_CACHE_MIN_TOKENS can't hit the cache, so
+    eligible_cache_hit_rate is the share of the longer turns that did. Few do
+    (services/system_prompt.py) - it shows whether caching matters at all.
+    """
+    with _usage_lock:
+        stats = dict(_usage)
+
+    stats['prompt_cache_hit_rate'] = (
+        stats['cached_tokens'] / stats['prompt_tokens'] if stats['prompt_tokens'] else 0.0
+    )
+    stats['eligible_cache_hit_rate'] = (
+        stats['cache_hit_turns'] / stats['cache_eligible_turns'] if stats['cache_eligible_turns'] else 0.0
+    )
+    stats['avg_prompt_tokens'] = (
+        stats['prompt_tokens'] / stats['turns'] if stats['turns'] else 0.0
+    )
+    return stats
 
 
 class AIService:
     """Handle AI conversations with OpenAI"""
 
+    # TTS settings (part of the audio cache key - changing any of these
+    # naturally invalidates previously cached audio)
+    TTS_MODEL = "tts-1"  # Fastest TTS model (tts-1-hd is slower but higher quality)
+    TTS_VOICE = "nova"  # Natural-sounding female voice
+    TTS_SPEED = 0.95  # Slightly slower - sounds more natural and conversational, masks latency
+    TTS_FORMAT = "mp3"
+    TTS_CHUNK_SIZE = 4096  # Bytes per chunk when streaming audio to Twilio
+
+    # Tool the model can call to hand the caller to a human
+    TRANSFER_TOOL = {
+        "type": "function",
+        "function": {
+            "name": "transfer_to_human",
+            "description": "Transfer the caller to a human staff member when requested or when you cannot answer their question",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "reason": {
+                        "type": "string",
+                        "description": "Brief reason for the transfer"
+                    }
+                },
+                "required": ["reason"]
+            }
+        }
+    }
+
+    # Chat completion settings shared by the Gather and Media Streams paths
+    CHAT_MODEL = "gpt-4o-mini"
+    CHAT_OPTIONS = {
+        "temperature": 0.5,
+        "max_tokens": 85,
+        "presence_penalty": 0.3
+    }
+
     def __init__(self):
-        self.client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
+        # Shared per process - keeps its connection pool warm across requests
+        self.client = get_openai_client()
 
-    def get_response(self, customer, caller_message, conversation_history=None):
+    @classmethod
+    def build_messages(cls, customer, caller_message, conversation_history=None):
         """
-        Get AI response for caller's message
+        Build the chat messages for a conversational turn
 
         Args:
             customer: Customer object with business info and AI instructions
@@ -33,32 +170,12 @@ class AIService:
             conversation_history: List of previous messages in this call
 
         Returns:
-            AI's response text
+            List of chat messages (system prompt, history, current message)
         """
-        # Build adaptive system prompt for natural conversation
-        system_prompt = f"""You're a friendly, patient receptionist at {customer.business_name}.
-
-{customer.ai_instructions or 'Answer questions, take messages, help with appointments.'}
-
-Conversation Style:
-- Be conversational and natural - talk like a real person, not a robot
-- Keep responses to 1-2 short sentences max
-- Use natural fillers: "Sure", "Of course", "No problem", "Got it"
-- Be patient and understanding - people pause, correct themselves, make mistakes
-- If someone pauses mid-sentence or seems to continue talking, wait patiently
-- If you didn't understand something, politely ask them to repeat
-- Never abruptly end the conversation - always give them a chance to add more
-
-Handling Information:
-- Remember what they already told you - NEVER ask for the same info twice
-- If they give partial info, acknowledge it and ask for what's missing
-- If they correct themselves, accept the correction gracefully ("No problem, got it!")
-- Keep track of the conversation context
-
-Never say goodbye or end the call unless:
-- They explicitly say goodbye/thanks/that's all
-- You've confirmed you have everything and they seem done
-- Always ask "Is there anything else I can help you with?" before ending"""
+        # Compiled when the customer's settings were saved
+        system_prompt = customer.system_prompt
+        if not system_prompt:
+            system_prompt, _ = compile_system_prompt(customer.business_name, customer.ai_instructions)
 
         # Build conversation messages
         messages = [{"role": "system", "content": system_prompt}]
@@ -67,62 +184,223 @@ Never say goodbye or end the call unless:
         if conversation_history:
             messages.extend(conversation_history)
 
+        # Business facts relevant to this turn (right before the caller's
+        # message, where they read as context for it)
+        prompt_context = getattr(customer, 'prompt_context', None)
+        if prompt_context:
+            context, context_tokens = prompt_context.select(caller_message, conversation_history)
+            record_context(customer.id, prompt_context.full_tokens, context_tokens)
+            if context:
+                messages.append({"role": "system", "content": f"Relevant business information:\n{context}"})
+
         # Add current message
         messages.append({"role": "user", "content": caller_message})
 
-        # Define transfer function for AI to call
-        transfer_function = {
-            "name": "transfer_to_human",
-            "description": "Transfer the caller to a human staff member when requested or when you cannot answer their question",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "reason": {
-                        "type": "string",
-                        "description": "Brief reason for the transfer"
-                    }
-                },
-                "required": ["reason"]
-            }
-        }
+        return messages
+
+    def get_response(self, customer, caller_message, conversation_history=None):
+        """
+        Get AI response for caller's message
+
+        Args:
+            customer: Customer object with business info and AI instructions
+            caller_message: What the caller just said
+            conversation_history: List of previous messages in this call
+
+        Returns:
+            AI's response text
+        """
+        messages = self.build_messages(customer, caller_message, conversation_history)
 
         # Get response from GPT-4o-mini with function calling
         response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
+            model=self.CHAT_MODEL,
             messages=messages,
-            temperature=0.5,
-            max_tokens=85,
-            presence_penalty=0.3,
-            tools=[{"type": "function", "function": transfer_function}],
-            tool_choice="auto"
+            tools=[self.TRANSFER_TOOL],
+            tool_choice="auto",
+            **self.CHAT_OPTIONS
         )
+        record_usage(response.usage, customer.system_prompt_version)
 
         # Check if AI wants to transfer the call
         response_message = response.choices[0].message
         if response_message.tool_calls:
             # AI wants to transfer - return a special marker
-            return "__TRANSFER_CALL__"
+            return TRANSFER_MARKER
 
-        ai_response = response_message.content or "I'm sorry, could you repeat that?"
+        ai_response = response_message.content or FALLBACK_RESPONSE
 
         return ai_response
 
+    def stream_response(self, customer, caller_message, conversation_history=None):
+        """
+        Stream the AI response one complete sentence at a time
+
+        Lets the caller hear the first sentence while the rest is still being
+        generated. A transfer_to_human tool call is reported as soon as it
+        appears in the stream.
+
+        Args:
+            customer: Customer object with business info and AI instructions
+            caller_message: What the caller just said
+            conversation_history: List of previous messages in this call
+
+        Yields:
+            Sentences of the response, or TRANSFER_MARKER (always last)
+        """
+        messages = self.build_messages(customer, caller_message, conversation_history)
+
+        stream = self.client.chat.completions.create(
+            model=self.CHAT_MODEL,
+            messages=messages,
+            tools=[self.TRANSFER_TOOL],
+            tool_choice="auto",
+            stream=True,
+            stream_options={"include_usage": True},
+            **self.CHAT_OPTIONS
+        )
+
+        buffer = ""
+        try:
+            for chunk in stream:
+                if chunk.usage:
+                    # Final chunk (not sent if we stop early for a transfer)
+                    record_usage(chunk.usage, customer.system_prompt_version)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+
+                if delta.tool_calls:
+                    yield TRANSFER_MARKER
+                    return
+
+                if delta.content:
+                    buffer += delta.content
+                    sentences, buffer = split_sentences(buffer)
+                    yield from sentences
+        finally:
+            stream.close()
+
+        if buffer.strip():
+            yield buffer.strip()
+
+    @classmethod
+    def tts_key(cls, text):
+        """Cache key for the audio of text with our current TTS settings"""
+        return tts_cache_key(text, cls.TTS_MODEL, cls.TTS_VOICE, cls.TTS_SPEED, cls.TTS_FORMAT)
+
     def text_to_speech(self, text):
         """
         Convert text to natural-sounding speech using OpenAI TTS
 
+        Audio is cached by content hash, so repeated phrases skip the
+        OpenAI round trip entirely.
+
         Args:
             text: Text to convert to speech
 
         Returns:
             Audio data (MP3 format)
         """
-        response = self.client.audio.speech.create(
-            model="tts-1",  # Fastest TTS model (tts-1-hd is slower but higher quality)
-            voice="nova",  # Natural-sounding female voice
-            input=text,
-            response_format="mp3",
-            speed=0.95  # Slightly slower - sounds more natural and conversational, masks latency
+        cache = get_tts_cache()
+
+        # Joins an in-flight synthesis of the same text (e.g. a prefetch)
+        # instead of starting a second one
+        return cache.get_or_create(
+            self.tts_key(text),
+            lambda: self.client.audio.speech.create(
+                model=self.TTS_MODEL,
+                voice=self.TTS_VOICE,
+                input=text,
+                response_format=self.TTS_FORMAT,
+                speed=self.TTS_SPEED
+            ).content  # Binary MP3 audio data
         )
 
-        return response.content  # Binary MP3 audio data
+    def stream_speech(self, text):
+        """
+        Stream speech audio as OpenAI produces it
+
+        Synthesis runs on its own thread, so it isn't paced by how fast the
+        caller reads: chunks are written through to the TTS cache as they
+        arrive, and the audio is published - and anyone waiting on the same
+        phrase released - as soon as the upstream stream completes.
+
+        Args:
+            text: Text to convert to speech
+
+        Yields:
+            Chunks of audio data (MP3 format)
+        """
+        cache = get_tts_cache()
+        key = self.tts_key(text)
+
+        audio = cache.get(key)
+        if audio is not None:
+            yield audio
+            return
+
+        chunks = queue.Queue()
+        threading.Thread(target=self._synthesize_stream, args=(text, key, chunks), daemon=True).start()
+
+        while True:
+            chunk = chunks.get()
+            if chunk is None:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+    def _synthesize_stream(self, text, key, chunks):
+        """Stream text from OpenAI into the cache and onto chunks (None ends it, an exception fails it)"""
+        cache = get_tts_cache()
+        try:
+            with cache.single_flight(key) as flight:
+                if flight.audio is not None:
+                    # Someone else (a prefetch, another worker) just synthesized it
+                    chunks.put(flight.audio)
+                    return
+
+                started = time.monotonic()
+                writer = None
+                completed = False
+                try:
+                    with self.client.audio.speech.with_streaming_response.create(
+                        model=self.TTS_MODEL,
+                        voice=self.TTS_VOICE,
+                        input=text,
+                        response_format=self.TTS_FORMAT,
+                        speed=self.TTS_SPEED
+                    ) as response:
+                        try:
+                            writer = cache.writer(key)
+                        except OSError as e:
+                            print(f"TTS cache write failed: {e}")
+
+                        for chunk in response.iter_bytes(self.TTS_CHUNK_SIZE):
+                            if writer:
+                                try:
+                                    writer.write(chunk)
+                                except OSError as e:
+                                    print(f"TTS cache write failed: {e}")
+                                    writer.abort()
+                                    writer = None
+                            chunks.put(chunk)
+
+                    completed = True
+                    cache.record_synthesis(time.monotonic() - started)
+                finally:
+                    # Never publish a truncated file (upstream error)
+                    if writer:
+                        try:
+                            if completed:
+                                writer.commit()
+                            else:
+                                writer.abort()
+                        except OSError as e:
+                            print(f"TTS cache write failed: {e}")
+                    flight.release()
+        except Exception as e:
+            chunks.put(e)
+        finally:
+            chunks.put(None)
@@ -0,0 +1,132 @@
+"""
+Audio helpers for Twilio Media Streams
+
+Twilio streams 8kHz mono G.711 μ-law in 20ms frames (160 bytes). OpenAI TTS
+can return raw 24kHz 16-bit PCM, and Whisper wants a WAV file. These helpers
+convert between the three without external dependencies (audioop is gone
+from the standard library as of Python 3.13).
+"""
+import io
+import math
+import wave
+from array import array
+
+SAMPLE_RATE = 8000  # Twilio media stream sample rate
+FRAME_BYTES = 160  # 20ms of 8kHz μ-law
+TTS_PCM_RATE = 24000  # OpenAI TTS response_format="pcm"
+
+_BIAS = 0x84
+_CLIP = 32635
+
+
+def _decode_byte(byte):
+    byte = ~byte & 0xFF
+    sign = byte & 0x80
+    exponent = (byte >> 4) & 0x07
+    mantissa = byte & 0x0F
+    sample = ((mantissa << 3) + _BIAS) << exponent
+    sample -= _BIAS
+    return -sample if sign else sample
+
+
+def _encode_sample(sample):
+    sign = 0x80 if sample < 0 else 0
+    if sign:
+        sample = -sample
+    sample = min(sample, _CLIP) + _BIAS
+
+    exponent = 7
+    mask = 0x4000
+    while exponent > 0 and not (sample & mask):
+        exponent -= 1
+        mask >>= 1
+
+    mantissa = (sample >> (exponent + 3)) & 0x0F
+    return ~(sign | (exponent << 4) | mantissa) & 0xFF
+
+
+# Lookup tables - building them once is much faster than per-sample math
+_ULAW_TO_PCM = [_decode_byte(b) for b in range(256)]
+_PCM_TO_ULAW = bytes(_encode_sample(s) for s in range(-32768, 32768))
+
+
+def ulaw_to_pcm16(data):
+    """Decode μ-law bytes into an array of signed 16-bit samples"""
+    table = _ULAW_TO_PCM
+    return array('h', [table[b] for b in data])
+
+
+def pcm16_to_ulaw(samples):
+    """Encode signed 16-bit samples into μ-law bytes"""
+    table = _PCM_TO_ULAW
+    return bytes(table[s + 32768] for s in samples)
+
+
+def downsample_24k_to_8k(pcm_bytes):
+    """
+    Convert 24kHz little-endian PCM16 bytes to 8kHz samples
+
+    Averages each group of three samples, which is a crude but adequate
+    low-pass filter for telephone-band speech.
+    """
+    samples = array('h')
+    samples.frombytes(pcm_bytes[:len(pcm_bytes) - len(pcm_bytes) % 2])
+    return array('h', [
+        (samples[i] + samples[i + 1] + samples[i + 2]) // 3
+        for i in range(0, len(samples) - 2, 3)
+    ])
+
+
+def rms(samples):
+    """Root-mean-square energy of a block of samples (used for VAD)"""
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+def pcm16_to_wav(samples, sample_rate=SAMPLE_RATE):
+    """Wrap 16-bit samples in a WAV container (for Whisper)"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+class UlawTranscoder:
+    """
+    Incrementally converts streamed 24kHz PCM from OpenAI into μ-law frames
+
+    TTS chunks arrive at arbitrary sizes; this keeps the leftover bytes
+    between chunks so frames are always whole.
+    """
+
+    def __init__(self):
+        self._pcm = b''
+        self._ulaw = b''
+
+    def feed(self, pcm_chunk):
+        """Add PCM bytes, return any complete 20ms μ-law frames"""
+        data = self._pcm + pcm_chunk
+        usable = len(data) - len(data) % 6  # 3 samples x 2 bytes in -> 1 sample out
+        self._pcm = data[usable:]
+        self._ulaw += pcm16_to_ulaw(downsample_24k_to_8k(data[:usable]))
+        return self._take_frames()
+
+    def flush(self):
+        """Return remaining audio, padded with silence to a whole frame"""
+        frames = self._take_frames()
+        if self._ulaw:
+            frames.append(self._ulaw + b'\xff' * (FRAME_BYTES - len(self._ulaw)))
+            self._ulaw = b''
+        self._pcm = b''
+        return frames
+
+    def _take_frames(self):
+        frames = []
+        while len(self._ulaw) >= FRAME_BYTES:
+            frames.append(self._ulaw[:FRAME_BYTES])
+            self._ulaw = self._ulaw[FRAME_BYTES:]
+        return frames
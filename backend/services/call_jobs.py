@@ -0,0 +1,130 @@
+"""
+Call background jobs, run by worker.py
+
+During the call, after every turn:
+
+    update_call_summary -> fold the new turns into the rolling summary
+
+Enqueued by twilio_status_webhook when a call ends (the webhook itself only
+records the status, so Twilio gets its response right away):
+
+    summarize_call  -> write the transcript and index it for search; for
+                       completed calls finish the summary (usually already
+                       up to date), then fans out to
+    send_call_email -> notification email (SendGrid)
+    send_call_sms   -> notification SMS (Twilio)
+
+Email and SMS are separate jobs so a failing channel retries on its own
+without re-sending the other.
+"""
+import os
+from datetime import datetime, timedelta
+from models import db, Call, CallLog
+from services.call_search import index_call
+from services.call_summary import update_call_summary
+from services.job_queue import JobRetry, enqueue, job
+from services.notification_service import NotificationService
+
+REPLY_GRACE_SECONDS = 15  # How long after hangup a streamed reply may still be logged
+REPLY_RETRY_SECONDS = 2
+
+# Turns logged within this many seconds share one rolling-summary update
+SUMMARY_UPDATE_DELAY = int(os.environ.get('SUMMARY_UPDATE_DELAY', 20))
+
+
+def schedule_summary_update(call_id):
+    """
+    Queue a rolling-summary update (in the caller's transaction)
+
+    Delayed and coalesced per call: the first turn queues an update
+    SUMMARY_UPDATE_DELAY seconds out and the turns logged before it runs
+    join it, so a call costs one summary request per delay window rather
+    than one per turn.
+    """
+    return enqueue(
+        'update_call_summary', {'call_id': call_id}, delay=SUMMARY_UPDATE_DELAY,
+        commit=False, unique_key=f"summary:{call_id}"
+    )
+
+
+def enqueue_post_call(call):
+    """
+    Queue the post-call work for an ended call (in the caller's transaction)
+
+    Once per call: Twilio can deliver the status callback more than once,
+    and a repeat must not re-summarize or re-notify.
+    """
+    return enqueue('summarize_call', {'call_id': call.id}, commit=False, unique_key=f"summarize_call:{call.id}")
+
+
+def _reply_pending(call_id):
+    """True if the call's last logged turn is the caller's (its reply is still being generated)"""
+    last = db.session.query(CallLog.speaker).filter(CallLog.call_id == call_id).order_by(CallLog.id.desc()).first()
+    return last is not None and last.speaker == 'caller'
+
+
+@job('update_call_summary', concurrency=4, max_attempts=3)
+def update_summary(payload):
+    update_call_summary(payload['call_id'])
+
+
+@job('summarize_call', concurrency=4, max_attempts=3, once=True)
+def summarize_call(payload):
+    call = Call.query.get(payload['call_id'])
+    if not call:
+        return
+
+    # A caller who hangs up during a streamed reply (services/reply_continuation)
+    # leaves it generating for a moment - wait for it so the transcript has the
+    # whole last turn
+    ended_at = call.ended_at or datetime.utcnow()
+    if _reply_pending(call.id) and datetime.utcnow() - ended_at < timedelta(seconds=REPLY_GRACE_SECONDS):
+        raise JobRetry(REPLY_RETRY_SECONDS, "waiting for the last reply")
+
+    # Turns were logged append-only during the call - write the transcript once
+    call.materialize_transcript()
+
+    customer = call.customer
+    if call.status != 'completed' or not customer:
+        index_call(call)  # Portal search
+        db.session.commit()
+        return
+
+    notification_service = NotificationService()
+
+    # Save summary to call record for customer portal
+    call.summary = notification_service.generate_summary(customer, call)
+    index_call(call)  # Portal search, with the final summary
+
+    # Committed together with the summary, so a retry never double-notifies
+    if customer.notification_email and notification_service.sendgrid_api_key:
+        enqueue('send_call_email', {'call_id': call.id}, commit=False)
+    if customer.notification_phone and notification_service.twilio_account_sid:
+        enqueue('send_call_sms', {'call_id': call.id}, commit=False)
+
+    db.session.commit()
+
+
+@job('send_call_email', concurrency=2)
+def send_call_email(payload):
+    call = Call.query.get(payload['call_id'])
+    if not call or not call.customer:
+        return
+
+    if not NotificationService().send_email_notification(call.customer, call, call.summary or ''):
+        raise RuntimeError(f"Email notification for call {call.id} not sent")
+
+
+@job('send_call_sms', concurrency=2)
+def send_call_sms(payload):
+    call = Call.query.get(payload['call_id'])
+    if not call or not call.customer:
+        return
+
+    if not call.customer.deskringer_number:
+        # Nothing to send from - retrying won't help
+        print(f"Cannot send SMS: customer {call.customer.id} has no deskringer_number")
+        return
+
+    if not NotificationService().send_sms_notification(call.customer, call, call.summary or ''):
+        raise RuntimeError(f"SMS notification for call {call.id} not sent")
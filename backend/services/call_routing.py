@@ -0,0 +1,294 @@
+"""
+In-memory DID -> customer routing table
+
+Routing an inbound call used to load the full Customer row (FAQs, pricing,
+etc.) on every ring. Instead each worker keeps a compact, immutable snapshot
+of what the voice and gather paths need, keyed by the normalized E.164
+DeskRinger number.
+
+- Warmed at startup (create_app)
+- Invalidated per customer whenever the customer-update routes commit
+- Refreshed every ROUTING_TABLE_TTL seconds, so changes made on other
+  workers show up without any cross-process messaging. A refresh reads
+  only each customer's updated_at and rendered prompt hashes, then reloads
+  the full rows (prompts, FAQs, knowledge chunks) of the customers that
+  changed. It runs on a background thread; calls keep being routed from the
+  current table until the new one is swapped in
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+from flask import current_app
+from services.faq_index import get_faq_index
+from services.prompt_context import get_prompt_context
+from services.system_prompt import compile_system_prompt
+
+ROUTING_TABLE_TTL = int(os.environ.get('ROUTING_TABLE_TTL', 30))
+
+CustomerRoute = namedtuple('CustomerRoute', [
+    'id',
+    'business_name',
+    'greeting_message',
+    'forward_to_number',
+    'deskringer_number',
+    'ai_instructions',
+    'system_prompt',  # Precompiled (services.system_prompt)
+    'system_prompt_version',
+    'call_mode',
+    'timezone',  # IANA name or None - "today" in hours answers
+    'rendered_prompts',  # Read-only {kind: content_hash} of pre-rendered audio
+    'version',  # Hash of the fields above
+    'faq_index',  # services.faq_index.FAQIndex over FAQs/hours/pricing (None if empty)
+    'prompt_context',  # services.prompt_context.PromptContext over knowledge_chunks (None if none)
+    'updated_at'  # Customer.updated_at the route was built from
+])
+
+
+def normalize_number(number):
+    """Normalize a phone number to E.164 (assumes US/Canada for 10-digit numbers)"""
+    if not number:
+        return None
+
+    digits = re.sub(r'\D', '', number)
+    if not digits:
+        return None
+
+    if len(digits) == 10:
+        return f"+1{digits}"
+    if len(digits) == 11 and digits.startswith('1'):
+        return f"+{digits}"
+    return f"+{digits}"
+
+
+def _build_route(row, rendered_prompts):
+    system_prompt, system_prompt_version = row.system_prompt, row.system_prompt_version
+    if not system_prompt:
+        # Not compiled yet (customer predates stored prompts) - compile once per snapshot
+        system_prompt, system_prompt_version = compile_system_prompt(row.business_name, row.ai_instructions)
+
+    fields = {
+        'id': row.id,
+        'business_name': row.business_name,
+        'greeting_message': row.greeting_message,
+        'forward_to_number': row.forward_to_number,
+        'deskringer_number': row.deskringer_number,
+        'ai_instructions': row.ai_instructions,
+        'system_prompt': system_prompt,
+        'system_prompt_version': system_prompt_version,
+        'call_mode': row.call_mode or 'gather',
+        'timezone': row.timezone,
+        'rendered_prompts': dict(sorted(rendered_prompts.items()))
+    }
+    version = hashlib.sha256(
+        json.dumps(fields, sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()[:16]
+
+    fields['rendered_prompts'] = MappingProxyType(fields['rendered_prompts'])
+    faq_index = get_faq_index(row.faqs, row.business_hours, row.pricing_info)
+    prompt_context = get_prompt_context(row.knowledge_chunks)
+    return CustomerRoute(
+        version=version, faq_index=faq_index, prompt_context=prompt_context, updated_at=row.updated_at, **fields
+    )
+
+
+class CallRouter:
+    """Per-process routing table (call methods inside an app context)"""
+
+    def __init__(self, ttl=ROUTING_TABLE_TTL):
+        self.ttl = ttl
+        self._by_number = {}
+        self._by_id = {}
+        self._loaded_at = None
+        self._refreshing = False
+        self._invalidated = {}  # customer id -> when it was last invalidated
+        self._lock = threading.Lock()
+
+    def _query_routes(self, customer_ids=None):
+        """Build routes for customer_ids (every customer if None)"""
+        from models import db, Customer
+
+        columns = (
+            Customer.id, Customer.business_name, Customer.greeting_message,
+            Customer.forward_to_number, Customer.deskringer_number,
+            Customer.ai_instructions, Customer.system_prompt,
+            Customer.system_prompt_version, Customer.call_mode, Customer.timezone,
+            Customer.faqs, Customer.business_hours, Customer.pricing_info,
+            Customer.knowledge_chunks, Customer.updated_at
+        )
+        query = db.session.query(*columns)
+        if customer_ids is not None:
+            query = query.filter(Customer.id.in_(customer_ids))
+
+        rendered = _query_rendered_prompts(customer_ids)
+        return [_build_route(row, rendered.get(row.id, {})) for row in query.all()]
+
+    def _changed_customers(self):
+        """
+        Ids of customers that are new or changed since their route was
+        built, and the ids of every customer (narrow columns only)
+        """
+        from models import db, Customer
+
+        stamps = dict(db.session.query(Customer.id, Customer.updated_at).all())
+        rendered = _query_rendered_prompts()
+
+        changed = []
+        for customer_id, updated_at in stamps.items():
+            route = self._by_id.get(customer_id)
+            if (route is None or route.updated_at != updated_at
+                    or route.rendered_prompts != rendered.get(customer_id, {})):
+                changed.append(customer_id)
+        return changed, set(stamps)
+
+    def warm(self):
+        """(Re)load the table - in full the first time, then only customers that changed"""
+        started = time.monotonic()
+
+        by_number = {}
+        by_id = {}
+        if self._loaded_at is None:
+            routes = self._query_routes()
+        else:
+            changed, existing = self._changed_customers()
+            routes = self._query_routes(changed) if changed else []
+            for customer_id, route in list(self._by_id.items()):
+                if customer_id in existing:
+                    _put(by_id, by_number, customer_id, route)
+        for route in routes:
+            _put(by_id, by_number, route.id, route)
+
+        with self._lock:
+            # Customers invalidated while we were querying: keep their newer route
+            for customer_id, invalidated_at in self._invalidated.items():
+                if invalidated_at >= started:
+                    _put(by_id, by_number, customer_id, self._by_id.get(customer_id))
+            self._invalidated = {}
+
+            self._by_number = by_number
+            self._by_id = by_id
+            self._loaded_at = time.monotonic()
+
+        return len(routes)
+
+    def _ensure_fresh(self):
+        if self._loaded_at is None:
+            self.warm()
+        elif time.monotonic() - self._loaded_at > self.ttl:
+            self._refresh_in_background()
+
+    def _refresh_in_background(self):
+        """Reload the table off the call path (at most one reload at a time)"""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        app = current_app._get_current_object()
+
+        def run():
+            try:
+                with app.app_context():
+                    self.warm()
+            except Exception as e:
+                # Keep the current table; the next lookup tries again
+                print(f"Routing table refresh failed: {e}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def lookup(self, number):
+        """Route for the customer that owns a DeskRinger number (None if unassigned)"""
+        self._ensure_fresh()
+        return self._by_number.get(normalize_number(number))
+
+    def get(self, customer_id):
+        """Route for a customer id (loads it if not in the table yet)"""
+        self._ensure_fresh()
+        route = self._by_id.get(customer_id)
+        if route is None:
+            route = self.invalidate(customer_id)
+        return route
+
+    def business_names(self, customer_ids):
+        """
+        {customer id: business name} for a page of rows (admin listings)
+
+        Served from the table; ids it doesn't hold yet cost one query
+        between them, not one each.
+        """
+        self._ensure_fresh()
+        names = {}
+        missing = []
+        for customer_id in set(customer_ids):
+            route = self._by_id.get(customer_id)
+            if route:
+                names[customer_id] = route.business_name
+            elif customer_id is not None:
+                missing.append(customer_id)
+
+        if missing:
+            from models import db, Customer
+            rows = db.session.query(Customer.id, Customer.business_name).filter(Customer.id.in_(missing))
+            names.update({row.id: row.business_name for row in rows})
+
+        return names
+
+    def invalidate(self, customer_id):
+        """Reload one customer after their settings changed"""
+        routes = self._query_routes([customer_id])
+        route = routes[0] if routes else None
+
+        with self._lock:
+            _put(self._by_id, self._by_number, customer_id, route)
+            self._invalidated[customer_id] = time.monotonic()
+
+        return route
+
+
+def _query_rendered_prompts(customer_ids=None):
+    """{customer id: {kind: content_hash}} of pre-rendered prompt audio"""
+    from models import db, CustomerAudio
+
+    query = db.session.query(CustomerAudio.customer_id, CustomerAudio.kind, CustomerAudio.content_hash)
+    if customer_ids is not None:
+        query = query.filter(CustomerAudio.customer_id.in_(customer_ids))
+
+    rendered = {}
+    for prompt in query.all():
+        rendered.setdefault(prompt.customer_id, {})[prompt.kind] = prompt.content_hash
+    return rendered
+
+
+def _put(by_id, by_number, customer_id, route):
+    """Replace a customer's route in the two maps (route None removes it)"""
+    old = by_id.pop(customer_id, None)
+    if old:
+        old_number = normalize_number(old.deskringer_number)
+        if by_number.get(old_number) is old:
+            del by_number[old_number]
+
+    if route:
+        by_id[customer_id] = route
+        number = normalize_number(route.deskringer_number)
+        if number:
+            by_number[number] = route
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_call_router():
+    """Process-wide routing table"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = CallRouter()
+    return _router
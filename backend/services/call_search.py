@@ -0,0 +1,217 @@
+"""
+Full-text search over a customer's calls (portal search box)
+
+Each call is indexed once it ends (index_call, from the post-call job) and
+again when the post-call summary lands (summarize_call job):
+
+- Postgres: calls.search_vector (tsvector, caller name + summary weighted
+  above the transcript), GIN index on (customer_id, search_vector) so one
+  customer's matches come straight out of the index
+- SQLite: an FTS5 table (calls_fts, rowid = call id), created on first use
+
+Results are ranked (ts_rank_cd / bm25), carry a highlighted snippet and page
+with (rank, id) cursors (see services/pagination.py). Snippets are HTML
+escaped apart from their <mark> tags, so the portal can render them as is.
+"""
+import html
+import os
+import re
+from sqlalchemy import Float, and_, cast, func, literal_column, or_, text
+from models import db, Call
+from services.pagination import decode_rank_cursor, encode_rank_cursor
+
+SEARCH_LANGUAGE = os.environ.get('SEARCH_LANGUAGE', 'english')  # Postgres text search config
+
+FTS_TABLE = 'calls_fts'
+MARK_START, MARK_END = '<mark>', '</mark>'
+
+_fts_ready = False
+
+
+def _postgres():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def _search_vector():
+    """tsvector for a calls row, computed from its columns in the database"""
+    def weighted(column, weight):
+        return func.setweight(func.to_tsvector(SEARCH_LANGUAGE, func.coalesce(column, '')), weight)
+
+    return (
+        weighted(Call.caller_name, 'A')
+        .op('||')(weighted(Call.summary, 'A'))
+        .op('||')(weighted(Call.transcript, 'B'))
+    )
+
+
+def _ensure_fts():
+    """Create the SQLite FTS5 table if this database doesn't have it yet"""
+    global _fts_ready
+    if not _fts_ready:
+        db.session.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "caller_name, summary, transcript, tokenize='porter unicode61')"
+        ))
+        _fts_ready = True
+
+
+def index_call(call):
+    """
+    (Re)index a call for search - part of the caller's transaction
+
+    Call once the transcript is materialized and again after the summary
+    changes; mid-call rows aren't worth indexing.
+    """
+    if _postgres():
+        db.session.flush()
+        db.session.query(Call).filter(Call.id == call.id).update(
+            {Call.search_vector: _search_vector()}, synchronize_session=False
+        )
+        return
+
+    _ensure_fts()
+    db.session.flush()
+    db.session.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {'id': call.id})
+    db.session.execute(text(
+        f"INSERT INTO {FTS_TABLE} (rowid, caller_name, summary, transcript) "
+        "VALUES (:id, :caller_name, :summary, :transcript)"
+    ), {
+        'id': call.id,
+        'caller_name': call.caller_name or '',
+        'summary': call.summary or '',
+        'transcript': call.get_transcript() or ''
+    })
+
+
+def rebuild_search_index(customer_id=None):
+    """
+    Index every ended call from scratch (backfill, or after changing
+    _search_vector / the FTS table)
+
+    Returns:
+        Number of calls indexed
+    """
+    ended = Call.query.filter(Call.ended_at.isnot(None))
+    if customer_id is not None:
+        ended = ended.filter(Call.customer_id == customer_id)
+
+    if _postgres():
+        count = ended.update({Call.search_vector: _search_vector()}, synchronize_session=False)
+        db.session.commit()
+        return count
+
+    _ensure_fts()
+    if customer_id is not None:
+        db.session.execute(text(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid IN (SELECT id FROM calls WHERE customer_id = :customer_id)"
+        ), {'customer_id': customer_id})
+    else:
+        db.session.execute(text(f"DELETE FROM {FTS_TABLE}"))
+
+    rows = ended.with_entities(Call.id, Call.caller_name, Call.summary, Call.transcript).all()
+    if rows:
+        db.session.execute(text(
+            f"INSERT INTO {FTS_TABLE} (rowid, caller_name, summary, transcript) "
+            "VALUES (:id, :caller_name, :summary, :transcript)"
+        ), [{
+            'id': row.id,
+            'caller_name': row.caller_name or '',
+            'summary': row.summary or '',
+            'transcript': row.transcript if row.transcript is not None else Call.transcript_from_logs(row.id)
+        } for row in rows])
+    db.session.commit()
+    return len(rows)
+
+
+def _fts_query(q):
+    """Caller's words as an FTS5 query (all must match) - None if there are none"""
+    words = re.findall(r'\w+', q)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"' for word in words)
+
+
+def safe_snippet(snippet):
+    """HTML-escape a snippet, keeping its <mark> highlights"""
+    if not snippet:
+        return None
+    parts = re.split(f'({re.escape(MARK_START)}|{re.escape(MARK_END)})', snippet)
+    return ''.join(part if part in (MARK_START, MARK_END) else html.escape(part) for part in parts)
+
+
+def _postgres_search(columns, filters, q, after, limit):
+    query_ts = func.websearch_to_tsquery(SEARCH_LANGUAGE, q)
+    rank = cast(func.ts_rank_cd(Call.search_vector, query_ts), Float)
+
+    # Rank the customer's matches, then build headlines for the page only
+    # (ts_headline re-parses the whole text)
+    page = db.session.query(Call.id.label('id'), rank.label('rank')).filter(
+        *filters, Call.search_vector.op('@@')(query_ts)
+    )
+    if after:
+        after_rank, after_id = after
+        page = page.filter(or_(rank < after_rank, and_(rank == after_rank, Call.id < after_id)))
+    page = page.order_by(rank.desc(), Call.id.desc()).limit(limit + 1).subquery()
+
+    document = func.concat_ws('\n\n', Call.caller_name, Call.summary, Call.transcript)
+    snippet = func.ts_headline(
+        SEARCH_LANGUAGE, document, query_ts,
+        f'StartSel={MARK_START}, StopSel={MARK_END}, MaxWords=25, MinWords=10, '
+        'MaxFragments=2, FragmentDelimiter=" ... "'
+    )
+    return db.session.query(*columns, page.c.rank, snippet.label('snippet')).join(
+        page, page.c.id == Call.id
+    ).order_by(page.c.rank.desc(), Call.id.desc()).all()
+
+
+def _sqlite_search(columns, filters, q, after, limit):
+    match = _fts_query(q)
+    if match is None:
+        return []
+
+    _ensure_fts()
+    fts = db.table(FTS_TABLE, db.column('rowid'))
+    # bm25 is lower-is-better; negate so both backends rank high-to-low
+    rank = (-func.bm25(literal_column(FTS_TABLE), 3.0, 2.0, 1.0)).label('rank')
+    snippet = func.snippet(literal_column(FTS_TABLE), -1, MARK_START, MARK_END, ' ... ', 16).label('snippet')
+
+    query = db.session.query(*columns, rank, snippet).select_from(fts).join(
+        Call, Call.id == fts.c.rowid
+    ).filter(*filters, literal_column(FTS_TABLE).op('MATCH')(match))
+    if after:
+        after_rank, after_id = after
+        query = query.filter(or_(rank < after_rank, and_(rank == after_rank, Call.id < after_id)))
+    return query.order_by(rank.desc(), Call.id.desc()).limit(limit + 1).all()
+
+
+def search_calls(customer_id, q, fields, handled=None, cursor=None, limit=20):
+    """
+    One page of a customer's non-archived calls matching q, best match first
+
+    Args:
+        fields: Call columns to return with each match (plus rank and snippet)
+        handled: True/False to only search handled/unhandled calls
+        cursor: next_cursor from the previous page
+        limit: Page size (already clamped)
+
+    Returns:
+        (rows, next_cursor) - rows are Rows with the fields, rank and snippet
+
+    Raises:
+        InvalidCursor
+    """
+    after = decode_rank_cursor(cursor) if cursor else None
+
+    columns = [getattr(Call, name) for name in dict.fromkeys(('id', *fields))]
+    filters = [Call.customer_id == customer_id, Call.archived == False]
+    if handled is not None:
+        filters.append(Call.handled == handled)
+
+    search = _postgres_search if _postgres() else _sqlite_search
+    rows = search(columns, filters, q, after, limit)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_rank_cursor(rows[-1].rank, rows[-1].id)
+    return rows, next_cursor
@@ -0,0 +1,143 @@
+"""
+Per-call conversation state cache
+
+Rebuilding the conversation from CallLog on every gather turn is O(n) rows
+per turn (O(n²) per call), plus a lazy load of call.customer. Instead each
+worker keeps a small state object per live call, keyed by CallSid, and
+appends to it in place as turns complete.
+
+Consistency across workers: every <Gather> action URL carries the number of
+completed turns (?turn=N). If the state this worker holds doesn't match -
+another worker handled a turn, or this worker restarted - it is rebuilt
+from the database, so any worker can pick up any call.
+
+States expire after CALL_STATE_TTL seconds idle and are evicted as soon as
+Twilio's status callback reports the call ended.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from services.call_routing import get_call_router
+
+CALL_STATE_TTL = int(os.environ.get('CALL_STATE_TTL', 900))
+
+
+class CallState:
+    """What the gather path needs to know about a live call"""
+
+    __slots__ = ('call_sid', 'call_id', 'customer', 'messages', 'turn_count', 'last_seen')
+
+    def __init__(self, call_sid, call_id, customer, messages=None, turn_count=0):
+        self.call_sid = call_sid
+        self.call_id = call_id
+        self.customer = customer  # Routing snapshot (services.call_routing.CustomerRoute)
+        self.messages = messages or []  # Chat history: [{"role", "content"}, ...]
+        self.turn_count = turn_count  # Completed caller/AI exchanges
+        self.last_seen = time.monotonic()
+
+    def append_turn(self, caller_message, ai_message):
+        self.messages.append({"role": "user", "content": caller_message})
+        self.messages.append({"role": "assistant", "content": ai_message})
+        self.turn_count += 1
+        self.last_seen = time.monotonic()
+
+
+class CallStateCache:
+    """Per-process CallSid -> CallState map with idle TTL"""
+
+    def __init__(self, ttl=CALL_STATE_TTL):
+        self.ttl = ttl
+        self._states = OrderedDict()  # Least recently used first
+        self._lock = threading.Lock()
+
+    def start(self, call_sid, call_id, customer):
+        """Register a new call at pickup"""
+        state = CallState(call_sid, call_id, customer)
+        with self._lock:
+            self._prune()
+            self._states[call_sid] = state
+        return state
+
+    def get(self, call_sid, expected_turn=None):
+        """
+        State for a live call, rebuilt from the DB if missing or stale
+
+        Args:
+            call_sid: Twilio CallSid
+            expected_turn: Completed turn count the request says we're at
+
+        Returns:
+            CallState, or None if no such call exists
+        """
+        with self._lock:
+            self._prune()
+            state = self._states.get(call_sid)
+            if state is not None:
+                self._states.move_to_end(call_sid)
+
+        if state is not None and (expected_turn is None or state.turn_count == expected_turn):
+            state.last_seen = time.monotonic()
+            return state
+
+        state = self._load(call_sid)
+        if state is not None:
+            with self._lock:
+                self._states[call_sid] = state
+        return state
+
+    def evict(self, call_sid):
+        with self._lock:
+            self._states.pop(call_sid, None)
+
+    def _prune(self):
+        """Drop idle states (caller must hold the lock)"""
+        cutoff = time.monotonic() - self.ttl
+        while self._states:
+            call_sid, state = next(iter(self._states.items()))
+            if state.last_seen >= cutoff:
+                break
+            del self._states[call_sid]
+
+    def _load(self, call_sid):
+        """Rebuild a call's state from Call + CallLog"""
+        from models import db, Call, CallLog
+
+        call = db.session.query(Call.id, Call.customer_id).filter_by(twilio_call_sid=call_sid).first()
+        if not call:
+            return None
+
+        messages = []
+        turn_count = 0
+        logs = db.session.query(CallLog.speaker, CallLog.message).filter_by(
+            call_id=call.id
+        ).order_by(CallLog.created_at, CallLog.id).all()
+
+        for log in logs:
+            if log.speaker == 'caller':
+                messages.append({"role": "user", "content": log.message})
+            else:
+                messages.append({"role": "assistant", "content": log.message})
+                turn_count += 1
+
+        return CallState(
+            call_sid,
+            call.id,
+            get_call_router().get(call.customer_id),
+            messages,
+            turn_count
+        )
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_call_state_cache():
+    """Process-wide call state cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CallStateCache()
+    return _cache
@@ -0,0 +1,326 @@
+"""
+Call statistics from a daily rollup
+
+/api/calls/stats, /api/admin/stats and /api/portal/stats used to run a
+separate COUNT/AVG/SUM per metric, and the dashboards poll them every few
+seconds - each poll rescanned the customer's whole call history.
+
+Totals are now kept per (customer, UTC day, archived) in call_daily_stats.
+Every path that creates or changes a call applies the change to its day's
+row in the same transaction (record_call_change - an atomic upsert that adds
+the difference), so reading stats costs O(days) rows instead of O(calls).
+Where a window starts mid-day, that one partial day is aggregated from calls
+directly, in a single pass with conditional aggregation.
+
+rebuild_daily_stats() recomputes the rollup from calls - run it once after
+adding the table (python init_db.py rebuild-call-stats) and any time it may
+have drifted.
+
+"Today" is the customer's local day (Customer.timezone, else
+DEFAULT_TIMEZONE), passed down as a half-open UTC range so every time
+predicate is a plain comparison on created_at that the indexes can use.
+"""
+import os
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from sqlalchemy import case, func
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, Call, CallDailyStats, Customer
+
+DEFAULT_TIMEZONE = os.environ.get('DEFAULT_TIMEZONE', 'UTC')  # For customers without one (and the admin dashboard)
+
+# Summed columns of call_daily_stats
+ROLLUP_COLUMNS = (
+    'calls', 'completed_calls', 'failed_calls', 'handled_calls', 'callback_requests',
+    'duration_seconds', 'duration_calls', 'twilio_cost', 'openai_cost'
+)
+
+
+def _count_if(condition):
+    return func.count(case((condition, 1)))
+
+
+def _call_aggregates():
+    """Rollup columns computed straight from calls (same labels)"""
+    return [
+        func.count(Call.id).label('calls'),
+        _count_if(Call.status == 'completed').label('completed_calls'),
+        _count_if(Call.status == 'failed').label('failed_calls'),
+        _count_if(Call.handled == True).label('handled_calls'),
+        _count_if(Call.callback_requested == True).label('callback_requests'),
+        func.coalesce(func.sum(Call.duration_seconds), 0).label('duration_seconds'),
+        func.count(Call.duration_seconds).label('duration_calls'),
+        func.coalesce(func.sum(Call.twilio_cost), 0).label('twilio_cost'),
+        func.coalesce(func.sum(Call.openai_cost), 0).label('openai_cost')
+    ]
+
+
+def snapshot(call):
+    """
+    (row key, column values) a call adds to call_daily_stats right now
+
+    Take one before changing a call and pass it to record_call_change.
+    """
+    if call.created_at is None:
+        db.session.flush()  # Fills in the created_at default
+
+    key = (call.customer_id, call.created_at.date(), bool(call.archived))
+    values = {
+        'calls': 1,
+        'completed_calls': int(call.status == 'completed'),
+        'failed_calls': int(call.status == 'failed'),
+        'handled_calls': int(bool(call.handled)),
+        'callback_requests': int(bool(call.callback_requested)),
+        'duration_seconds': call.duration_seconds or 0,
+        'duration_calls': int(call.duration_seconds is not None),
+        'twilio_cost': call.twilio_cost or 0,
+        'openai_cost': call.openai_cost or 0
+    }
+    return key, values
+
+
+def _apply(key, deltas):
+    deltas = {column: value for column, value in deltas.items() if value}
+    if not deltas:
+        return
+
+    customer_id, day, archived = key
+    table = CallDailyStats.__table__
+    dialect = db.engine.dialect.name
+
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql_insert if dialect == 'postgresql' else sqlite_insert
+        statement = insert(table).values(customer_id=customer_id, day=day, archived=archived, **deltas)
+        statement = statement.on_conflict_do_update(
+            index_elements=['customer_id', 'day', 'archived'],
+            set_={column: table.c[column] + statement.excluded[column] for column in deltas}
+        )
+        db.session.execute(statement)
+        return
+
+    updated = db.session.execute(table.update().where(
+        table.c.customer_id == customer_id, table.c.day == day, table.c.archived == archived
+    ).values({column: table.c[column] + value for column, value in deltas.items()})).rowcount
+    if not updated:
+        db.session.execute(table.insert().values(customer_id=customer_id, day=day, archived=archived, **deltas))
+
+
+def record_call_change(before, call):
+    """
+    Apply a new or changed call to the daily rollup (in the caller's transaction)
+
+    Args:
+        before: snapshot(call) taken before the change, or None for a new call
+        call: The call after the change
+    """
+    after_key, after = snapshot(call)
+
+    if before is None:
+        _apply(after_key, after)
+        return
+
+    before_key, before_values = before
+    if before_key == after_key:
+        _apply(after_key, {column: after[column] - before_values[column] for column in ROLLUP_COLUMNS})
+    else:
+        # Archived (or moved day) - take it out of the old row, add it to the new one
+        _apply(before_key, {column: -value for column, value in before_values.items()})
+        _apply(after_key, after)
+
+
+def adjust_daily_stats(call, **deltas):
+    """Add deltas to the rollup row of a call whose columns were changed by a bulk UPDATE"""
+    key, _ = snapshot(call)
+    _apply(key, deltas)
+
+
+def rebuild_daily_stats(customer_id=None):
+    """
+    Recompute call_daily_stats from calls
+
+    Args:
+        customer_id: Only this customer's rows (None = everyone)
+
+    Returns:
+        Number of rollup rows written
+    """
+    day = func.date(Call.created_at)
+    archived = func.coalesce(Call.archived, False)
+
+    source = db.session.query(
+        Call.customer_id, day.label('day'), archived.label('archived'), *_call_aggregates()
+    ).group_by(Call.customer_id, day, archived)
+
+    delete = db.session.query(CallDailyStats)
+    if customer_id is not None:
+        source = source.filter(Call.customer_id == customer_id)
+        delete = delete.filter(CallDailyStats.customer_id == customer_id)
+
+    delete.delete(synchronize_session=False)
+    result = db.session.execute(CallDailyStats.__table__.insert().from_select(
+        ['customer_id', 'day', 'archived', *ROLLUP_COLUMNS], source.statement
+    ))
+    db.session.commit()
+    return result.rowcount
+
+
+def _scoped(query, model, customer_id, include_archived):
+    if customer_id is not None:
+        query = query.filter(model.customer_id == customer_id)
+    if not include_archived:
+        query = query.filter(model.archived == False)
+    return query
+
+
+def _rollup_totals(customer_id, include_archived, first_day=None):
+    query = db.session.query(*[
+        func.coalesce(func.sum(getattr(CallDailyStats, column)), 0).label(column) for column in ROLLUP_COLUMNS
+    ])
+    query = _scoped(query, CallDailyStats, customer_id, include_archived)
+    if first_day is not None:
+        query = query.filter(CallDailyStats.day >= first_day)
+    return query.one()._asdict()
+
+
+def call_totals_query(customer_id, include_archived, start, end):
+    """Rollup columns aggregated straight from calls with start <= created_at < end"""
+    query = _scoped(db.session.query(*_call_aggregates()), Call, customer_id, include_archived)
+    return query.filter(Call.created_at >= start, Call.created_at < end)
+
+
+def _midnight(moment):
+    return datetime.combine(moment.date(), time.min)
+
+
+def is_valid_timezone(name):
+    """Whether name is a known IANA timezone"""
+    try:
+        ZoneInfo(name)
+        return True
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        return False
+
+
+def local_now(timezone_name=None, now=None):
+    """
+    Current time in a timezone
+
+    Args:
+        timezone_name: IANA timezone (None or unknown = DEFAULT_TIMEZONE)
+        now: Current time (naive UTC, default now)
+
+    Returns:
+        Timezone-aware local datetime
+    """
+    zone = ZoneInfo(timezone_name if timezone_name and is_valid_timezone(timezone_name) else DEFAULT_TIMEZONE)
+    return (now or datetime.utcnow()).replace(tzinfo=timezone.utc).astimezone(zone)
+
+
+def local_day_range(timezone_name=None, now=None):
+    """
+    Today in a timezone, as a half-open range of naive UTC datetimes
+
+    Args:
+        timezone_name: IANA timezone (None or unknown = DEFAULT_TIMEZONE)
+        now: Current time (naive UTC, default now)
+
+    Returns:
+        (start, end) - start <= created_at < end
+    """
+    today = local_now(timezone_name, now)
+    zone = today.tzinfo
+
+    start = datetime.combine(today.date(), time.min, tzinfo=zone)
+    end = datetime.combine(today.date() + timedelta(days=1), time.min, tzinfo=zone)
+
+    return (
+        start.astimezone(timezone.utc).replace(tzinfo=None),
+        end.astimezone(timezone.utc).replace(tzinfo=None)
+    )
+
+
+def _totals(customer_id, include_archived, start=None):
+    """Rollup columns summed over calls created at or after start (None = ever)"""
+    if start is None:
+        return _rollup_totals(customer_id, include_archived)
+    if start == _midnight(start):
+        return _rollup_totals(customer_id, include_archived, first_day=start.date())
+
+    # Whole days from the rollup, plus the partial first day from calls
+    next_day = _midnight(start) + timedelta(days=1)
+    totals = _rollup_totals(customer_id, include_archived, first_day=next_day.date())
+    partial = call_totals_query(customer_id, include_archived, start, next_day).one()._asdict()
+    return {column: totals[column] + partial[column] for column in ROLLUP_COLUMNS}
+
+
+def call_stats(customer_id=None, since=None, timezone_name=None, include_archived=True):
+    """
+    Aggregate call metrics for a scope
+
+    Args:
+        customer_id: Only this customer's calls (None = all customers)
+        since: Only calls created at or after this UTC datetime
+        timezone_name: Timezone whose local day counts as today (for calls_today)
+        include_archived: Count calls the customer archived
+
+    Returns:
+        Dict of total_calls, completed_calls, failed_calls, handled_calls,
+        unhandled_calls, callback_requests, calls_today,
+        avg_duration_seconds, twilio_cost, openai_cost
+    """
+    # Nothing is created after the end of today, so the range can stay open
+    today_start, _ = local_day_range(timezone_name)
+
+    totals = _totals(customer_id, include_archived, since)
+    calls_today = _totals(customer_id, include_archived, today_start)['calls']
+
+    duration_calls = totals['duration_calls']
+    return {
+        'total_calls': int(totals['calls']),
+        'completed_calls': int(totals['completed_calls']),
+        'failed_calls': int(totals['failed_calls']),
+        'handled_calls': int(totals['handled_calls']),
+        'unhandled_calls': int(totals['calls'] - totals['handled_calls']),
+        'callback_requests': int(totals['callback_requests']),
+        'calls_today': int(calls_today),
+        'avg_duration_seconds': round(float(totals['duration_seconds']) / duration_calls, 2) if duration_calls else 0,
+        'twilio_cost': round(float(totals['twilio_cost']), 2),
+        'openai_cost': round(float(totals['openai_cost']), 2)
+    }
+
+
+def count_calls(customer_id=None, include_archived=True, handled=None, status=None):
+    """
+    Number of calls in a list, from the rollup (no scan of calls)
+
+    Args:
+        handled: Only handled (True) / unhandled (False) calls
+        status: Only calls with this status ('completed' or 'failed')
+
+    Returns:
+        Count, or None if the rollup can't answer for this filter
+    """
+    if handled is not None and status:
+        return None
+
+    totals = _rollup_totals(customer_id, include_archived)
+    if handled is True:
+        return int(totals['handled_calls'])
+    if handled is False:
+        return int(totals['calls'] - totals['handled_calls'])
+    if status:
+        column = {'completed': 'completed_calls', 'failed': 'failed_calls'}.get(status)
+        return int(totals[column]) if column else None
+    return int(totals['calls'])
+
+
+def customer_counts():
+    """Customer totals by subscription status, in one query"""
+    row = db.session.query(
+        func.count(Customer.id).label('total'),
+        _count_if(Customer.subscription_status == 'active').label('active'),
+        _count_if(Customer.subscription_status == 'trial').label('trial')
+    ).one()
+
+    return {'total': row.total, 'active': row.active, 'trial': row.trial}
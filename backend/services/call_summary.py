@@ -0,0 +1,139 @@
+"""
+Rolling in-call summary
+
+A background job (update_call_summary, see services/call_jobs.py) folds the
+turns logged since the last update into the call's running summary and
+extracted fields - caller name, callback number, requested time, intent.
+Updates are coalesced: turns logged within SUMMARY_UPDATE_DELAY seconds of
+each other share one. Each update only sends the previous summary plus the
+new turns, so the input stays small however long the call runs and nothing
+past the first N characters is lost.
+
+When the call ends the post-call job folds in whatever the last update
+hadn't seen yet; if summary_log_id already covers the last logged turn
+there is nothing to send and no request is made.
+"""
+import json
+from models import db, Call, CallLog
+from services.call_stats import adjust_daily_stats
+from services.http_clients import get_openai_client
+
+SUMMARY_MODEL = "gpt-4o-mini"
+
+INTENTS = ('appointment', 'question', 'order', 'complaint', 'callback', 'other')
+
+SUMMARY_SYSTEM_PROMPT = f"""You keep a running summary of a phone call for a busy business owner.
+You get the current summary and details, then the newest part of the conversation.
+Return the updated details as a JSON object with these keys:
+- "summary": 1-2 sentences, under 200 characters: what the caller wants, any action items or follow-up, urgency if applicable
+- "caller_name": the caller's name, or null
+- "callback_number": phone number the caller wants to be reached on, or null
+- "requested_time": appointment or callback time the caller asked for, or null
+- "intent": one of {", ".join(INTENTS)}
+- "callback_requested": true if the caller wants someone to call them back
+Keep earlier details unless the caller corrected them."""
+
+
+class SummaryConflict(Exception):
+    """Another update folded the same turns first (the job retries)"""
+
+
+def _current_details(call):
+    return {
+        'summary': call.summary,
+        'caller_name': call.caller_name,
+        'callback_number': call.callback_number,
+        'requested_time': call.requested_time,
+        'intent': call.intent,
+        'callback_requested': bool(call.callback_requested)
+    }
+
+
+def _clip(value, length):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value[:length] or None
+
+
+def update_call_summary(call_id):
+    """
+    Fold any turns logged since the last update into the call's summary
+
+    Args:
+        call_id: Call to update
+
+    Returns:
+        True if the summary changed, False if it was already up to date
+
+    Raises:
+        SummaryConflict if a concurrent update got there first
+    """
+    call = Call.query.get(call_id)
+    if not call:
+        return False
+
+    # Nothing logged since the last update - no request needed
+    since = call.summary_log_id or 0
+    new_logs = db.session.query(CallLog.id, CallLog.speaker, CallLog.message).filter(
+        CallLog.call_id == call_id,
+        CallLog.id > since
+    ).order_by(CallLog.id).all()
+
+    if not new_logs:
+        return False
+
+    conversation = "\n".join(
+        f"{'Caller' if log.speaker == 'caller' else 'AI'}: {log.message}" for log in new_logs
+    )
+
+    response = get_openai_client().chat.completions.create(
+        model=SUMMARY_MODEL,
+        messages=[
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": (
+                f"Current details:\n{json.dumps(_current_details(call))}\n\n"
+                f"New conversation:\n{conversation}"
+            )}
+        ],
+        response_format={"type": "json_object"},
+        temperature=0.2,
+        max_tokens=200
+    )
+    details = json.loads(response.choices[0].message.content or '{}')
+
+    # Only a real JSON bool counts - "no" or "false" as a string is truthy
+    callback_requested = details.get('callback_requested')
+    if not isinstance(callback_requested, bool):
+        callback_requested = bool(call.callback_requested)
+    summary = _clip(details.get('summary'), 200) or call.summary
+    intent = details.get('intent')
+    if intent not in INTENTS:
+        intent = call.intent
+
+    # Only apply if nobody folded these turns in the meantime
+    updated = db.session.query(Call).filter(
+        Call.id == call_id,
+        db.func.coalesce(Call.summary_log_id, 0) == since
+    ).update({
+        Call.summary: summary,
+        Call.caller_name: _clip(details.get('caller_name'), 100) or call.caller_name,
+        Call.callback_number: _clip(details.get('callback_number'), 30) or call.callback_number,
+        Call.requested_time: _clip(details.get('requested_time'), 100) or call.requested_time,
+        Call.intent: intent,
+        Call.callback_requested: callback_requested,
+        Call.summary_log_id: new_logs[-1].id
+    }, synchronize_session=False)
+
+    # Keep the daily callback count in step (same transaction)
+    if updated and callback_requested != bool(call.callback_requested):
+        adjust_daily_stats(call, callback_requests=1 if callback_requested else -1)
+
+    db.session.commit()
+
+    if not updated:
+        raise SummaryConflict(f"Summary of call {call_id} was updated concurrently")
+
+    # The bulk update bypassed the identity map
+    db.session.expire(call)
+    return True
@@ -0,0 +1,143 @@
+"""
+Bounded conversation window for long calls
+
+Every turn used to send the whole call history, so the prompt - and the
+time to first token - grew linearly with the length of the call. Now only
+the last HISTORY_TURNS exchanges (at most HISTORY_TOKENS) are sent verbatim.
+Older turns are folded into one compact memory message:
+
+- the rolling summary and extracted details (name, callback number,
+  requested time) kept up to date by services/call_summary.py, when the
+  background job has produced them
+- the caller's own earlier messages, newest first, within MEMORY_TOKENS
+  (covering turns the summary hasn't caught up with yet)
+
+so facts the caller already gave stay in front of the model ("never ask
+twice") while the prompt stays roughly the same size however long the call.
+"""
+import os
+import threading
+from services.prompt_context import estimate_tokens
+
+HISTORY_TURNS = int(os.environ.get('HISTORY_TURNS', 6))  # Exchanges kept verbatim
+HISTORY_TOKENS = int(os.environ.get('HISTORY_TOKENS', 600))  # Budget for the verbatim part
+MEMORY_TOKENS = int(os.environ.get('MEMORY_TOKENS', 150))  # Budget for the folded part
+MEMORY_MESSAGE_CHARS = 200  # Longest single earlier caller message kept
+
+_stats = {'turns': 0, 'folded_turns': 0, 'full_history_tokens': 0, 'sent_history_tokens': 0}
+_stats_lock = threading.Lock()
+
+
+def _tokens(messages):
+    return sum(estimate_tokens(message['content']) for message in messages)
+
+
+def split_history(messages):
+    """
+    Split chat history into (older, recent) at the window boundary
+
+    recent is the last HISTORY_TURNS exchanges, trimmed from the front to
+    HISTORY_TOKENS (the latest exchange is always kept).
+    """
+    recent = list(messages[-HISTORY_TURNS * 2:])
+
+    used = _tokens(recent)
+    while len(recent) > 2 and used > HISTORY_TOKENS:
+        used -= estimate_tokens(recent.pop(0)['content'])
+
+    return list(messages[:len(messages) - len(recent)]), recent
+
+
+def needs_memory(messages):
+    """Whether the history is long enough that older turns get folded"""
+    return bool(split_history(messages)[0])
+
+
+def load_call_details(call_id):
+    """Rolling summary and extracted details of a call (call in an app context)"""
+    from models import db, Call
+
+    row = db.session.query(
+        Call.summary, Call.caller_name, Call.callback_number, Call.requested_time
+    ).filter(Call.id == call_id).first()
+
+    return row._asdict() if row else None
+
+
+def compress(older, details=None):
+    """Compact memory text for the folded turns"""
+    lines = []
+    if details and details.get('summary'):
+        lines.append(f"Summary: {details['summary']}")
+        if details.get('caller_name'):
+            lines.append(f"Caller name: {details['caller_name']}")
+        if details.get('callback_number'):
+            lines.append(f"Callback number: {details['callback_number']}")
+        if details.get('requested_time'):
+            lines.append(f"Requested time: {details['requested_time']}")
+
+    # The summary job can lag a few turns behind - the caller's own words fill
+    # the gap, newest first within what's left of the budget. Until the first
+    # summary lands they stand in entirely, and the opening message (usually
+    # who's calling and why) is always kept.
+    caller_messages = [m['content'][:MEMORY_MESSAGE_CHARS] for m in older if m['role'] == 'user']
+    pinned = caller_messages[:1] if not lines else []
+    used = sum(estimate_tokens(text) for text in lines + pinned)
+
+    said = []
+    for text in reversed(caller_messages[len(pinned):]):
+        tokens = estimate_tokens(text)
+        if (said or pinned) and used + tokens > MEMORY_TOKENS:
+            break
+        said.insert(0, text)
+        used += tokens
+
+    said = [f"- {text}" for text in pinned + said]
+
+    if said:
+        lines.append("Caller said earlier:")
+        lines.extend(said)
+
+    return "\n".join(lines)
+
+
+def window_history(messages, details=None):
+    """
+    History to send to the model: memory of older turns + the recent window
+
+    Args:
+        messages: Full chat history of the call
+        details: load_call_details() result, if the caller fetched it
+
+    Returns:
+        List of chat messages
+    """
+    older, recent = split_history(messages)
+
+    window = recent
+    memory = compress(older, details) if older else ""
+    if memory:
+        window = [{
+            "role": "system",
+            "content": f"Earlier in this call (already collected - don't ask for it again):\n{memory}"
+        }] + recent
+
+    with _stats_lock:
+        _stats['turns'] += 1
+        _stats['folded_turns'] += 1 if older else 0
+        _stats['full_history_tokens'] += _tokens(messages)
+        _stats['sent_history_tokens'] += _tokens(window)
+
+    return window
+
+
+def get_window_stats():
+    """History tokens before and after windowing, for this worker process"""
+    with _stats_lock:
+        stats = dict(_stats)
+
+    full = stats['full_history_tokens']
+    stats['tokens_saved_pct'] = (
+        round(100 * (full - stats['sent_history_tokens']) / full, 1) if full else 0.0
+    )
+    return stats
@@ -0,0 +1,152 @@
+"""
+Pre-rendered per-customer prompt audio
+
+The greeting is the first thing a caller hears, so it must not wait on
+OpenAI TTS. Whenever a customer's settings change we render the greeting, the
+transfer messages and the FAQ index answers (services/faq_index) ahead of
+time and store the MP3s in the database, versioned by a hash of their
+content. The webhooks then point <Play> straight at the stored asset.
+"""
+import threading
+from flask import current_app
+from models import db, Customer, CustomerAudio
+
+# Fixed prompts used in the transfer flow
+TRANSFER_MESSAGE = "Transferring you to a staff member now. Please hold."
+TRANSFER_UNAVAILABLE_MESSAGE = "I'm sorry, but I'm unable to transfer you at this time. Please call back later."
+TRANSFER_FAILED_MESSAGE = "Sorry, we couldn't reach anyone. Please try calling back later."
+
+# Customer fields that pre-rendered audio is made from (re-render when any change)
+PROMPT_FIELDS = ('business_name', 'greeting_message', 'faqs', 'business_hours', 'pricing_info')
+
+
+def default_greeting(business_name):
+    return f"Thank you for calling {business_name}. How can I help you today?"
+
+
+def customer_prompt_texts(customer):
+    """Text of every pre-rendered prompt for a customer, keyed by kind"""
+    return {
+        'greeting': customer.greeting_message or default_greeting(customer.business_name),
+        'transfer': TRANSFER_MESSAGE,
+        'transfer_unavailable': TRANSFER_UNAVAILABLE_MESSAGE,
+        'transfer_failed': TRANSFER_FAILED_MESSAGE
+    }
+
+
+def faq_prompt_texts(customer):
+    """Text of every answer the FAQ index can give, keyed by kind"""
+    from services.faq_index import faq_entries
+
+    entries = faq_entries(customer.faqs, customer.business_hours, customer.pricing_info)
+    return {entry.kind: entry.answer for entry in entries if entry.answer}
+
+
+def render_customer_prompts(customer):
+    """
+    Render any prompt whose text changed since it was last rendered
+
+    Args:
+        customer: Customer object
+
+    Returns:
+        Number of prompts (re-)rendered
+    """
+    from services.ai_service import AIService
+
+    ai_service = AIService()
+    existing = {audio.kind: audio for audio in customer.audio_prompts}
+    texts = {**customer_prompt_texts(customer), **faq_prompt_texts(customer)}
+    rendered = 0
+
+    # Answers that were removed or reworded
+    for kind, audio in existing.items():
+        if kind not in texts:
+            db.session.delete(audio)
+            rendered += 1
+
+    for kind, text in texts.items():
+        content_hash = AIService.tts_key(text)
+        current = existing.get(kind)
+
+        if current and current.content_hash == content_hash:
+            continue
+
+        audio = ai_service.text_to_speech(text)
+
+        if current:
+            current.content_hash = content_hash
+            current.text = text
+            current.audio = audio
+        else:
+            db.session.add(CustomerAudio(
+                customer_id=customer.id,
+                kind=kind,
+                content_hash=content_hash,
+                text=text,
+                audio=audio
+            ))
+        rendered += 1
+
+    if rendered:
+        db.session.commit()
+
+        # New asset hashes - let the voice webhook start using them
+        from services.call_routing import get_call_router
+        get_call_router().invalidate(customer.id)
+
+    return rendered
+
+
+def schedule_prompt_render(customer_id):
+    """Render a customer's prompts in the background so saving settings stays fast"""
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            try:
+                customer = Customer.query.get(customer_id)
+                if customer:
+                    rendered = render_customer_prompts(customer)
+                    print(f"Rendered {rendered} prompt(s) for customer {customer_id}")
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error rendering prompts for customer {customer_id}: {e}")
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def prompt_audio_urls(customer, api_base_url, rendered=None):
+    """
+    URL Twilio should <Play> for each prompt kind
+
+    Uses the pre-rendered asset when it matches the current text, otherwise
+    falls back to on-demand TTS so a settings change is never silent.
+
+    Args:
+        customer: Customer (or routing snapshot)
+        api_base_url: Public base URL of this API
+        rendered: {kind: content_hash} of stored audio (queried if not given)
+    """
+    if rendered is None:
+        rendered = dict(
+            db.session.query(CustomerAudio.kind, CustomerAudio.content_hash)
+            .filter_by(customer_id=customer.id)
+            .all()
+        )
+
+    return {
+        kind: prompt_audio_url(customer.id, kind, text, api_base_url, rendered)
+        for kind, text in customer_prompt_texts(customer).items()
+    }
+
+
+def prompt_audio_url(customer_id, kind, text, api_base_url, rendered):
+    """URL of one prompt's stored audio, or on-demand TTS if it isn't rendered (yet)"""
+    from urllib.parse import quote
+    from services.ai_service import AIService
+
+    content_hash = AIService.tts_key(text)
+    if rendered.get(kind) == content_hash:
+        return f"{api_base_url}/api/webhooks/twilio/audio/{customer_id}/{kind}/{content_hash}.mp3"
+    return f"{api_base_url}/api/webhooks/twilio/tts?text={quote(text)}"
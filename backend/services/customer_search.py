@@ -0,0 +1,293 @@
+"""
+Typeahead customer search (admin customer list)
+
+Every customer carries search_text: business name, contact name, email,
+phone and DeskRinger number lowercased, accent-folded and split into words,
+with phone numbers also kept as bare digits. Queries are normalized the same
+way, so "(555) 010" and "555010" both find +1 555-010-2000.
+
+- Postgres: trigram GIN index on search_text (pg_trgm). Every query word as
+  a substring, or fuzzy via word similarity (%>) for typos
+- SQLite: a per-process prefix trie over the search_text words. Every query
+  word must prefix one of the customer's words, within 1-2 edits for longer
+  words. Like the routing table it is invalidated per customer when the
+  customer-update routes commit and fully rebuilt every CUSTOMER_SEARCH_TTL
+  seconds, so changes from other workers show up
+
+Best matches first: fewest edits, then business names starting with the
+query, then alphabetical.
+"""
+import os
+import re
+import threading
+import time
+import unicodedata
+from sqlalchemy import and_, case, func, or_
+from services.fields import project_rows, select_fields
+
+CUSTOMER_SEARCH_TTL = int(os.environ.get('CUSTOMER_SEARCH_TTL', 60))
+
+SEARCH_FIELDS = ('business_name', 'contact_name', 'email', 'phone', 'deskringer_number')
+RESULT_FIELDS = (
+    'id', 'business_name', 'contact_name', 'email', 'phone', 'deskringer_number',
+    'business_type', 'subscription_status', 'created_at'
+)
+PHONE_FIELDS = ('phone', 'deskringer_number')
+
+
+def search_words(text):
+    """Lowercased, accent-free words of text"""
+    folded = unicodedata.normalize('NFKD', text or '')
+    folded = ''.join(char for char in folded if not unicodedata.combining(char))
+    return re.findall(r'[a-z0-9]+', folded.lower())
+
+
+def customer_search_text(customer):
+    """search_text for a customer (or any object with the SEARCH_FIELDS)"""
+    words = []
+    for field in SEARCH_FIELDS:
+        value = getattr(customer, field)
+        words.extend(search_words(value))
+
+        # Phone numbers also as bare digits, with and without the country code
+        if field in PHONE_FIELDS and value:
+            digits = re.sub(r'\D', '', value)
+            if digits:
+                words.append(digits)
+                if len(digits) == 11 and digits.startswith('1'):
+                    words.append(digits[1:])
+
+    return ' '.join(dict.fromkeys(words))
+
+
+def _max_edits(word):
+    """Typos tolerated in a query word (none while it's still short, or for numbers)"""
+    if word.isdigit():
+        return 0
+    if len(word) >= 8:
+        return 2
+    if len(word) >= 4:
+        return 1
+    return 0
+
+
+class _Node:
+    __slots__ = ('children', 'ids')
+
+    def __init__(self):
+        self.children = {}
+        self.ids = set()  # Customers with a word under this prefix
+
+
+class PrefixTrie:
+    """Words -> customer ids; lookups match any word the query word prefixes"""
+
+    def __init__(self):
+        self._root = _Node()
+
+    def add(self, word, customer_id):
+        node = self._root
+        for char in word:
+            node = node.children.setdefault(char, _Node())
+            node.ids.add(customer_id)
+
+    def remove(self, word, customer_id):
+        """Drop customer_id along word (re-add the customer's other words after)"""
+        node = self._root
+        for char in word:
+            node = node.children.get(char)
+            if node is None:
+                return
+            node.ids.discard(customer_id)
+
+    def match(self, word, max_edits=0):
+        """
+        {customer id: edits} for customers with a word starting with word,
+        allowing up to max_edits typos (Levenshtein)
+        """
+        if max_edits == 0:
+            node = self._root
+            for char in word:
+                node = node.children.get(char)
+                if node is None:
+                    return {}
+            return dict.fromkeys(node.ids, 0)
+
+        matches = {}
+        first_row = list(range(len(word) + 1))
+        # Depth-first over the trie, one row of the edit-distance table per
+        # node; a branch is dropped once every cell exceeds max_edits
+        stack = [(child, char, first_row) for char, child in self._root.children.items()]
+        while stack:
+            node, char, previous = stack.pop()
+            row = [previous[0] + 1]
+            for i, query_char in enumerate(word, 1):
+                row.append(min(row[i - 1] + 1, previous[i] + 1, previous[i - 1] + (query_char != char)))
+
+            edits = row[-1]
+            if edits <= max_edits:
+                # The whole query is within reach of this prefix
+                for customer_id in node.ids:
+                    if edits < matches.get(customer_id, max_edits + 1):
+                        matches[customer_id] = edits
+            if min(row) <= max_edits:
+                stack.extend((child, next_char, row) for next_char, child in node.children.items())
+
+        return matches
+
+
+class CustomerSearchIndex:
+    """Per-process trie over every customer's search_text (SQLite backend)"""
+
+    def __init__(self, ttl=CUSTOMER_SEARCH_TTL):
+        self.ttl = ttl
+        self._trie = PrefixTrie()
+        self._words = {}  # customer id -> words in the trie
+        self._names = {}  # customer id -> normalized business name (ranking)
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _query_entries(self, customer_id=None):
+        """{customer id: (words, normalized business name)}"""
+        from models import db, Customer
+
+        query = db.session.query(Customer.id, Customer.search_text, *[getattr(Customer, f) for f in SEARCH_FIELDS])
+        if customer_id is not None:
+            query = query.filter(Customer.id == customer_id)
+
+        # search_text is backfilled by init_db.py; derive it for rows that predate it
+        return {
+            row.id: (
+                (row.search_text if row.search_text is not None else customer_search_text(row)).split(),
+                ' '.join(search_words(row.business_name))
+            )
+            for row in query.all()
+        }
+
+    def warm(self):
+        """(Re)build the whole trie"""
+        entries = self._query_entries()
+        trie = PrefixTrie()
+        for customer_id, (words, _) in entries.items():
+            for word in words:
+                trie.add(word, customer_id)
+
+        with self._lock:
+            self._trie = trie
+            self._words = {customer_id: words for customer_id, (words, _) in entries.items()}
+            self._names = {customer_id: name for customer_id, (_, name) in entries.items()}
+            self._loaded_at = time.monotonic()
+
+        return len(entries)
+
+    def _ensure_fresh(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+            self.warm()
+
+    def invalidate(self, customer_id):
+        """Re-index one customer after they were created or changed"""
+        if self._loaded_at is None:
+            return
+        entry = self._query_entries(customer_id).get(customer_id)
+
+        with self._lock:
+            for word in self._words.pop(customer_id, []):
+                self._trie.remove(word, customer_id)
+            self._names.pop(customer_id, None)
+            if entry:
+                words, self._names[customer_id] = entry
+                self._words[customer_id] = words
+                for word in words:
+                    self._trie.add(word, customer_id)
+
+    def search(self, words, limit):
+        """Ids of the best limit customers matching every query word"""
+        self._ensure_fresh()
+        matches = None
+        for word in words:
+            with self._lock:  # invalidate() edits the trie in place
+                word_matches = self._trie.match(word, _max_edits(word))
+            if matches is None:
+                matches = word_matches
+            else:
+                matches = {
+                    customer_id: edits + word_matches[customer_id]
+                    for customer_id, edits in matches.items() if customer_id in word_matches
+                }
+            if not matches:
+                return []
+
+        # Ranked from the index alone - only the page is read from the database
+        q = ' '.join(words)
+        names = self._names
+        return sorted(matches, key=lambda customer_id: (
+            matches[customer_id],
+            not names.get(customer_id, '').startswith(q),
+            names.get(customer_id, '')
+        ))[:limit]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_customer_search_index():
+    """Process-wide customer search trie"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = CustomerSearchIndex()
+    return _index
+
+
+def _postgres_search(words, limit):
+    from models import db, Customer
+
+    # Words are [a-z0-9] only (search_words), so nothing to escape for LIKE
+    q = ' '.join(words)
+    contains_all = and_(*[Customer.search_text.like(f"%{word}%") for word in words])
+    similarity = func.word_similarity(q, Customer.search_text)
+    name_prefix = Customer.search_text.like(f"{q}%")  # search_text starts with the business name
+
+    # Typo matches only for words - a phone number one digit off is someone else
+    matches = contains_all if all(word.isdigit() for word in words) else or_(
+        contains_all, Customer.search_text.op('%>')(q)
+    )
+
+    return db.session.query(*select_fields(Customer, RESULT_FIELDS)).filter(matches).order_by(
+        case((contains_all, 0), else_=1), case((name_prefix, 0), else_=1),
+        similarity.desc(), Customer.business_name
+    ).limit(limit).all()
+
+
+def _sqlite_search(words, limit):
+    from models import db, Customer
+
+    ids = get_customer_search_index().search(words, limit)
+    if not ids:
+        return []
+
+    rows = db.session.query(*select_fields(Customer, RESULT_FIELDS)).filter(Customer.id.in_(ids)).all()
+    position = {customer_id: i for i, customer_id in enumerate(ids)}
+    return sorted(rows, key=lambda row: position[row.id])
+
+
+def search_customers(q, limit=10):
+    """
+    Customers matching q, best first
+
+    Returns:
+        List of dicts with RESULT_FIELDS
+    """
+    from models import db
+
+    words = search_words(q)
+    if not words:
+        return []
+
+    if db.engine.dialect.name == 'postgresql':
+        rows = _postgres_search(words, limit)
+    else:
+        rows = _sqlite_search(words, limit)
+    return project_rows(rows, RESULT_FIELDS)
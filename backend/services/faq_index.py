@@ -0,0 +1,400 @@
+"""
+Local FAQ answer index
+
+Most calls ask the same handful of things - hours, prices, the customer's own
+FAQs - and every one of them used to be a gpt-4o-mini round trip. Each
+customer now gets a small TF-IDF index (NumPy) over:
+
+- their FAQ questions
+- business hours (built from business_hours, matched against common
+  phrasings): the whole week for a general hours question, one day for
+  "Are you open on Monday?" - or for "Are you open today?", today in the
+  customer's timezone - and Saturday and Sunday for the weekend
+- pricing (when pricing_info is short enough to read out)
+
+The gather path checks the caller's utterance against it first. A confident
+match plays the stored answer from pre-rendered audio (services/customer_audio)
+and skips the LLM entirely; anything else falls through to the model as
+before. Confident means a single question (one clause), most of whose words
+the matched answer's phrasings use, saying most of one of those phrasings -
+a wrong canned answer is worse than a model round trip.
+
+Indexes are built from the routing snapshot (services/call_routing), so they
+are rebuilt whenever a customer's settings change, and memoized by a hash of
+their content so periodic table reloads don't redo the work.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+from collections import OrderedDict, namedtuple
+import numpy as np
+from services.call_stats import local_now
+
+FAQ_MATCH_THRESHOLD = float(os.environ.get('FAQ_MATCH_THRESHOLD', 0.6))  # Min cosine similarity
+FAQ_MATCH_MARGIN = float(os.environ.get('FAQ_MATCH_MARGIN', 0.1))  # Min lead over the next-best answer
+FAQ_MIN_COVERAGE = 0.75  # Share of the caller's words the matched answer's phrasings must use
+FAQ_MIN_PHRASING_COVERAGE = 0.6  # Share of the best phrasing's words the caller must have said
+MAX_SPOKEN_PRICING = 300  # Longer pricing_info is left to the model to paraphrase
+
+DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+WEEKEND = ['saturday', 'sunday']
+
+# The whole week
+HOURS_QUESTIONS = [
+    "What are your hours?",
+    "What are your business hours?",
+    "When are you open?",
+    "What days are you open?",
+]
+
+# Today's hours (the day is only known when the caller asks)
+TODAY_HOURS_KIND = 'hours_today'
+TODAY_HOURS_QUESTIONS = [
+    "Are you open?",
+    "Are you open today?",
+    "Are you open right now?",
+    "What are your hours today?",
+    "What time do you open?",
+    "What time do you close?",
+    "What time do you close today?",
+    "How late are you open?",
+    "How late are you open today?",
+]
+
+WEEKEND_HOURS_QUESTIONS = [
+    "Are you open on the weekend?",
+    "Are you open on weekends?",
+    "What are your weekend hours?",
+    "Are you open on Saturday and Sunday?",
+]
+
+DAY_HOURS_QUESTIONS = [
+    "Are you open on {day}?",
+    "What are your {day} hours?",
+    "What are your hours on {day}?",
+    "What time do you open on {day}?",
+    "What time do you close on {day}?",
+]
+
+PRICING_QUESTIONS = [
+    "How much does it cost?",
+    "What are your prices?",
+    "What do you charge?",
+    "How much do you charge?",
+    "What is the price?",
+    "What are your rates?",
+]
+
+_STOPWORDS = frozenset("""
+a an the and or but if of to in on at for with by from about as into is are was were be been being
+do does did i me my we our you your he she it its they them their this that these those there here
+can could would should will shall may might must please just so very really um uh like hi hello hey
+okay ok yeah yes thanks thank sure well oh alright also dont im ive youre tell know want wanted wondering
+""".split())
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_APOSTROPHES = re.compile(r"['’]")
+
+# Where one clause or question ends and another starts ("and"/"or" only
+# before a clause, not between two words as in "licensed and insured")
+_CLAUSE_BREAK = re.compile(
+    r"[.?!;,]+|\b(?:but|also|plus|because|although|though|while|so|then)\b"
+    r"|\b(?:and|or)\b(?=\s+[\w']+\s+\w)",
+    re.IGNORECASE
+)
+
+FAQEntry = namedtuple('FAQEntry', ['kind', 'questions', 'answer'])
+FAQMatch = namedtuple('FAQMatch', ['kind', 'answer', 'score'])
+
+_stats = {'lookups': 0, 'hits': 0}
+_stats_lock = threading.Lock()
+
+
+def _stem(token):
+    """Crude suffix stripping that maps inflections to the same stem ("estimates"/"estimate" -> "estimat")"""
+    if len(token) > 4 and token.endswith('ies'):
+        return token[:-3] + 'y'
+    for suffix in ('ing', 'ed', 's'):
+        if len(token) > len(suffix) + 2 and token.endswith(suffix) and not token.endswith('ss'):
+            token = token[:-len(suffix)]
+            break
+    if len(token) > 3 and token.endswith('e'):
+        token = token[:-1]
+    return token
+
+
+def _words(text):
+    return _TOKEN.findall(_APOSTROPHES.sub('', (text or '').lower()))
+
+
+def tokenize(text):
+    """Lowercased, stemmed content words plus adjacent-word bigrams"""
+    words = [_stem(w) for w in _words(text) if w not in _STOPWORDS]
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+def content_clauses(text):
+    """Number of clauses/questions in text that have content words ("Hi, what are your hours?" is one)"""
+    return sum(
+        1 for part in _CLAUSE_BREAK.split(text or '')
+        if any(w not in _STOPWORDS for w in _words(part))
+    )
+
+
+def _day_hours(business_hours, day):
+    """"Monday 9:00 AM to 5:00 PM" / "closed Sunday" (None if the day isn't set)"""
+    info = business_hours.get(day)
+    if not info:
+        return None
+    if info.get('closed'):
+        return f"closed {day.capitalize()}"
+    if info.get('open') and info.get('close'):
+        return f"{day.capitalize()} {info['open']} to {info['close']}"
+    return None
+
+
+def hours_answer(business_hours):
+    """Spoken sentence for a business_hours dict (None if no hours are set)"""
+    if not business_hours:
+        return None
+
+    parts = [part for part in (_day_hours(business_hours, day) for day in DAYS) if part]
+
+    if not parts:
+        return None
+    if len(parts) == 1:
+        return f"Our hours are {parts[0]}."
+    return f"Our hours are {', '.join(parts[:-1])}, and {parts[-1]}."
+
+
+def _open_or_closed(business_hours, day):
+    """"open Monday 9:00 AM to 5:00 PM" / "closed Sunday" (None if the day isn't set)"""
+    part = _day_hours(business_hours or {}, day)
+    if part and not part.startswith('closed'):
+        return f"open {part}"
+    return part
+
+
+def day_hours_answer(business_hours, day):
+    """Spoken sentence for one day's hours (None if the day isn't set)"""
+    part = _open_or_closed(business_hours, day)
+    return f"We're {part}." if part else None
+
+
+def weekend_hours_answer(business_hours):
+    """Spoken sentence for Saturday and Sunday (None if neither is set)"""
+    parts = [part for part in (_open_or_closed(business_hours, day) for day in WEEKEND) if part]
+    return f"On the weekend we're {' and '.join(parts)}." if parts else None
+
+
+def _answer_kind(answer):
+    return f"faq_{hashlib.sha256(answer.encode('utf-8')).hexdigest()[:12]}"
+
+
+def faq_entries(faqs, business_hours, pricing_info):
+    """
+    Everything the index can answer
+
+    Returns:
+        List of FAQEntry - kind doubles as the pre-rendered audio kind
+        (except TODAY_HOURS_KIND, whose answer is None until match time)
+    """
+    entries = []
+
+    for faq in faqs or []:
+        question = (faq.get('question') or '').strip()
+        answer = (faq.get('answer') or '').strip()
+        if question and answer:
+            entries.append(FAQEntry(_answer_kind(answer), [question], answer))
+
+    hours = hours_answer(business_hours)
+    if hours:
+        entries.append(FAQEntry('hours', HOURS_QUESTIONS, hours))
+
+        weekend = weekend_hours_answer(business_hours)
+        if weekend:
+            entries.append(FAQEntry('hours_weekend', WEEKEND_HOURS_QUESTIONS, weekend))
+
+        for day in DAYS:
+            answer = day_hours_answer(business_hours, day)
+            if answer:
+                questions = [question.format(day=day.capitalize()) for question in DAY_HOURS_QUESTIONS]
+                entries.append(FAQEntry(f"hours_{day}", questions, answer))
+
+        # Answered with one of the days above when the caller asks
+        entries.append(FAQEntry(TODAY_HOURS_KIND, TODAY_HOURS_QUESTIONS, None))
+
+    pricing = (pricing_info or '').strip()
+    if pricing and len(pricing) <= MAX_SPOKEN_PRICING:
+        entries.append(FAQEntry('pricing', PRICING_QUESTIONS, pricing))
+
+    return entries
+
+
+class TfidfMatrix:
+    """L2-normalized TF-IDF rows over a small tokenized corpus"""
+
+    def __init__(self, rows):
+        vocabulary = {}
+        for tokens in rows:
+            for token in tokens:
+                vocabulary.setdefault(token, len(vocabulary))
+        self.vocabulary = vocabulary
+
+        # Smoothed IDF over this corpus only
+        document_frequency = np.zeros(len(vocabulary), dtype=np.float32)
+        for tokens in rows:
+            for token in set(tokens):
+                document_frequency[vocabulary[token]] += 1
+        self.idf = np.log((1 + len(rows)) / (1 + document_frequency)) + 1
+
+        self.matrix = np.zeros((len(rows), len(vocabulary)), dtype=np.float32)
+        for r, tokens in enumerate(rows):
+            self.matrix[r] = self.vectorize(tokens)
+
+    def vectorize(self, tokens):
+        vector = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for token in tokens:
+            index = self.vocabulary.get(token)
+            if index is not None:
+                vector[index] += 1
+
+        # Sublinear term frequency, L2-normalized
+        nonzero = vector > 0
+        vector[nonzero] = (1 + np.log(vector[nonzero])) * self.idf[nonzero]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def scores(self, tokens):
+        """Cosine similarity of every row to tokens (all zeros if nothing is known)"""
+        return self.matrix @ self.vectorize(tokens)
+
+
+class FAQIndex:
+    """TF-IDF vectors of every known question, one row per phrasing"""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.by_kind = {entry.kind: entry for entry in entries}
+
+        rows = []
+        row_entry = []
+        for i, entry in enumerate(entries):
+            for question in entry.questions:
+                tokens = tokenize(question)
+                if tokens:
+                    rows.append(tokens)
+                    row_entry.append(i)
+
+        self.tfidf = TfidfMatrix(rows)
+        self.row_entry = np.array(row_entry, dtype=np.int32)
+
+        # Content words per phrasing, and per answer across its phrasings
+        self.row_words = [{t for t in tokens if '_' not in t} for tokens in rows]
+        self.entry_words = [set() for _ in entries]
+        for words, i in zip(self.row_words, row_entry):
+            self.entry_words[i] |= words
+
+    def match(self, text, timezone_name=None, now=None):
+        """
+        Best stored answer for what the caller said
+
+        Args:
+            text: What the caller said
+            timezone_name: Customer's IANA timezone, for "today" (None = DEFAULT_TIMEZONE)
+            now: Current time (naive UTC, default now)
+
+        Returns:
+            FAQMatch if the match is confident, else None
+        """
+        with _stats_lock:
+            _stats['lookups'] += 1
+
+        if not len(self.row_entry):
+            return None
+
+        tokens = tokenize(text)
+        words = [t for t in tokens if '_' not in t]
+        # "What time do you close? Also my sink is flooding" needs the model
+        if not words or content_clauses(text) > 1:
+            return None
+
+        scores = self.tfidf.scores(tokens)
+        if not scores.any():
+            return None
+
+        # Unknown words in the utterance dilute the score: scale by the share
+        # of its words we have vectors for
+        coverage = math.sqrt(sum(1 for t in words if t in self.tfidf.vocabulary) / len(words))
+        scores = scores * coverage
+
+        best_per_entry = np.zeros(len(self.entries), dtype=np.float32)
+        np.maximum.at(best_per_entry, self.row_entry, scores)
+
+        ranked = np.argsort(best_per_entry)[::-1]
+        best = float(best_per_entry[ranked[0]])
+        runner_up = float(best_per_entry[ranked[1]]) if len(ranked) > 1 else 0.0
+
+        if best < FAQ_MATCH_THRESHOLD or best - runner_up < FAQ_MATCH_MARGIN:
+            return None
+
+        # Most of what the caller said must be something this answer is about
+        # ("how much to fix a leaking faucet" isn't the price list)...
+        entry_index = int(ranked[0])
+        said = set(words)
+        if len(said & self.entry_words[entry_index]) / len(said) < FAQ_MIN_COVERAGE:
+            return None
+
+        # ...and they must have asked most of one of its phrasings, not just
+        # named a day ("Sunday")
+        rows = np.flatnonzero(self.row_entry == entry_index)
+        phrasing = self.row_words[int(rows[np.argmax(scores[rows])])]
+        if len(said & phrasing) / len(phrasing) < FAQ_MIN_PHRASING_COVERAGE:
+            return None
+
+        with _stats_lock:
+            _stats['hits'] += 1
+
+        entry = self.entries[entry_index]
+        if entry.kind == TODAY_HOURS_KIND:
+            today = DAYS[local_now(timezone_name, now).weekday()]
+            entry = self.by_kind.get(f"hours_{today}") or self.by_kind['hours']
+        return FAQMatch(entry.kind, entry.answer, best)
+
+
+_indexes = OrderedDict()  # content hash -> FAQIndex (or None)
+_indexes_lock = threading.Lock()
+_MAX_INDEXES = 1000
+
+
+def get_faq_index(faqs, business_hours, pricing_info):
+    """FAQ index for a customer's current settings (None if there's nothing to index)"""
+    key = hashlib.sha256(
+        json.dumps([faqs, business_hours, pricing_info], sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()
+
+    with _indexes_lock:
+        if key in _indexes:
+            _indexes.move_to_end(key)
+            return _indexes[key]
+
+    entries = faq_entries(faqs, business_hours, pricing_info)
+    index = FAQIndex(entries) if entries else None
+
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > _MAX_INDEXES:
+            _indexes.popitem(last=False)
+
+    return index
+
+
+def get_faq_stats():
+    """Lookup/hit counts for this worker process"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['hit_rate'] = stats['hits'] / stats['lookups'] if stats['lookups'] else 0.0
+    return stats
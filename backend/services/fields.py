@@ -0,0 +1,110 @@
+"""
+List projections and sparse fieldsets
+
+List endpoints used to serialize every row with the full to_dict(), so the
+ORM loaded wide TEXT/JSON columns (call transcripts, customer AI
+instructions, FAQs, pricing) that no list renders. Lists now load and
+return only their LIST_FIELDS (see Call and Customer in models.py); detail
+endpoints keep returning the full record.
+
+Clients can narrow a list further - or opt in to a wide field a list leaves
+out by default - with ?fields=a,b,c. Only the matching columns are loaded.
+
+The hottest lists (calls) skip the ORM altogether: select_fields() queries
+plain columns and project_rows() turns the Row tuples into dicts, leaving
+datetimes for the JSON provider (services/json_provider.py) to encode.
+"""
+from datetime import date, datetime
+from operator import itemgetter
+from sqlalchemy.orm import load_only
+
+
+class InvalidFields(ValueError):
+    """?fields= named something the endpoint doesn't offer"""
+
+
+def parse_fields(raw, default, allowed, required=('id',)):
+    """
+    Fields to return for a list
+
+    Args:
+        raw: ?fields= value (comma-separated), or None for the default set
+        default: Fields returned when none are asked for
+        allowed: Every field the endpoint can return
+        required: Always included (ids, pagination keys)
+
+    Returns:
+        Tuple of field names, in the order given
+
+    Raises:
+        InvalidFields
+    """
+    if not raw:
+        fields = list(default)
+    else:
+        fields = [field.strip() for field in raw.split(',') if field.strip()]
+        unknown = [field for field in fields if field not in allowed]
+        if unknown:
+            raise InvalidFields(f"Unknown fields: {', '.join(unknown)}")
+
+    for field in reversed(required):
+        if field not in fields:
+            fields.insert(0, field)
+
+    return tuple(dict.fromkeys(fields))
+
+
+def load_fields(model, fields, extra=()):
+    """load_only() option for the columns behind fields (plus extra columns)"""
+    columns = model.__table__.columns
+    names = [name for name in (*fields, *extra) if name in columns]
+    return load_only(*[getattr(model, name) for name in dict.fromkeys(names)])
+
+
+def select_fields(model, fields, extra=()):
+    """Columns behind fields (plus extra columns), for db.session.query(*columns)"""
+    columns = model.__table__.columns
+    names = [name for name in (*fields, *extra) if name in columns]
+    return [getattr(model, name) for name in dict.fromkeys(names)]
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def project(row, fields, computed=None):
+    """
+    Dict of the given fields of a row
+
+    Args:
+        computed: {field: function(row)} for fields that aren't plain columns
+    """
+    computed = computed or {}
+    return {
+        field: computed[field](row) if field in computed else _json_value(getattr(row, field))
+        for field in fields
+    }
+
+
+def project_rows(rows, fields, computed=None):
+    """
+    Dicts of the given fields for Rows from a select_fields() query
+
+    Values are passed through as they are (datetimes included) - only use
+    for rows that go straight to jsonify.
+
+    Args:
+        computed: {field: function(row)} for fields that aren't plain columns
+    """
+    if not rows:
+        return []
+
+    computed = computed or {}
+    positions = {name: index for index, name in enumerate(rows[0]._fields)}
+    getters = [
+        (field, computed[field] if field in computed else itemgetter(positions[field]))
+        for field in fields
+    ]
+    return [{field: get(row) for field, get in getters} for row in rows]
@@ -0,0 +1,150 @@
+"""
+Process-wide outbound API clients
+
+Building a vendor client per request (a new OpenAI() per webhook hit, a new
+Twilio Client per SMS, a new SendGridAPIClient per email) pays DNS, TCP and
+TLS setup on every call. Instead each worker process keeps one long-lived
+client per vendor with a keep-alive connection pool:
+
+- OpenAI: httpx pool, HTTP/2 when the h2 package is installed
+- Twilio: requests session via TwilioHttpClient(pool_connections=True)
+- SendGrid: requests session posting straight to the v3 mail/send API
+  (the official client opens a fresh urllib connection for every send)
+- Stripe: stripe.default_http_client with a persistent requests session
+
+Fork safety: gunicorn forks workers after importing the app, and a pooled
+socket must never be shared between processes. Clients remember the pid that
+created them and are rebuilt on first use in a new process.
+"""
+import os
+import threading
+
+OPENAI_TIMEOUT = float(os.environ.get('OPENAI_TIMEOUT', 30))
+OPENAI_CONNECT_TIMEOUT = float(os.environ.get('OPENAI_CONNECT_TIMEOUT', 5))
+OPENAI_MAX_CONNECTIONS = int(os.environ.get('OPENAI_MAX_CONNECTIONS', 20))
+OPENAI_HTTP2 = os.environ.get('OPENAI_HTTP2', 'true').lower() == 'true'
+TWILIO_TIMEOUT = float(os.environ.get('TWILIO_TIMEOUT', 10))
+SENDGRID_TIMEOUT = float(os.environ.get('SENDGRID_TIMEOUT', 10))
+STRIPE_TIMEOUT = float(os.environ.get('STRIPE_TIMEOUT', 30))
+
+SENDGRID_SEND_URL = 'https://api.sendgrid.com/v3/mail/send'
+
+_clients = {}
+_pid = None
+_lock = threading.Lock()
+
+
+def _get(name, factory):
+    """Client `name` for this process, created by factory() on first use"""
+    global _pid
+
+    pid = os.getpid()
+    client = _clients.get(name) if _pid == pid else None
+    if client is not None:
+        return client
+
+    with _lock:
+        if _pid != pid:
+            # Forked (or first use) - drop the parent's clients without closing
+            # them, their sockets still belong to the parent
+            _clients.clear()
+            _pid = pid
+
+        client = _clients.get(name)
+        if client is None:
+            client = factory()
+            _clients[name] = client
+        return client
+
+
+def _httpx_client(async_client=False):
+    import httpx
+
+    options = {
+        'timeout': httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+        'limits': httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_CONNECTIONS
+        )
+    }
+    client_class = httpx.AsyncClient if async_client else httpx.Client
+
+    if OPENAI_HTTP2:
+        try:
+            return client_class(http2=True, **options)
+        except ImportError:
+            print("h2 not installed - OpenAI client falling back to HTTP/1.1")
+
+    return client_class(**options)
+
+
+def get_openai_client():
+    """Shared OpenAI client (chat, TTS, summaries)"""
+    def create():
+        from openai import OpenAI
+        return OpenAI(api_key=os.environ.get('OPENAI_API_KEY'), http_client=_httpx_client())
+
+    return _get('openai', create)
+
+
+def create_async_openai_client():
+    """AsyncOpenAI client with the same pool settings (one per event loop)"""
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=os.environ.get('OPENAI_API_KEY'), http_client=_httpx_client(async_client=True))
+
+
+def get_twilio_client():
+    """Shared Twilio REST client (SMS, live call updates)"""
+    def create():
+        from twilio.rest import Client
+        from twilio.http.http_client import TwilioHttpClient
+
+        return Client(
+            os.environ.get('TWILIO_ACCOUNT_SID'),
+            os.environ.get('TWILIO_AUTH_TOKEN'),
+            http_client=TwilioHttpClient(pool_connections=True, timeout=TWILIO_TIMEOUT)
+        )
+
+    return _get('twilio', create)
+
+
+def _sendgrid_session():
+    def create():
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=10))
+        return session
+
+    return _get('sendgrid', create)
+
+
+def send_email(message):
+    """
+    Send a sendgrid.helpers.mail.Mail over the pooled SendGrid session
+
+    Returns:
+        requests.Response (raises requests.HTTPError on a 4xx/5xx, like
+        SendGridAPIClient.send does)
+    """
+    response = _sendgrid_session().post(
+        SENDGRID_SEND_URL,
+        json=message.get(),
+        headers={'Authorization': f"Bearer {os.environ.get('SENDGRID_API_KEY')}"},
+        timeout=SENDGRID_TIMEOUT
+    )
+    response.raise_for_status()
+    return response
+
+
+def configure_stripe():
+    """Point the stripe module at a persistent, pooled HTTP client"""
+    def create():
+        import stripe
+
+        stripe.api_key = os.environ.get('STRIPE_SECRET_KEY')
+        stripe.default_http_client = stripe.RequestsClient(timeout=STRIPE_TIMEOUT)
+        return stripe.default_http_client
+
+    return _get('stripe', create)
@@ -0,0 +1,273 @@
+"""
+Durable DB-backed job queue
+
+Slow follow-up work (the post-call GPT summary, notification email and SMS)
+must not run inside Twilio's status callback. The webhook inserts a row into
+the jobs table in the same transaction as the call update and returns;
+worker processes (worker.py) claim and run the jobs.
+
+Claiming: the next due job is selected with FOR UPDATE SKIP LOCKED on
+Postgres, so concurrent workers never block on or double-claim a row. SQLite
+has no row locks - there the claim is a conditional UPDATE
+(... WHERE status = 'queued'), which SQLite's single writer makes atomic;
+a worker that loses the race just tries the next job.
+
+Retries: a failing job is re-queued with exponential backoff until it has
+used max_attempts, then marked failed (last_error keeps the reason). A
+handler that isn't ready yet raises JobRetry instead, which re-queues it
+after a fixed delay without using up an attempt. Jobs left 'running' by a
+crashed worker are re-queued after JOB_LOCK_TIMEOUT.
+
+Unique keys: a unique index on jobs.unique_key (failed jobs excluded) makes
+enqueue an INSERT ... ON CONFLICT DO NOTHING, so concurrent requests can't
+both add the same job. Jobs of a type registered with once=True keep their
+key for good (at most one successful run per key); other types release it
+when a worker claims the job, so the key only coalesces queued requests.
+
+Concurrency: each job type declares how many jobs of that type a worker
+process runs at once (one thread each). Override with JOB_CONCURRENCY, e.g.
+"summarize_call=4,send_call_sms=1", or run separate worker processes per
+type (python worker.py summarize_call).
+"""
+import os
+import random
+import socket
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, Job, JOB_LIVE_KEY
+
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1.0))  # Seconds between polls when idle
+JOB_LOCK_TIMEOUT = int(os.environ.get('JOB_LOCK_TIMEOUT', 300))  # Re-queue 'running' jobs older than this
+JOB_BACKOFF_BASE = int(os.environ.get('JOB_BACKOFF_BASE', 10))  # Seconds before the first retry
+JOB_BACKOFF_MAX = int(os.environ.get('JOB_BACKOFF_MAX', 3600))
+JOB_RETENTION_DAYS = int(os.environ.get('JOB_RETENTION_DAYS', 7))  # Finished jobs are kept this long
+
+JobType = namedtuple('JobType', ['name', 'handler', 'concurrency', 'max_attempts', 'once'])
+
+JOB_TYPES = {}  # name -> JobType (filled by @job, see services/call_jobs.py)
+
+
+def _concurrency_overrides():
+    overrides = {}
+    for item in os.environ.get('JOB_CONCURRENCY', '').split(','):
+        name, _, value = item.partition('=')
+        if name.strip() and value.strip().isdigit():
+            overrides[name.strip()] = int(value)
+    return overrides
+
+
+class JobRetry(Exception):
+    """Raised by a handler to run again after delay seconds (not counted as a failed attempt)"""
+
+    def __init__(self, delay, reason=''):
+        super().__init__(reason or f"retry in {delay}s")
+        self.delay = delay
+
+
+def job(name, concurrency=2, max_attempts=5, once=False):
+    """
+    Register a job handler
+
+    The handler is called with the job's payload dict inside an app context.
+    Raising an exception fails the attempt (and schedules a retry).
+
+    once: Jobs of this type keep their unique_key after running, so the same
+        key is never enqueued again unless the job failed
+    """
+    def register(handler):
+        limit = _concurrency_overrides().get(name, concurrency)
+        JOB_TYPES[name] = JobType(name, handler, limit, max_attempts, once)
+        return handler
+    return register
+
+
+def enqueue(job_type, payload=None, delay=0, commit=True, unique_key=None):
+    """
+    Add a job to the queue
+
+    Args:
+        job_type: Registered job name
+        payload: JSON-serializable dict passed to the handler
+        delay: Seconds before the job may run
+        commit: Commit now (pass False to enqueue in the caller's transaction)
+        unique_key: Skip enqueueing if a job with this key is still queued
+            (coalesces repeated requests for the same work) - or, for a
+            once job type, running or done
+
+    Returns:
+        Job, or None if a job with unique_key already exists
+    """
+    values = {
+        'job_type': job_type,
+        'payload': payload or {},
+        'unique_key': unique_key,
+        'max_attempts': JOB_TYPES[job_type].max_attempts if job_type in JOB_TYPES else 5,
+        'run_at': datetime.utcnow() + timedelta(seconds=delay)
+    }
+
+    if unique_key:
+        # Atomic against a concurrent enqueue of the same key (unlike a
+        # SELECT first): the loser's insert is simply skipped
+        dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+        insert = dialect.insert(Job).values(**values).on_conflict_do_nothing(
+            index_elements=['unique_key'], index_where=JOB_LIVE_KEY
+        ).returning(Job.id)
+        job_id = db.session.execute(insert).scalar()
+        if job_id is None:
+            return None
+        new_job = db.session.get(Job, job_id)
+    else:
+        new_job = Job(**values)
+        db.session.add(new_job)
+
+    if commit:
+        db.session.commit()
+
+    return new_job
+
+
+def worker_id():
+    """Identifies the claiming thread in jobs.locked_by"""
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def claim(job_types, locked_by=None):
+    """
+    Claim the next due job of one of job_types
+
+    Returns:
+        Job now marked running, or None if nothing is due
+    """
+    locked_by = locked_by or worker_id()
+    postgres = db.engine.dialect.name == 'postgresql'
+
+    for _ in range(3):  # Lost races (SQLite) - try the next candidate
+        now = datetime.utcnow()
+        query = db.session.query(Job.id, Job.job_type).filter(
+            Job.status == 'queued',
+            Job.job_type.in_(job_types),
+            Job.run_at <= now
+        ).order_by(Job.run_at, Job.id).limit(1)
+
+        if postgres:
+            query = query.with_for_update(skip_locked=True)
+
+        candidate = query.first()
+        if candidate is None:
+            db.session.rollback()
+            return None
+
+        changes = {
+            Job.status: 'running',
+            Job.attempts: Job.attempts + 1,
+            Job.locked_by: locked_by,
+            Job.locked_at: now
+        }
+        job_type = JOB_TYPES.get(candidate.job_type)
+        if not (job_type and job_type.once):
+            # Coalescing only applies while queued - let the next request in
+            changes[Job.unique_key] = None
+
+        claimed = db.session.query(Job).filter(
+            Job.id == candidate.id,
+            Job.status == 'queued'
+        ).update(changes, synchronize_session=False)
+        db.session.commit()
+
+        if claimed:
+            return db.session.get(Job, candidate.id)
+
+    return None
+
+
+def backoff_seconds(attempts):
+    """Exponential backoff with jitter (attempts = attempts used so far)"""
+    delay = min(JOB_BACKOFF_BASE * (2 ** max(attempts - 1, 0)), JOB_BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def run_job(claimed_job):
+    """Run a claimed job and record the outcome"""
+    job_id = claimed_job.id
+    job_type = JOB_TYPES.get(claimed_job.job_type)
+    payload = claimed_job.payload or {}
+
+    try:
+        if job_type is None:
+            raise RuntimeError(f"No handler registered for job type {claimed_job.job_type}")
+        job_type.handler(payload)
+    except JobRetry as retry:
+        db.session.rollback()
+        waiting_job = db.session.get(Job, job_id)
+        waiting_job.status = 'queued'
+        waiting_job.attempts -= 1  # Not ready yet isn't a failure
+        waiting_job.run_at = datetime.utcnow() + timedelta(seconds=retry.delay)
+        waiting_job.locked_by = None
+        waiting_job.locked_at = None
+        db.session.commit()
+        return False
+    except Exception as e:
+        db.session.rollback()
+        failed_job = db.session.get(Job, job_id)
+        failed_job.last_error = f"{type(e).__name__}: {e}"
+        failed_job.locked_by = None
+        failed_job.locked_at = None
+
+        if failed_job.attempts >= failed_job.max_attempts:
+            failed_job.status = 'failed'
+            failed_job.finished_at = datetime.utcnow()
+            print(f"Job {job_id} ({failed_job.job_type}) failed permanently: {e}")
+        else:
+            delay = backoff_seconds(failed_job.attempts)
+            failed_job.status = 'queued'
+            failed_job.run_at = datetime.utcnow() + timedelta(seconds=delay)
+            print(f"Job {job_id} ({failed_job.job_type}) failed, retrying in {delay:.0f}s: {e}")
+
+        db.session.commit()
+        return False
+
+    done_job = db.session.get(Job, job_id)
+    done_job.status = 'done'
+    done_job.finished_at = datetime.utcnow()
+    done_job.locked_by = None
+    done_job.locked_at = None
+    db.session.commit()
+    return True
+
+
+def requeue_stale():
+    """Re-queue jobs whose worker died mid-run; prune old finished jobs"""
+    now = datetime.utcnow()
+
+    stale = db.session.query(Job).filter(
+        Job.status == 'running',
+        Job.locked_at < now - timedelta(seconds=JOB_LOCK_TIMEOUT)
+    ).update({
+        Job.status: 'queued',
+        Job.locked_by: None,
+        Job.locked_at: None,
+        Job.run_at: now
+    }, synchronize_session=False)
+
+    pruned = db.session.query(Job).filter(
+        Job.status.in_(('done', 'failed')),
+        Job.finished_at < now - timedelta(days=JOB_RETENTION_DAYS)
+    ).delete(synchronize_session=False)
+
+    db.session.commit()
+    return stale, pruned
+
+
+def get_queue_stats():
+    """Job counts by type and status"""
+    stats = {}
+    rows = db.session.query(Job.job_type, Job.status, db.func.count(Job.id)).group_by(
+        Job.job_type, Job.status
+    ).all()
+
+    for job_type, status, count in rows:
+        stats.setdefault(job_type, {})[status] = count
+
+    return stats
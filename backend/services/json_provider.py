@@ -0,0 +1,55 @@
+"""
+JSON provider for API responses
+
+Flask's default provider encodes with the stdlib json module and turns
+datetimes into HTTP dates, so every row went through to_dict()/isoformat()
+before jsonify could touch it. This provider encodes with orjson, which
+handles datetimes (as ISO 8601, the format the API already returns), dates
+and UUIDs natively and is several times faster on large lists.
+
+Only dumps() and loads() are overridden - Flask's own response() builds the
+response around dumps(), so no private Flask hooks are relied on.
+
+Without orjson installed it falls back to the stdlib encoder with the same
+ISO 8601 datetimes, so responses look the same either way.
+"""
+from datetime import date, datetime
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Optional - stdlib json is used instead
+    orjson = None
+
+
+class APIJSONProvider(DefaultJSONProvider):
+    """app.json for create_app()"""
+
+    @staticmethod
+    def default(o):
+        # Same output as orjson for the types it handles natively
+        if isinstance(o, (datetime, date)):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+    def _orjson_options(self, indent=False):
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def _encode(self, obj, indent=False):
+        return orjson.dumps(obj, default=self.default, option=self._orjson_options(indent))
+
+    def dumps(self, obj, **kwargs):
+        # orjson only covers the arguments Flask itself passes
+        if orjson is None or set(kwargs) - {'indent', 'separators'}:
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj, indent=bool(kwargs.get('indent'))).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
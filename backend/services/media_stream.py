@@ -0,0 +1,438 @@
+"""
+Real-time conversation engine over Twilio Media Streams
+
+Instead of <Play> + <Gather> + a webhook per turn, customers with
+call_mode='stream' get <Connect><Stream>. Twilio then opens a WebSocket to
+stream_server.py and sends the caller's audio as 20ms μ-law frames. For each
+caller utterance we:
+
+1. Detect the end of speech with a simple energy-based VAD
+2. Transcribe it with Whisper
+3. Stream the chat completion and cut it into sentences as they form
+4. Stream each sentence through TTS (raw PCM) and push μ-law frames back
+   to Twilio while the model is still generating the next one
+
+Barge-in is supported: if the caller starts talking while we're speaking,
+playback is cleared and the in-progress reply is cancelled.
+
+Call/CallLog rows are written in the same shape as the Gather path, so the
+portal, summaries and notifications work unchanged.
+"""
+import asyncio
+import base64
+import json
+import os
+from services.ai_service import AIService, FALLBACK_RESPONSE, TRANSFER_MARKER, record_usage, split_sentences
+from services.call_routing import get_call_router
+from services.conversation_window import load_call_details, needs_memory, window_history
+from services.audio_codec import (
+    FRAME_BYTES, UlawTranscoder, pcm16_to_wav, rms, ulaw_to_pcm16
+)
+from services.customer_audio import (
+    TRANSFER_MESSAGE, TRANSFER_UNAVAILABLE_MESSAGE, default_greeting
+)
+from services.tts_cache import get_tts_cache, tts_cache_key
+
+# Voice activity detection (frames are 20ms)
+VAD_THRESHOLD = float(os.environ.get('STREAM_VAD_THRESHOLD', 600))  # RMS of 16-bit samples
+SPEECH_START_FRAMES = 3  # 60ms of speech starts an utterance
+END_SILENCE_FRAMES = int(os.environ.get('STREAM_END_SILENCE_MS', 700)) // 20
+MAX_UTTERANCE_FRAMES = 15 * 50  # Cut off monologues at 15s
+MIN_UTTERANCE_FRAMES = 10  # Ignore blips shorter than 200ms
+
+STT_MODEL = "whisper-1"
+
+# TTS audio for the stream path is cached already transcoded to μ-law
+STREAM_TTS_FORMAT = "mulaw_8000"
+
+
+def load_call_context(call_id, call_sid):
+    """
+    Load what the session needs about the call (runs in a worker thread
+    inside a Flask app context)
+
+    Returns:
+        (customer snapshot, conversation history) or (None, None) if the
+        call doesn't exist or doesn't match the stream's CallSid
+    """
+    from models import Call, CallLog
+
+    call = Call.query.get(call_id)
+    if not call or call.twilio_call_sid != call_sid:
+        return None, None
+
+    snapshot = get_call_router().get(call.customer_id)
+
+    history = []
+    for log in CallLog.query.filter_by(call_id=call.id).order_by(CallLog.created_at).all():
+        role = "user" if log.speaker == "caller" else "assistant"
+        history.append({"role": role, "content": log.message})
+
+    return snapshot, history
+
+
+def record_turn(call_id, caller_message, ai_message):
+    """Persist one turn exactly like the Gather webhook does (append-only CallLog rows)"""
+    from models import db, CallLog
+    from services.call_jobs import schedule_summary_update
+
+    db.session.add(CallLog(call_id=call_id, speaker='caller', message=caller_message))
+    db.session.add(CallLog(call_id=call_id, speaker='ai', message=ai_message))
+    schedule_summary_update(call_id)
+    db.session.commit()
+
+
+def redirect_call(call_sid, twiml):
+    """Replace the live call's TwiML (ends the stream and runs twiml)"""
+    from services.http_clients import get_twilio_client
+
+    get_twilio_client().calls(call_sid).update(twiml=twiml)
+
+
+class MediaStreamSession:
+    """One caller's WebSocket session"""
+
+    def __init__(self, websocket, flask_app, openai_client):
+        self.websocket = websocket
+        self.flask_app = flask_app
+        self.client = openai_client
+
+        self.stream_sid = None
+        self.call_sid = None
+        self.call_id = None
+        self.customer = None
+        self.history = []
+
+        # VAD state
+        self._utterance = []
+        self._speech_frames = 0
+        self._silence_frames = 0
+        self._in_speech = False
+
+        # Playback state
+        self._reply_task = None
+        self._pending_marks = 0
+        self._mark_counter = 0
+        self._playback_done = asyncio.Event()
+        self._playback_done.set()
+
+    async def _db(self, func, *args):
+        """Run a blocking DB helper in a thread with an app context"""
+        def run():
+            with self.flask_app.app_context():
+                return func(*args)
+        return await asyncio.to_thread(run)
+
+    async def run(self):
+        try:
+            async for raw in self.websocket:
+                message = json.loads(raw)
+                event = message.get('event')
+
+                if event == 'start':
+                    await self._on_start(message)
+                elif event == 'media':
+                    await self._on_media(message['media'])
+                elif event == 'mark':
+                    self._pending_marks = max(0, self._pending_marks - 1)
+                    if not self._pending_marks:
+                        self._playback_done.set()
+                elif event == 'stop':
+                    break
+        finally:
+            if self._reply_task and not self._reply_task.done():
+                self._reply_task.cancel()
+
+    async def _on_start(self, message):
+        start = message['start']
+        self.stream_sid = start['streamSid']
+        self.call_sid = start['callSid']
+        params = start.get('customParameters') or {}
+
+        try:
+            self.call_id = int(params.get('call_id'))
+        except (TypeError, ValueError):
+            await self.websocket.close()
+            return
+
+        self.customer, self.history = await self._db(load_call_context, self.call_id, self.call_sid)
+        if not self.customer:
+            print(f"Media stream for unknown call {self.call_id} ({self.call_sid})")
+            await self.websocket.close()
+            return
+
+        greeting = self.customer.greeting_message or default_greeting(self.customer.business_name)
+        self._reply_task = asyncio.create_task(self._speak_all([greeting]))
+
+    async def _on_media(self, media):
+        if media.get('track', 'inbound') != 'inbound' or not self.customer:
+            return
+
+        samples = ulaw_to_pcm16(base64.b64decode(media['payload']))
+        loud = rms(samples) >= VAD_THRESHOLD
+
+        if not self._in_speech:
+            if loud:
+                self._speech_frames += 1
+                self._utterance.append(samples)
+                if self._speech_frames >= SPEECH_START_FRAMES:
+                    self._in_speech = True
+                    self._silence_frames = 0
+                    await self._barge_in()
+            else:
+                self._speech_frames = 0
+                self._utterance = []
+            return
+
+        self._utterance.append(samples)
+        self._silence_frames = 0 if loud else self._silence_frames + 1
+
+        if self._silence_frames >= END_SILENCE_FRAMES or len(self._utterance) >= MAX_UTTERANCE_FRAMES:
+            utterance = self._utterance
+            self._utterance = []
+            self._speech_frames = 0
+            self._in_speech = False
+
+            if len(utterance) - self._silence_frames >= MIN_UTTERANCE_FRAMES:
+                self._reply_task = asyncio.create_task(self._respond(utterance))
+
+    async def _barge_in(self):
+        """Caller started talking over us - stop playback and the current reply"""
+        speaking = self._pending_marks > 0 or (self._reply_task and not self._reply_task.done())
+        if not speaking:
+            return
+
+        if self._reply_task and not self._reply_task.done():
+            self._reply_task.cancel()
+        self._pending_marks = 0
+        self._playback_done.set()
+        await self.websocket.send(json.dumps({'event': 'clear', 'streamSid': self.stream_sid}))
+
+    async def _respond(self, utterance):
+        samples = utterance[0]
+        for block in utterance[1:]:
+            samples.extend(block)
+
+        caller_message = await self._transcribe(samples)
+        if not caller_message:
+            return
+
+        # Known question (FAQ, hours, pricing)? Answer without the model
+        faq_index = self.customer.faq_index
+        faq_match = faq_index.match(caller_message, self.customer.timezone) if faq_index else None
+        if faq_match:
+            try:
+                await self._speak(faq_match.answer)
+            finally:
+                # Also on barge-in - the answer was (at least partly) said
+                await self._save_turn(caller_message, faq_match.answer)
+            return
+
+        # Recent turns verbatim, older ones folded into a short memory
+        details = await self._db(load_call_details, self.call_id) if needs_memory(self.history) else None
+        history = window_history(self.history, details)
+
+        messages = AIService.build_messages(self.customer, caller_message, history)
+        spoken = []
+        transfer = False
+
+        queue = asyncio.Queue()
+        speaker = asyncio.create_task(self._speak_queue(queue))
+
+        try:
+            async for sentence in self._stream_reply(messages):
+                if sentence == TRANSFER_MARKER:
+                    transfer = True
+                    break
+                spoken.append(sentence)
+                await queue.put(sentence)
+
+            if not spoken and not transfer:
+                spoken.append(FALLBACK_RESPONSE)
+                await queue.put(FALLBACK_RESPONSE)
+
+            await queue.put(None)
+            await speaker
+        except asyncio.CancelledError:
+            # Barge-in: keep whatever we managed to say in the record
+            speaker.cancel()
+            if spoken:
+                await self._save_turn(caller_message, " ".join(spoken))
+            raise
+        except Exception as e:
+            # Model or TTS failed mid-reply - apologise rather than go quiet
+            print(f"Media stream reply error: {e}")
+            spoken.append(FALLBACK_RESPONSE)
+            try:
+                if speaker.done():
+                    # TTS failed - one more try, for the fallback
+                    await self._speak(FALLBACK_RESPONSE)
+                else:
+                    # The model failed - finish what's queued, then the fallback
+                    await queue.put(FALLBACK_RESPONSE)
+                    await queue.put(None)
+                    await speaker
+            except Exception as e:
+                print(f"Media stream TTS error: {e}")
+            finally:
+                # Also on barge-in - the fallback was (at least partly) said
+                await self._save_turn(caller_message, " ".join(spoken))
+            return
+
+        if transfer:
+            await self._transfer(caller_message)
+            return
+
+        await self._save_turn(caller_message, " ".join(spoken))
+
+    async def _save_turn(self, caller_message, ai_message):
+        self.history.append({"role": "user", "content": caller_message})
+        self.history.append({"role": "assistant", "content": ai_message})
+        await self._db(record_turn, self.call_id, caller_message, ai_message)
+
+    async def _transcribe(self, samples):
+        try:
+            result = await self.client.audio.transcriptions.create(
+                model=STT_MODEL,
+                file=("speech.wav", pcm16_to_wav(samples), "audio/wav"),
+                language="en"
+            )
+        except Exception as e:
+            print(f"Media stream STT error: {e}")
+            return None
+        return (result.text or "").strip()
+
+    async def _stream_reply(self, messages):
+        """Yield complete sentences (or TRANSFER_MARKER) as the model writes them"""
+        stream = await self.client.chat.completions.create(
+            model=AIService.CHAT_MODEL,
+            messages=messages,
+            tools=[AIService.TRANSFER_TOOL],
+            tool_choice="auto",
+            stream=True,
+            stream_options={"include_usage": True},
+            **AIService.CHAT_OPTIONS
+        )
+
+        buffer = ""
+        async for chunk in stream:
+            if chunk.usage:
+                record_usage(chunk.usage, self.customer.system_prompt_version)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+
+            if delta.tool_calls:
+                yield TRANSFER_MARKER
+                return
+
+            if delta.content:
+                buffer += delta.content
+                sentences, buffer = split_sentences(buffer)
+                for sentence in sentences:
+                    yield sentence
+
+        if buffer.strip():
+            yield buffer.strip()
+
+    async def _speak_queue(self, queue):
+        while True:
+            sentence = await queue.get()
+            if sentence is None:
+                return
+            await self._speak(sentence)
+
+    async def _speak_all(self, sentences):
+        for sentence in sentences:
+            await self._speak(sentence)
+
+    async def _speak(self, text):
+        """Stream text as μ-law frames to Twilio, using the TTS cache when possible"""
+        cache = get_tts_cache()
+        key = tts_cache_key(text, AIService.TTS_MODEL, AIService.TTS_VOICE, AIService.TTS_SPEED, STREAM_TTS_FORMAT)
+
+        audio = await asyncio.to_thread(cache.get, key)
+        if audio is not None:
+            for i in range(0, len(audio), FRAME_BYTES):
+                await self._send_frame(audio[i:i + FRAME_BYTES])
+            await self._send_mark()
+            return
+
+        transcoder = UlawTranscoder()
+        collected = bytearray()
+
+        async with self.client.audio.speech.with_streaming_response.create(
+            model=AIService.TTS_MODEL,
+            voice=AIService.TTS_VOICE,
+            input=text,
+            response_format="pcm",
+            speed=AIService.TTS_SPEED
+        ) as response:
+            async for chunk in response.iter_bytes(AIService.TTS_CHUNK_SIZE):
+                for frame in transcoder.feed(chunk):
+                    collected += frame
+                    await self._send_frame(frame)
+
+        for frame in transcoder.flush():
+            collected += frame
+            await self._send_frame(frame)
+        await self._send_mark()
+
+        try:
+            await asyncio.to_thread(cache.put, key, bytes(collected))
+        except OSError as e:
+            print(f"TTS cache write failed: {e}")
+
+    async def _send_frame(self, frame):
+        await self.websocket.send(json.dumps({
+            'event': 'media',
+            'streamSid': self.stream_sid,
+            'media': {'payload': base64.b64encode(frame).decode('ascii')}
+        }))
+
+    async def _send_mark(self):
+        """Ask Twilio to tell us when playback reaches this point"""
+        self._mark_counter += 1
+        self._pending_marks += 1
+        self._playback_done.clear()
+        await self.websocket.send(json.dumps({
+            'event': 'mark',
+            'streamSid': self.stream_sid,
+            'mark': {'name': f"reply-{self._mark_counter}"}
+        }))
+
+    async def _wait_for_playback(self, timeout=15):
+        """Wait until Twilio has played everything we've sent"""
+        try:
+            await asyncio.wait_for(self._playback_done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _transfer(self, caller_message):
+        forward_to = self.customer.forward_to_number
+
+        if not forward_to:
+            print(f"No transfer number configured for customer {self.customer.id}")
+            message = TRANSFER_UNAVAILABLE_MESSAGE
+            twiml = '<Response><Hangup/></Response>'
+        else:
+            print(f"Transferring call {self.call_id} to {forward_to}")
+            message = TRANSFER_MESSAGE
+            twiml = f'''<Response>
+                <Dial timeout="30" callerId="{self.customer.deskringer_number}">
+                    <Number>{forward_to}</Number>
+                </Dial>
+                <Say>Sorry, we couldn't reach anyone. Please try calling back later.</Say>
+                <Hangup/>
+            </Response>'''
+
+        await self._speak(message)
+        await self._save_turn(caller_message, message)
+
+        # Replacing the TwiML ends the stream, so let the message finish first
+        await self._wait_for_playback()
+
+        try:
+            await asyncio.to_thread(redirect_call, self.call_sid, twiml)
+        except Exception as e:
+            print(f"Error transferring call {self.call_id}: {e}")
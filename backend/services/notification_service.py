@@ -2,9 +2,8 @@
 Notification Service for sending email and SMS alerts to business owners
 """
 import os
-from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail
-from twilio.rest import Client
+from services.http_clients import get_openai_client, get_twilio_client, send_email
 
 
 class NotificationService:
@@ -31,13 +30,13 @@ class NotificationService:
         """
         # Send email if configured
         if customer.notification_email and self.sendgrid_api_key:
-            self._send_email_notification(customer, call, transcript_summary)
+            self.send_email_notification(customer, call, transcript_summary)
 
         # Send SMS if configured
         if customer.notification_phone and self.twilio_account_sid:
-            self._send_sms_notification(customer, call, transcript_summary)
+            self.send_sms_notification(customer, call, transcript_summary)
 
-    def _send_email_notification(self, customer, call, transcript_summary):
+    def send_email_notification(self, customer, call, transcript_summary):
         """Send email notification"""
         try:
             # Build email subject
@@ -56,8 +55,7 @@ class NotificationService:
                 html_content=html_content
             )
 
-            sg = SendGridAPIClient(self.sendgrid_api_key)
-            response = sg.send(message)
+            response = send_email(message)
 
             print(f"Email notification sent to {customer.notification_email}: {response.status_code}")
             return True
@@ -66,7 +64,7 @@ class NotificationService:
             print(f"Error sending email notification: {e}")
             return False
 
-    def _send_sms_notification(self, customer, call, transcript_summary):
+    def send_sms_notification(self, customer, call, transcript_summary):
         """Send SMS notification"""
         try:
             # Use the customer's own Twilio number to send SMS
@@ -82,7 +80,7 @@ class NotificationService:
             message_body += f"View: https://admin.deskringer.com/calls"
 
             # Send SMS via Twilio from the customer's own phone number
-            client = Client(self.twilio_account_sid, self.twilio_auth_token)
+            client = get_twilio_client()
 
             message = client.messages.create(
                 body=message_body,
@@ -104,6 +102,21 @@ class NotificationService:
         duration_mins = call.duration_seconds // 60 if call.duration_seconds else 0
         duration_secs = call.duration_seconds % 60 if call.duration_seconds else 0
 
+        # Details picked up by the rolling in-call summary
+        extra_rows = ""
+        if call.callback_number:
+            extra_rows += f"""
+                        <div class="info-row">
+                            <strong>Call back on:</strong>
+                            <span><a href="tel:{call.callback_number}">{call.callback_number}</a></span>
+                        </div>"""
+        if call.requested_time:
+            extra_rows += f"""
+                        <div class="info-row">
+                            <strong>Requested time:</strong>
+                            <span>{call.requested_time}</span>
+                        </div>"""
+
         # Get custom formatting instructions if available
         custom_note = ""
         if customer.notification_instructions:
@@ -155,7 +168,7 @@ class NotificationService:
                         <div class="info-row">
                             <strong>Status:</strong>
                             <span style="color: #10b981;">✓ {call.status}</span>
-                        </div>
+                        </div>{extra_rows}
                     </div>
 
                     {custom_note}
@@ -192,57 +205,36 @@ class NotificationService:
 
     def generate_summary(self, customer, call):
         """
-        Generate a brief AI summary of what the caller wanted
-        Uses GPT to create a concise, actionable summary
+        Brief AI summary of what the caller wanted
+
+        Returns the rolling summary kept up to date during the call
+        (services/call_summary.py), folding in any turns it hasn't seen yet.
         """
-        from openai import OpenAI
+        from services.call_summary import SummaryConflict, update_call_summary
 
         transcript = call.transcript or ""
 
         # If no transcript, return generic message
         if not transcript or len(transcript.strip()) < 10:
-            return "Call received - no transcript available"
+            return call.summary or "Call received - no transcript available"
 
         try:
-            # Use GPT to generate a smart, concise summary
-            client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
-
-            prompt = f"""Summarize this phone call in 1-2 sentences. Focus on:
-- What the caller wanted or needed
-- Any action items or follow-up required
-- Urgency level if applicable
-
-Keep it under 150 characters and make it actionable for the business owner.
-
-Transcript:
-{transcript[:1500]}"""  # Limit transcript length for token efficiency
-
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that creates concise, actionable summaries of phone calls for busy business owners."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=60
-            )
-
-            summary = response.choices[0].message.content.strip()
-
-            # Fallback if summary is too long
-            if len(summary) > 200:
-                summary = summary[:197] + "..."
-
-            return summary
-
+            update_call_summary(call.id)
+        except SummaryConflict:
+            # Let the caller (a queued job) retry once the other update lands
+            raise
         except Exception as e:
             print(f"Error generating AI summary: {e}")
-            # Fallback to simple heuristic
-            lines = transcript.split('\n')
-            caller_messages = [line for line in lines if line.startswith('Caller:')]
 
-            if caller_messages:
-                first_message = caller_messages[0].replace('Caller:', '').strip()
-                return f"Caller said: {first_message[:150]}"
+        if call.summary:
+            return call.summary
+
+        # Fallback to simple heuristic
+        lines = transcript.split('\n')
+        caller_messages = [line for line in lines if line.startswith('Caller:')]
+
+        if caller_messages:
+            first_message = caller_messages[0].replace('Caller:', '').strip()
+            return f"Caller said: {first_message[:150]}"
 
-            return "Call received - check transcript for details"
+        return "Call received - check transcript for details"
@@ -0,0 +1,157 @@
+"""
+Keyset (cursor) pagination for call lists
+
+OFFSET pagination reads and throws away every row before the page, so deep
+pages got linearly slower, and each page also paid for a full COUNT. Lists
+are now ordered by (created_at, id) descending and a page continues from
+the last row the client saw: "rows older than (created_at, id)". That is an
+index range scan whatever the depth.
+
+Cursors are opaque to clients (URL-safe base64 of the boundary row and the
+direction). next_cursor pages to older calls, prev_cursor back to newer ones;
+either is None at the end of the list.
+
+Ranked lists (search results, see services/call_search.py) page the same way
+on (rank, id) instead, forward only.
+
+offset_page() keeps ?offset= working for clients that predate cursors; its
+pages carry cursors too, so they can switch over.
+"""
+import base64
+import json
+import os
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+PAGE_SIZE_MAX = int(os.environ.get('PAGE_SIZE_MAX', 100))
+
+
+class InvalidCursor(ValueError):
+    """Cursor could not be decoded (tampered with or from another list)"""
+
+
+def page_size(requested, default=50):
+    """Requested page size clamped to 1..PAGE_SIZE_MAX"""
+    if requested is None:
+        requested = default
+    return max(1, min(requested, PAGE_SIZE_MAX))
+
+
+def _pack(values):
+    payload = json.dumps(values, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _unpack(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+
+
+def encode_cursor(row, direction):
+    """Opaque cursor continuing from row ('next' = older rows, 'prev' = newer rows)"""
+    return _pack([row.created_at.isoformat(), row.id, direction])
+
+
+def decode_cursor(cursor):
+    """
+    Returns:
+        (created_at, id, direction)
+
+    Raises:
+        InvalidCursor
+    """
+    try:
+        created_at, row_id, direction = _unpack(cursor)
+        if direction not in ('next', 'prev'):
+            raise ValueError(direction)
+        return datetime.fromisoformat(created_at), int(row_id), direction
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {e}")
+
+
+def keyset_page(query, model, cursor=None, limit=50):
+    """
+    One page of query, newest first
+
+    Args:
+        query: Filtered query over model or its columns (unordered); rows need created_at and id
+        model: Mapped class with created_at and id columns
+        cursor: next_cursor/prev_cursor from a previous page (None = first page)
+        limit: Page size (already clamped)
+
+    Returns:
+        (rows, next_cursor, prev_cursor)
+
+    Raises:
+        InvalidCursor
+    """
+    direction = None
+    if cursor:
+        created_at, row_id, direction = decode_cursor(cursor)
+
+        # created_at bound first so the index range is used; the id tie-break
+        # keeps rows with equal timestamps from being skipped or repeated
+        if direction == 'next':
+            query = query.filter(model.created_at <= created_at, or_(
+                model.created_at < created_at,
+                and_(model.created_at == created_at, model.id < row_id)
+            ))
+        else:
+            query = query.filter(model.created_at >= created_at, or_(
+                model.created_at > created_at,
+                and_(model.created_at == created_at, model.id > row_id)
+            ))
+
+    if direction == 'prev':
+        # Walk towards newer rows, then flip back to newest first
+        rows = query.order_by(model.created_at.asc(), model.id.asc()).limit(limit + 1).all()
+        more = len(rows) > limit
+        rows = list(reversed(rows[:limit]))
+        has_newer, has_older = more, True
+    else:
+        rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        has_newer, has_older = direction == 'next', more
+
+    next_cursor = encode_cursor(rows[-1], 'next') if rows and has_older else None
+    prev_cursor = encode_cursor(rows[0], 'prev') if rows and has_newer else None
+    return rows, next_cursor, prev_cursor
+
+
+def offset_page(query, model, offset, limit=50):
+    """
+    One page of query, newest first, skipping offset rows (legacy OFFSET paging)
+
+    Returns:
+        (rows, next_cursor, prev_cursor) - as keyset_page()
+    """
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).offset(offset).limit(limit + 1).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = encode_cursor(rows[-1], 'next') if rows and more else None
+    prev_cursor = encode_cursor(rows[0], 'prev') if rows and offset else None
+    return rows, next_cursor, prev_cursor
+
+
+def encode_rank_cursor(rank, row_id):
+    """Opaque cursor continuing a ranked list after (rank, id)"""
+    return _pack(['rank', rank, row_id])
+
+
+def decode_rank_cursor(cursor):
+    """
+    Returns:
+        (rank, id)
+
+    Raises:
+        InvalidCursor
+    """
+    try:
+        kind, rank, row_id = _unpack(cursor)
+        if kind != 'rank':
+            raise ValueError(kind)
+        return float(rank), int(row_id)
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {e}")
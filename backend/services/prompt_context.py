@@ -0,0 +1,129 @@
+"""
+Relevance-filtered business context for each turn
+
+compile_ai_instructions used to put every FAQ, the full services list,
+pricing and holiday hours into the system prompt, so a customer with a long
+FAQ list paid thousands of input tokens on every turn. Customers configured
+through the structured fields now keep only behaviour rules in the system
+prompt; their business facts are stored as chunks (Customer.knowledge_chunks)
+and each turn includes just the top-k chunks relevant to what the caller
+said (plus their recent messages), under PROMPT_CONTEXT_TOKENS.
+
+The chunks go in a system message right before the caller's latest message.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from services.faq_index import TfidfMatrix, tokenize
+
+PROMPT_CONTEXT_TOKENS = int(os.environ.get('PROMPT_CONTEXT_TOKENS', 400))  # Budget per turn
+PROMPT_CONTEXT_TOP_K = int(os.environ.get('PROMPT_CONTEXT_TOP_K', 4))
+RECENT_CALLER_MESSAGES = 2  # Earlier caller messages that also steer retrieval
+
+_stats = {}  # customer_id -> {turns, full_context_tokens, selected_context_tokens}
+_stats_lock = threading.Lock()
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token for English)"""
+    return max(1, len(text) // 4) if text else 0
+
+
+class PromptContext:
+    """A customer's knowledge chunks, ready to be ranked against a turn"""
+
+    def __init__(self, chunks):
+        self.chunks = [chunk['text'] for chunk in chunks if chunk.get('text')]
+        self.tokens = [estimate_tokens(text) for text in self.chunks]
+        self.full_tokens = sum(self.tokens)
+        self.tfidf = TfidfMatrix([tokenize(text) for text in self.chunks])
+
+    def select(self, caller_message, conversation_history=None):
+        """
+        Chunks relevant to this turn, within the token budget
+
+        Returns:
+            (context text, estimated tokens)
+        """
+        recent = [
+            message['content'] for message in (conversation_history or [])
+            if message.get('role') == 'user'
+        ][-RECENT_CALLER_MESSAGES:]
+
+        # What the caller just said counts double
+        query = tokenize(caller_message) * 2
+        for message in recent:
+            query += tokenize(message)
+
+        scores = self.tfidf.scores(query)
+        ranked = [int(i) for i in np.argsort(scores)[::-1] if scores[i] > 0][:PROMPT_CONTEXT_TOP_K]
+        if not ranked:
+            # Nothing specific (e.g. "hi, what do you do?") - lead with the
+            # general sections, in the order the owner wrote them
+            ranked = list(range(len(self.chunks)))
+
+        selected = []
+        used = 0
+        for i in ranked:
+            if used + self.tokens[i] > PROMPT_CONTEXT_TOKENS:
+                continue
+            selected.append(i)
+            used += self.tokens[i]
+
+        return "\n\n".join(self.chunks[i] for i in sorted(selected)), used
+
+
+def record_context(customer_id, full_tokens, selected_tokens):
+    """Account for one turn's business context: everything vs what was sent"""
+    with _stats_lock:
+        stats = _stats.setdefault(customer_id, {
+            'turns': 0,
+            'full_context_tokens': 0,
+            'selected_context_tokens': 0
+        })
+        stats['turns'] += 1
+        stats['full_context_tokens'] += full_tokens
+        stats['selected_context_tokens'] += selected_tokens
+
+
+def get_context_stats():
+    """Per-customer context tokens before (all chunks) and after selection"""
+    with _stats_lock:
+        stats = {customer_id: dict(values) for customer_id, values in _stats.items()}
+
+    for values in stats.values():
+        full = values['full_context_tokens']
+        values['tokens_saved_pct'] = (
+            round(100 * (full - values['selected_context_tokens']) / full, 1) if full else 0.0
+        )
+    return stats
+
+
+_contexts = OrderedDict()  # content hash -> PromptContext (or None)
+_contexts_lock = threading.Lock()
+_MAX_CONTEXTS = 1000
+
+
+def get_prompt_context(chunks):
+    """PromptContext for a customer's knowledge chunks (None if they have none)"""
+    if not chunks:
+        return None
+
+    key = hashlib.sha256(json.dumps(chunks, sort_keys=True).encode('utf-8')).hexdigest()
+
+    with _contexts_lock:
+        if key in _contexts:
+            _contexts.move_to_end(key)
+            return _contexts[key]
+
+    context = PromptContext(chunks)
+
+    with _contexts_lock:
+        _contexts[key] = context
+        while len(_contexts) > _MAX_CONTEXTS:
+            _contexts.popitem(last=False)
+
+    return context
@@ -0,0 +1,144 @@
+"""
+Sentence-level streaming for Gather-mode calls
+
+The gather webhook answers as soon as the first sentence of the AI reply is
+ready: <Play> that sentence, then <Redirect> to /twilio/continue. Meanwhile a
+background thread keeps reading the model stream, prefetches TTS for each
+following sentence and, when the reply is complete, records it in CallLog.
+
+/twilio/continue picks up the rest of the reply - from the in-process
+future when Twilio's redirect lands on the same worker, or from the
+committed CallLog row when it lands on another one. If the caller hangs up
+mid-reply, the post-call job waits for the reply to be logged before writing
+the transcript (services/call_jobs.py).
+"""
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from flask import current_app
+from models import db, CallLog
+from services.ai_service import TRANSFER_MARKER
+from services.call_jobs import schedule_summary_update
+from services.customer_audio import TRANSFER_MESSAGE
+from services.tts_prefetch import prefetch_speech
+
+REST_TIMEOUT = 10  # Seconds /twilio/continue waits for the rest of a reply
+PENDING_TTL = 120  # Drop replies nobody came back for (caller hung up)
+
+_pending = {}  # caller CallLog id -> (Future, created_at)
+_pending_lock = threading.Lock()
+
+
+class ReplyRest:
+    """Remainder of a streamed reply after the first sentence"""
+
+    def __init__(self, text, transfer=False):
+        self.text = text
+        self.transfer = transfer
+
+
+def record_reply(call_id, ai_message):
+    """
+    Log the complete AI reply
+
+    Turns are append-only CallLog rows; Call.transcript is built from them
+    once when the call ends (see twilio_status_webhook). The rolling summary
+    is brought up to date in the background.
+    """
+    db.session.add(CallLog(call_id=call_id, speaker='ai', message=ai_message))
+    schedule_summary_update(call_id)
+    db.session.commit()
+
+
+def continue_reply(state, caller_log_id, caller_message, first_sentence, sentences):
+    """
+    Drain the rest of a streamed reply in the background
+
+    Args:
+        state: CallState of the call (services.call_state), extended once the reply is recorded
+        caller_log_id: CallLog id of the caller's message (identifies the turn)
+        caller_message: What the caller said
+        first_sentence: Sentence already sent to Twilio
+        sentences: Iterator over the remaining sentences (from AIService.stream_response)
+    """
+    app = current_app._get_current_object()
+    call_id = state.call_id
+    future = Future()
+
+    with _pending_lock:
+        now = time.monotonic()
+        for key, (_, created) in list(_pending.items()):
+            if now - created > PENDING_TTL:
+                del _pending[key]
+        _pending[caller_log_id] = (future, now)
+
+    def run():
+        rest = []
+        transfer = False
+        try:
+            for sentence in sentences:
+                if sentence == TRANSFER_MARKER:
+                    transfer = True
+                    break
+                rest.append(sentence)
+                prefetch_speech(sentence)
+        except Exception as e:
+            print(f"Error streaming reply for call {call_id}: {e}")
+
+        ai_message = " ".join([first_sentence] + rest)
+        if transfer:
+            ai_message += f" {TRANSFER_MESSAGE}"
+
+        with app.app_context():
+            try:
+                record_reply(call_id, ai_message)
+                state.append_turn(caller_message, ai_message)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error recording reply for call {call_id}: {e}")
+
+        future.set_result(ReplyRest(" ".join(rest), transfer))
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def wait_for_rest(call_id, caller_log_id, first_length, timeout=REST_TIMEOUT):
+    """
+    Get the rest of a streamed reply (None if it never arrived)
+
+    Args:
+        call_id: Call the reply belongs to
+        caller_log_id: CallLog id of the caller's message
+        first_length: Length of the first sentence already played
+    """
+    with _pending_lock:
+        entry = _pending.pop(caller_log_id, None)
+
+    if entry:
+        try:
+            return entry[0].result(timeout=timeout)
+        except FutureTimeoutError:
+            return None
+
+    # Generated on another worker - wait for it to commit the reply
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        log = CallLog.query.filter(
+            CallLog.call_id == call_id,
+            CallLog.id > caller_log_id,
+            CallLog.speaker == 'ai'
+        ).order_by(CallLog.id).first()
+
+        if log:
+            text = log.message[first_length:].strip()
+            transfer = text.endswith(TRANSFER_MESSAGE)
+            if transfer:
+                text = text[:-len(TRANSFER_MESSAGE)].strip()
+            return ReplyRest(text, transfer)
+
+        # End the read transaction so the next poll sees new commits
+        db.session.rollback()
+        time.sleep(0.1)
+
+    return None
+
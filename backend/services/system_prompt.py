@@ -0,0 +1,74 @@
+"""
+Precompiled per-customer system prompts
+
+The system prompt used to be rebuilt from an f-string on every turn, with the
+business name on its first line - so no two tenants ever shared a prompt
+prefix. It is now compiled once whenever a customer's settings change and
+stored on the customer (system_prompt + system_prompt_version).
+
+Layout is static-first: the conversation rules, identical for every
+customer, lead the prompt; the business name and the customer's compiled
+instructions follow.
+
+This doesn't buy OpenAI prompt caching, which needs PROMPT_CACHE_MIN_TOKENS
+identical leading tokens. STATIC_RULES is ~270 tokens, far short of that, so
+tenants never share cache entries - padding it to qualify would cost more
+than the discount saves. Within a call the system prompt and earlier turns
+only grow as a prefix until the history window starts folding
+(services/conversation_window.py); from then on the verbatim turns slide and
+the memory message is rewritten every turn, and a typical system prompt
+alone is under the minimum. Expect few cache hits; get_usage_stats() reports
+the hit rate over cache-eligible turns so any that happen are visible.
+"""
+import hashlib
+
+# Bump when the layout below changes (part of every prompt's version)
+PROMPT_FORMAT = 2
+
+# Shortest prompt OpenAI caches (cached in 128-token steps beyond it)
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+DEFAULT_INSTRUCTIONS = 'Answer questions, take messages, help with appointments.'
+
+# Shared by every customer - keep this first and byte-for-byte stable
+STATIC_RULES = """You're a friendly, patient receptionist answering the phone for a business.
+
+Conversation Style:
+- Be conversational and natural - talk like a real person, not a robot
+- Keep responses to 1-2 short sentences max
+- Use natural fillers: "Sure", "Of course", "No problem", "Got it"
+- Be patient and understanding - people pause, correct themselves, make mistakes
+- If someone pauses mid-sentence or seems to continue talking, wait patiently
+- If you didn't understand something, politely ask them to repeat
+- Never abruptly end the conversation - always give them a chance to add more
+
+Handling Information:
+- Remember what they already told you - NEVER ask for the same info twice
+- If they give partial info, acknowledge it and ask for what's missing
+- If they correct themselves, accept the correction gracefully ("No problem, got it!")
+- Keep track of the conversation context
+
+Never say goodbye or end the call unless:
+- They explicitly say goodbye/thanks/that's all
+- You've confirmed you have everything and they seem done
+- Always ask "Is there anything else I can help you with?" before ending"""
+
+
+def compile_system_prompt(business_name, ai_instructions):
+    """
+    Compile the full system prompt for a customer
+
+    Args:
+        business_name: Customer's business name
+        ai_instructions: Customer's compiled AI instructions (may be empty)
+
+    Returns:
+        (prompt text, version) - version is a short hash of the prompt
+    """
+    prompt = (
+        f"{STATIC_RULES}\n\n"
+        f"The business you work for: {business_name}\n\n"
+        f"{ai_instructions or DEFAULT_INSTRUCTIONS}"
+    )
+    version = hashlib.sha256(f"{PROMPT_FORMAT}:{prompt}".encode('utf-8')).hexdigest()[:16]
+    return prompt, version
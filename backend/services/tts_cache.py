@@ -0,0 +1,469 @@
+"""
+Content-addressed cache for synthesized TTS audio
+
+Every phrase we play to a caller goes through OpenAI TTS. Many of them are
+fixed ("Are you still there?", "Okay, thanks for calling!") or repeat across
+calls, so we cache the audio under a hash of everything that affects the
+output: (text, model, voice, speed, format).
+
+Two tiers:
+- Memory: small per-process LRU, answers in microseconds
+- Disk: shared by every worker on the box, evicted least recently used
+  first once the directory grows past TTS_CACHE_MAX_BYTES (hits in either
+  tier refresh the file's mtime; temp files and in-flight markers orphaned
+  by a crashed worker are swept at the same time)
+
+Streamed synthesis is written through to the disk tier chunk by chunk via
+TTSCache.writer(), so caching never requires holding a whole reply in memory.
+
+Synthesis is single-flight: concurrent requests for the same key join the
+in-flight job in this process, and an in-flight marker file per key
+(created with O_EXCL) collapses identical requests from other workers into
+one upstream call. Different phrases never wait on each other.
+
+Hit/miss counters are kept per process and exposed via /api/admin/metrics.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+
+
+def tts_cache_key(text, model, voice, speed, response_format):
+    """Stable hash of every input that changes the synthesized audio"""
+    payload = json.dumps(
+        [text, model, voice, float(speed), response_format],
+        ensure_ascii=False,
+        separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class TTSCache:
+    """Two-tier (memory LRU + disk) cache of synthesized audio keyed by content hash"""
+
+    DISK_RESCAN_WRITES = 100
+    FLIGHT_TIMEOUT = 30  # Seconds to wait on someone else's synthesis before doing our own
+    TOUCH_INTERVAL = 60  # Seconds between mtime refreshes of a file served from memory
+    STALE_TMP_SECONDS = 300  # Temp files older than this belong to a crashed write
+
+    def __init__(self, cache_dir=None, memory_max_bytes=None, disk_max_bytes=None):
+        self.cache_dir = cache_dir or os.environ.get(
+            'TTS_CACHE_DIR',
+            os.path.join(tempfile.gettempdir(), 'deskringer-tts-cache')
+        )
+        self.memory_max_bytes = memory_max_bytes if memory_max_bytes is not None else int(
+            os.environ.get('TTS_CACHE_MEMORY_BYTES', 32 * 1024 * 1024)
+        )
+        self.disk_max_bytes = disk_max_bytes if disk_max_bytes is not None else int(
+            os.environ.get('TTS_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+        )
+
+        self._memory = OrderedDict()  # key -> bytes, most recently used last
+        self._memory_bytes = 0
+        self._touched = {}  # key -> monotonic time its disk file's mtime was last refreshed
+        self._lock = threading.Lock()
+
+        # Running estimate of disk usage so we only walk the directory when
+        # we might be over budget (other workers write here too, so we also
+        # rescan every DISK_RESCAN_WRITES writes)
+        self._disk_bytes = None
+        self._writes_since_scan = 0
+
+        self._inflight = {}  # key -> Future resolved when the leader finishes
+
+        self.stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'writes': 0,
+            'evictions': 0,
+            'stale_tmp_removed': 0,
+            'coalesced': 0,
+            'synthesis_seconds': 0.0
+        }
+
+        os.makedirs(os.path.join(self.cache_dir, 'inflight'), exist_ok=True)
+
+    def _path(self, key):
+        # Shard by the first two hex chars so no directory grows huge
+        return os.path.join(self.cache_dir, key[:2], f"{key}.audio")
+
+    def _marker_path(self, key):
+        return os.path.join(self.cache_dir, 'inflight', f"{key}.inflight")
+
+    def get(self, key):
+        """Return cached audio bytes for key, or None on a miss"""
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+        if audio is not None:
+            # Hot entries live in memory - keep their disk copy from looking idle
+            self._touch(key)
+            return audio
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                audio = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.stats['misses'] += 1
+            return None
+
+        self._touch(key, force=True)
+
+        with self._lock:
+            self.stats['disk_hits'] += 1
+        self._remember(key, audio)
+        return audio
+
+    def _touch(self, key, force=False):
+        """Refresh the disk file's mtime so eviction treats it as recently used"""
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._touched.get(key, float('-inf')) < self.TOUCH_INTERVAL:
+                return
+            self._touched[key] = now
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+
+    def contains(self, key):
+        """True if key is cached in either tier (does not touch counters)"""
+        with self._lock:
+            if key in self._memory:
+                return True
+        return os.path.exists(self._path(key))
+
+    def _read(self, key):
+        """Read key from either tier without touching counters"""
+        with self._lock:
+            audio = self._memory.get(key)
+        if audio is not None:
+            return audio
+        try:
+            with open(self._path(key), 'rb') as f:
+                audio = f.read()
+        except FileNotFoundError:
+            return None
+        self._remember(key, audio)
+        return audio
+
+    def get_or_create(self, key, producer):
+        """
+        Return cached audio, or produce it exactly once across concurrent callers
+
+        Args:
+            key: Cache key
+            producer: Zero-argument callable returning audio bytes
+        """
+        audio = self.get(key)
+        if audio is not None:
+            return audio
+
+        with self.single_flight(key) as flight:
+            if flight.audio is not None:
+                return flight.audio
+
+            started = time.monotonic()
+            audio = producer()
+            self.record_synthesis(time.monotonic() - started)
+
+            try:
+                self.put(key, audio)
+            except OSError as e:
+                # A full or read-only disk shouldn't stop the caller hearing us
+                print(f"TTS cache write failed: {e}")
+            return audio
+
+    @contextmanager
+    def single_flight(self, key):
+        """
+        Coordinate synthesis of key with other threads and workers
+
+        Yields a Flight. If flight.audio is set, someone else already produced
+        it; otherwise the caller is the leader and must store the result in
+        the cache, then call flight.release() (or leave the block).
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            try:
+                future.result(timeout=self.FLIGHT_TIMEOUT)
+            except FutureTimeoutError:
+                pass
+            audio = self._read(key)
+            if audio is not None:
+                with self._lock:
+                    self.stats['coalesced'] += 1
+            # If the leader failed we produce it ourselves
+            yield Flight(audio)
+            return
+
+        marked = self._acquire_marker(key)
+
+        def release():
+            if marked:
+                try:
+                    os.remove(self._marker_path(key))
+                except OSError:
+                    pass
+            with self._lock:
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+            future.set_result(None)
+
+        flight = Flight(None, release)
+        try:
+            # Another worker may have produced it while we waited for its marker
+            flight.audio = self._read(key)
+            if flight.audio is not None:
+                with self._lock:
+                    self.stats['coalesced'] += 1
+            yield flight
+        finally:
+            flight.release()
+
+    def _acquire_marker(self, key):
+        """
+        Mark key as being synthesized by this worker, waiting out another
+        worker's marker first
+
+        Returns:
+            True if we created the marker; False if the audio showed up, or
+            the other worker took too long (we then synthesize unmarked)
+        """
+        path = self._marker_path(key)
+        deadline = time.monotonic() + self.FLIGHT_TIMEOUT
+        while True:
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                pass
+            except OSError:
+                return False  # Read-only or missing directory - single-flight per process only
+
+            if os.path.exists(self._path(key)) or time.monotonic() >= deadline:
+                return False
+            try:
+                if time.time() - os.stat(path).st_mtime > self.FLIGHT_TIMEOUT:
+                    # Left behind by a worker that died mid-synthesis
+                    os.remove(path)
+                    continue
+            except FileNotFoundError:
+                continue
+            time.sleep(0.02)
+
+    def put(self, key, audio):
+        """Store audio in both tiers"""
+        if not audio:
+            return
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temp file and rename so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(audio)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self._remember(key, audio)
+        self._committed(len(audio))
+
+    def writer(self, key):
+        """Open a write-through writer for streaming audio into the disk tier"""
+        return CacheWriter(self, key)
+
+    def _committed(self, size):
+        """Bookkeeping after a CacheWriter lands a file"""
+        with self._lock:
+            self.stats['writes'] += 1
+            self._writes_since_scan += 1
+            if self._disk_bytes is not None:
+                self._disk_bytes += size
+        self._evict_disk()
+
+    def _remember(self, key, audio):
+        """Insert into the memory LRU, evicting least recently used entries"""
+        if len(audio) > self.memory_max_bytes:
+            return
+
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous)
+
+            self._memory[key] = audio
+            self._memory_bytes += len(audio)
+
+            while self._memory_bytes > self.memory_max_bytes and self._memory:
+                evicted_key, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+                self._touched.pop(evicted_key, None)
+
+    def _evict_disk(self):
+        """
+        Delete least recently used files until the directory fits the budget,
+        and temp files left behind by writes that never finished
+        """
+        with self._lock:
+            if (self._disk_bytes is not None
+                    and self._disk_bytes <= self.disk_max_bytes
+                    and self._writes_since_scan < self.DISK_RESCAN_WRITES):
+                return
+            self._writes_since_scan = 0
+
+        entries = []
+        total = 0
+        stale_before = time.time() - self.STALE_TMP_SECONDS
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                is_tmp = name.endswith(('.tmp', '.inflight'))
+                if not is_tmp and not name.endswith('.audio'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+
+                if is_tmp:
+                    # In-flight writes are left alone; old ones died with their worker
+                    if st.st_mtime < stale_before:
+                        try:
+                            os.remove(path)
+                        except FileNotFoundError:
+                            pass
+                        with self._lock:
+                            self.stats['stale_tmp_removed'] += 1
+                    continue
+
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+        if total <= self.disk_max_bytes:
+            with self._lock:
+                self._disk_bytes = total
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            total -= size
+            with self._lock:
+                self.stats['evictions'] += 1
+
+        with self._lock:
+            self._disk_bytes = total
+
+    def record_synthesis(self, seconds):
+        """Record time spent on an upstream synthesis (used to estimate savings)"""
+        with self._lock:
+            self.stats['synthesis_seconds'] += seconds
+
+    def get_stats(self):
+        """Counters plus derived hit rate for this process"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['memory_entries'] = len(self._memory)
+            stats['memory_bytes'] = self._memory_bytes
+
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        hits = stats['memory_hits'] + stats['disk_hits']
+        stats['hit_rate'] = round(hits / lookups, 4) if lookups else 0.0
+
+        # Every hit skipped one average-length upstream synthesis
+        avg_synthesis = stats['synthesis_seconds'] / stats['misses'] if stats['misses'] else 0.0
+        stats['estimated_seconds_saved'] = round(hits * avg_synthesis, 2)
+        stats['synthesis_seconds'] = round(stats['synthesis_seconds'], 2)
+        return stats
+
+
+class Flight:
+    """Result of joining a single-flight synthesis (audio is None for the leader)"""
+
+    def __init__(self, audio, release=None):
+        self.audio = audio
+        self._release = release
+
+    def release(self):
+        """Let waiting requests read the cache (the leader calls this once it has stored the audio)"""
+        release, self._release = self._release, None
+        if release:
+            release()
+
+
+class CacheWriter:
+    """
+    Streams audio chunks into a temp file and atomically publishes it on commit()
+
+    If the stream is abandoned part way (upstream error, caller hung up) call
+    abort() instead so a truncated file never becomes a cache entry.
+    """
+
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = key
+        self.path = cache._path(key)
+        self.size = 0
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd, self.tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix='.tmp')
+        self._file = os.fdopen(fd, 'wb')
+
+    def write(self, chunk):
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def commit(self):
+        self._file.close()
+        if self.size == 0:
+            os.remove(self.tmp_path)
+            return
+        os.replace(self.tmp_path, self.path)
+        self.cache._committed(self.size)
+
+    def abort(self):
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_tts_cache():
+    """Process-wide TTS cache (created lazily)"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TTSCache()
+    return _cache
@@ -0,0 +1,50 @@
+"""
+Speculative TTS prefetch
+
+As soon as the gather webhook knows what the AI will say, we start
+synthesizing it (and the fallback phrases in the same TwiML) in the
+background. By the time Twilio fetches /twilio/tts the audio is usually
+cached, or the request joins the in-flight synthesis via the TTS cache's
+single-flight instead of starting a second one.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from services.tts_cache import get_tts_cache
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Thread pool for prefetch jobs (recreated after a gunicorn fork)"""
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(os.environ.get('TTS_PREFETCH_WORKERS', 4)),
+                    thread_name_prefix='tts-prefetch'
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _warm(text):
+    from services.ai_service import AIService
+
+    try:
+        AIService().text_to_speech(text)
+    except Exception as e:
+        print(f"TTS prefetch failed: {e}")
+
+
+def prefetch_speech(*texts):
+    """Start synthesizing each text in the background if it isn't cached yet"""
+    from services.ai_service import AIService
+
+    cache = get_tts_cache()
+    for text in texts:
+        if text and not cache.contains(AIService.tts_key(text)):
+            _get_executor().submit(_warm, text)
@@ -0,0 +1,52 @@
+"""
+WebSocket server for Twilio Media Streams (real-time call mode)
+
+Customers with call_mode='stream' are connected here by the voice webhook's
+<Connect><Stream> TwiML. Run alongside the Flask API:
+
+    python stream_server.py
+
+Set MEDIA_STREAM_URL on the API service to this server's public wss:// URL.
+"""
+import asyncio
+import os
+import websockets
+from twilio.request_validator import RequestValidator
+from app import app as flask_app
+from services.http_clients import create_async_openai_client
+from services.media_stream import MediaStreamSession
+
+openai_client = create_async_openai_client()
+
+
+def validate_twilio_handshake(websocket):
+    """Check the X-Twilio-Signature Twilio sends on the WebSocket upgrade"""
+    validator = RequestValidator(os.environ.get('TWILIO_AUTH_TOKEN'))
+    url = flask_app.config['MEDIA_STREAM_URL']
+    signature = websocket.request_headers.get('X-Twilio-Signature', '')
+    return validator.validate(url, {}, signature)
+
+
+async def handler(websocket):
+    if not validate_twilio_handshake(websocket):
+        await websocket.close(code=1008, reason='Invalid request signature')
+        return
+
+    session = MediaStreamSession(websocket, flask_app, openai_client)
+    try:
+        await session.run()
+    except websockets.ConnectionClosed:
+        pass
+    except Exception as e:
+        print(f"Media stream error for call {session.call_id}: {e}")
+
+
+async def main():
+    port = int(os.environ.get('PORT', 8765))
+    async with websockets.serve(handler, '0.0.0.0', port, max_size=2 ** 20):
+        print(f"Media stream server listening on port {port}")
+        await asyncio.Future()  # Run forever
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
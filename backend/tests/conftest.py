@@ -0,0 +1,66 @@
+"""
+Shared fixtures: a Flask app on a throwaway database per test
+
+    cd backend
+    pip install -r requirements-dev.txt
+    python -m pytest
+
+SQLite by default. Set TEST_DATABASE_URL to run against Postgres as well
+(tests marked postgres only run there) - every test creates and drops the
+tables, so point it at a scratch database.
+"""
+import os
+import sys
+import tempfile
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app.py builds a module-level app on import - keep it off any real database
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'import.db')}"
+os.environ.setdefault('TTS_CACHE_DIR', tempfile.mkdtemp())
+
+from config import Config
+from models import db
+import services.call_routing
+import services.call_search
+import services.call_state
+import services.customer_search
+import services.tts_cache
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'postgres: needs TEST_DATABASE_URL pointing at Postgres')
+
+
+def pytest_collection_modifyitems(config, items):
+    if (os.environ.get('TEST_DATABASE_URL') or '').startswith(('postgres://', 'postgresql://')):
+        return
+    skip = pytest.mark.skip(reason='Postgres only (set TEST_DATABASE_URL)')
+    for item in items:
+        if 'postgres' in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """App with empty tables and fresh per-process caches"""
+    url = os.environ.get('TEST_DATABASE_URL') or f"sqlite:///{tmp_path / 'test.db'}"
+    if url.startswith('postgres://'):
+        url = url.replace('postgres://', 'postgresql://', 1)
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', url)
+    monkeypatch.setenv('TTS_CACHE_DIR', str(tmp_path / 'tts-cache'))
+
+    monkeypatch.setattr(services.call_routing, '_router', None)
+    monkeypatch.setattr(services.call_search, '_fts_ready', False)
+    monkeypatch.setattr(services.call_state, '_cache', None)
+    monkeypatch.setattr(services.customer_search, '_index', None)
+    monkeypatch.setattr(services.tts_cache, '_cache', None)
+
+    from app import create_app
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
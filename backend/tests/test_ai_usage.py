@@ -0,0 +1,43 @@
+"""
+Per-turn token accounting and the prompt-cache hit rate
+"""
+from types import SimpleNamespace
+import pytest
+import services.ai_service as ai_service
+from services.ai_service import get_usage_stats, record_usage
+from services.system_prompt import PROMPT_CACHE_MIN_TOKENS
+
+
+@pytest.fixture(autouse=True)
+def usage(monkeypatch):
+    monkeypatch.setattr(ai_service, '_usage', dict.fromkeys(ai_service._usage, 0))
+
+
+def turn(prompt_tokens, cached_tokens=0):
+    return SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=20,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=cached_tokens)
+    )
+
+
+def test_hit_rate_counts_only_cache_eligible_turns():
+    # Two turns under the minimum, two over it (one of them partly cached)
+    record_usage(turn(600))
+    record_usage(turn(900))
+    record_usage(turn(PROMPT_CACHE_MIN_TOKENS + 100))
+    record_usage(turn(PROMPT_CACHE_MIN_TOKENS + 300, cached_tokens=PROMPT_CACHE_MIN_TOKENS))
+
+    stats = get_usage_stats()
+    assert stats['turns'] == 4
+    assert stats['cache_eligible_turns'] == 2
+    assert stats['cache_hit_turns'] == 1
+    assert stats['eligible_cache_hit_rate'] == 0.5
+    assert stats['cached_tokens'] == PROMPT_CACHE_MIN_TOKENS
+
+
+def test_usage_details_may_be_a_dict():
+    record_usage(SimpleNamespace(
+        prompt_tokens=2000, completion_tokens=10, prompt_tokens_details={'cached_tokens': 1920}
+    ))
+    assert get_usage_stats()['cache_hit_turns'] == 1
@@ -0,0 +1,53 @@
+"""
+Call list compatibility: /api/calls/recent keeps full records, the portal keeps ?offset=
+"""
+from datetime import datetime, timedelta
+import pytest
+from flask_jwt_extended import create_access_token
+from models import db, Admin, Call, Customer
+
+
+@pytest.fixture
+def customer(app):
+    customer = Customer(business_name="Maple Dental", email="office@mapledental.example")
+    db.session.add(customer)
+    db.session.flush()
+    now = datetime.utcnow()
+    for i in range(5):
+        db.session.add(Call(
+            customer_id=customer.id, caller_phone="+15550000000", status='completed',
+            transcript=f"Caller: call {i}", created_at=now - timedelta(minutes=i)
+        ))
+    db.session.commit()
+    return customer
+
+
+def get(app, url, identity, claims=None):
+    token = create_access_token(identity=str(identity), additional_claims=claims or {})
+    response = app.test_client().get(url, headers={'Authorization': f"Bearer {token}"})
+    assert response.status_code == 200, response.get_data(as_text=True)[:200]
+    return response.get_json()
+
+
+def test_recent_calls_include_the_transcript_by_default(app, customer):
+    admin = Admin(email="admin@example.com", name="Admin")
+    admin.set_password("secret")
+    db.session.add(admin)
+    db.session.commit()
+
+    calls = get(app, "/api/calls/recent?limit=2", admin.id)['calls']
+    assert [call['transcript'] for call in calls] == ["Caller: call 0", "Caller: call 1"]
+
+    narrowed = get(app, "/api/calls/recent?limit=2&fields=id,status", admin.id)['calls']
+    assert set(narrowed[0]) == {'id', 'status'}
+
+
+def test_portal_calls_still_page_by_offset(app, customer):
+    claims = {'type': 'customer'}
+    first = get(app, "/api/portal/calls?limit=2", customer.id, claims)
+    by_offset = get(app, "/api/portal/calls?limit=2&offset=2", customer.id, claims)
+    by_cursor = get(app, f"/api/portal/calls?limit=2&cursor={first['next_cursor']}", customer.id, claims)
+
+    assert by_offset['offset'] == 2
+    assert [call['id'] for call in by_offset['calls']] == [call['id'] for call in by_cursor['calls']]
+    assert by_offset['next_cursor'] == by_cursor['next_cursor']
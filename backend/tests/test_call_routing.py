@@ -0,0 +1,114 @@
+"""
+Routing table refresh: stale routes keep serving while the table reloads,
+and only changed customers are reloaded
+"""
+import threading
+import time
+import pytest
+from models import db, Customer
+from services.call_routing import CallRouter
+
+NUMBER = "+15550100200"
+
+
+@pytest.fixture
+def customer(app):
+    customer = Customer(business_name="Maple Dental", email="office@mapledental.example", deskringer_number=NUMBER)
+    db.session.add(customer)
+    db.session.commit()
+    return customer
+
+
+def rename(customer, name):
+    """Change the customer behind the router's back (as another worker would)"""
+    customer.business_name = name
+    db.session.commit()
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_expired_table_is_served_while_it_reloads_in_the_background(app, customer, monkeypatch):
+    router = CallRouter(ttl=30)
+    router.warm()
+    rename(customer, "Maple Family Dental")
+
+    # Hold the reload until the lookup has returned
+    release = threading.Event()
+    query_routes = router._query_routes
+
+    def slow_query_routes(customer_ids=None):
+        release.wait(5)
+        return query_routes(customer_ids)
+
+    monkeypatch.setattr(router, '_query_routes', slow_query_routes)
+    router._loaded_at -= 31
+
+    assert router.lookup(NUMBER).business_name == "Maple Dental"
+    release.set()
+    wait_until(lambda: router.lookup(NUMBER).business_name == "Maple Family Dental")
+
+
+def test_reload_keeps_routes_invalidated_while_it_was_querying(app, customer, monkeypatch):
+    router = CallRouter(ttl=30)
+    router.warm()
+
+    # The reload reads one name, then this worker saves a newer one
+    rename(customer, "Maple Dental & Ortho")
+    query_routes = router._query_routes
+    raced = []
+
+    def racing_query_routes(customer_ids=None):
+        routes = query_routes(customer_ids)
+        if not raced:
+            raced.append(True)
+            rename(customer, "Maple Family Dental")
+            router.invalidate(customer.id)
+        return routes
+
+    monkeypatch.setattr(router, '_query_routes', racing_query_routes)
+    router.warm()
+
+    assert router.lookup(NUMBER).business_name == "Maple Family Dental"
+    assert router.get(customer.id).business_name == "Maple Family Dental"
+
+
+def test_first_lookup_loads_the_table(app, customer):
+    router = CallRouter()
+    assert router.lookup("(555) 010-0200").id == customer.id
+
+
+def test_refresh_reloads_only_changed_customers(app, customer, monkeypatch):
+    other = Customer(business_name="Oak Veterinary", email="front@oakvet.example", deskringer_number="+15550100300")
+    db.session.add(other)
+    db.session.commit()
+
+    router = CallRouter(ttl=30)
+    router.warm()
+
+    queried = []
+    query_routes = router._query_routes
+
+    def recording_query_routes(customer_ids=None):
+        queried.append(customer_ids)
+        return query_routes(customer_ids)
+
+    monkeypatch.setattr(router, '_query_routes', recording_query_routes)
+
+    router.warm()
+    assert queried == []
+
+    rename(customer, "Maple Family Dental")
+    router.warm()
+    assert queried == [[customer.id]]
+    assert router.lookup(NUMBER).business_name == "Maple Family Dental"
+    assert router.get(other.id).business_name == "Oak Veterinary"
+
+    db.session.delete(other)
+    db.session.commit()
+    router.warm()
+    assert router.lookup("+15550100300") is None
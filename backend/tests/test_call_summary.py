@@ -0,0 +1,45 @@
+"""
+Rolling summary: per-turn updates are coalesced, and up-to-date calls cost nothing
+"""
+from datetime import datetime
+import pytest
+from models import db, Call, CallLog, Customer, Job
+import services.call_summary as call_summary
+from services.call_jobs import SUMMARY_UPDATE_DELAY, schedule_summary_update
+from services.call_summary import update_call_summary
+
+
+@pytest.fixture
+def call(app):
+    customer = Customer(business_name="Maple Dental", email="office@mapledental.example")
+    db.session.add(customer)
+    db.session.flush()
+    call = Call(customer_id=customer.id, caller_phone="+15557654321", status='in_progress')
+    db.session.add(call)
+    db.session.commit()
+    return call
+
+
+def test_turns_share_one_delayed_update(app, call):
+    for _ in range(3):
+        schedule_summary_update(call.id)
+        db.session.commit()
+
+    jobs = Job.query.filter_by(job_type='update_call_summary').all()
+    assert len(jobs) == 1
+    assert (jobs[0].run_at - datetime.utcnow()).total_seconds() > SUMMARY_UPDATE_DELAY - 5
+
+
+def test_summary_covering_the_last_turn_skips_the_model(app, call, monkeypatch):
+    def no_model():
+        raise AssertionError("summary model called")
+
+    monkeypatch.setattr(call_summary, 'get_openai_client', no_model)
+    log = CallLog(call_id=call.id, speaker='caller', message="Can I come in Friday?")
+    db.session.add(log)
+    db.session.flush()
+    call.summary = "Wants a Friday appointment"
+    call.summary_log_id = log.id
+    db.session.commit()
+
+    assert update_call_summary(call.id) is False
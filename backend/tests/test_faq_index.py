@@ -0,0 +1,104 @@
+"""
+FAQ index gating: canned answers only for a clear, single question
+"""
+from datetime import datetime
+import pytest
+from services.faq_index import (
+    FAQIndex, _stem, content_clauses, day_hours_answer, faq_entries, hours_answer, weekend_hours_answer
+)
+
+HOURS = {
+    **{day: {'open': '8:00 AM', 'close': '5:00 PM'} for day in ('monday', 'tuesday', 'wednesday', 'thursday', 'friday')},
+    'saturday': {'open': '9:00 AM', 'close': '1:00 PM'},
+    'sunday': {'closed': True}
+}
+FAQS = [
+    {'question': "Do you offer free estimates?", 'answer': "Yes, estimates are always free."},
+    {'question': "Do you take walk-ins?", 'answer': "We do, but appointments are seen first."},
+    {'question': "Are you licensed and insured?", 'answer': "Yes, we're fully licensed and insured."},
+]
+PRICING = "Service calls are $89, plus parts."
+
+TIMEZONE = 'America/Chicago'
+NOW = datetime(2026, 10, 17, 3, 0)  # Saturday in UTC, still Friday evening in Chicago
+
+
+@pytest.fixture(scope='module')
+def index():
+    return FAQIndex(faq_entries(FAQS, HOURS, PRICING))
+
+
+def answer(index, text):
+    match = index.match(text, TIMEZONE, NOW)
+    return match.answer if match else None
+
+
+@pytest.mark.parametrize('text', [
+    "What time do you close today? Also my sink is broken and flooding",
+    "Sunday",
+    "How much do you charge to fix a leaking faucet?",
+    "What are your hours and do you take walk-ins?",
+    "My water heater is leaking",
+])
+def test_leaves_anything_but_one_known_question_to_the_model(index, text):
+    assert index.match(text) is None
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("Is the estimate free?", "Yes, estimates are always free."),
+    ("Do you offer free estimates?", "Yes, estimates are always free."),
+    ("Hi, what are your hours?", hours_answer(HOURS)),
+    ("When are you open?", hours_answer(HOURS)),
+    ("Are you open?", day_hours_answer(HOURS, 'friday')),
+    ("Are you open today?", day_hours_answer(HOURS, 'friday')),
+    ("What time do you close today?", day_hours_answer(HOURS, 'friday')),
+    ("Are you open on Saturday?", day_hours_answer(HOURS, 'saturday')),
+    ("Are you open Sunday?", "We're closed Sunday."),
+    ("Are you open on the weekend?", weekend_hours_answer(HOURS)),
+    ("Are you open on Saturday and Sunday?", weekend_hours_answer(HOURS)),
+    ("Okay, what's the price?", PRICING),
+    ("How much do you charge?", PRICING),
+    ("Are you licensed and insured?", "Yes, we're fully licensed and insured."),
+])
+def test_answers_known_questions(index, text, expected):
+    assert answer(index, text) == expected
+
+
+def test_today_is_the_customers_day():
+    index = FAQIndex(faq_entries(FAQS, HOURS, PRICING))
+    assert index.match("Are you open today?", 'UTC', NOW).kind == 'hours_saturday'
+    assert index.match("Are you open today?", TIMEZONE, NOW).kind == 'hours_friday'
+
+
+def test_weekend_answer_reads_only_the_weekend():
+    assert weekend_hours_answer(HOURS) == "On the weekend we're open Saturday 9:00 AM to 1:00 PM and closed Sunday."
+
+
+def test_today_falls_back_to_the_week_when_the_day_is_not_set():
+    index = FAQIndex(faq_entries([], {'monday': {'open': '9:00 AM', 'close': '5:00 PM'}}, None))
+    assert index.match("Are you open today?", TIMEZONE, NOW).answer == "Our hours are Monday 9:00 AM to 5:00 PM."
+
+
+@pytest.mark.parametrize('words', [
+    ("estimates", "estimate"),
+    ("closes", "closing", "close"),
+    ("prices", "price"),
+    ("charges", "charged", "charge"),
+    ("deliveries", "delivery"),
+])
+def test_stems_inflections_alike(words):
+    assert len({_stem(word) for word in words}) == 1
+
+
+def test_stem_keeps_double_s():
+    assert _stem("business") == "business"
+
+
+@pytest.mark.parametrize('text, clauses', [
+    ("Hi, what are your hours?", 1),
+    ("Are you licensed and insured?", 1),
+    ("What time do you close? Also my sink is broken", 2),
+    ("Do you take walk-ins, because my tooth is killing me", 2),
+])
+def test_content_clauses(text, clauses):
+    assert content_clauses(text) == clauses
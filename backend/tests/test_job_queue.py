@@ -0,0 +1,43 @@
+"""
+Job queue: unique keys coalesce enqueues atomically
+"""
+from models import db, Job
+from services.job_queue import claim, enqueue, job
+
+
+@job('test_once', once=True)
+def once_job(payload):
+    pass
+
+
+@job('test_coalesced')
+def coalesced_job(payload):
+    pass
+
+
+def test_duplicate_key_is_not_enqueued(app):
+    first = enqueue('test_coalesced', {'n': 1}, unique_key="coalesced:1")
+    assert first is not None
+    assert enqueue('test_coalesced', {'n': 2}, unique_key="coalesced:1") is None
+    assert Job.query.filter_by(job_type='test_coalesced').count() == 1
+
+
+def test_claimed_job_releases_its_key(app):
+    enqueue('test_coalesced', unique_key="coalesced:1")
+    assert claim(['test_coalesced']) is not None
+
+    # A change after the job started needs another run
+    assert enqueue('test_coalesced', unique_key="coalesced:1") is not None
+
+
+def test_once_job_keeps_its_key(app):
+    enqueue('test_once', unique_key="once:1")
+    assert claim(['test_once']) is not None
+    assert enqueue('test_once', unique_key="once:1") is None
+
+
+def test_failed_job_frees_its_key(app):
+    failed = enqueue('test_once', unique_key="once:1")
+    failed.status = 'failed'
+    db.session.commit()
+    assert enqueue('test_once', unique_key="once:1") is not None
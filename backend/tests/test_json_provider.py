@@ -0,0 +1,17 @@
+"""
+API JSON responses: ISO 8601 datetimes through Flask's own response()
+"""
+from datetime import date, datetime
+from flask import jsonify
+
+
+def test_jsonify_encodes_datetimes_as_iso_8601(app):
+    with app.test_request_context():
+        response = jsonify({'created_at': datetime(2026, 10, 17, 9, 30), 'day': date(2026, 10, 17), 2: 'two'})
+
+    assert response.mimetype == 'application/json'
+    assert response.get_json() == {'created_at': "2026-10-17T09:30:00", 'day': "2026-10-17", '2': 'two'}
+
+
+def test_dumps_accepts_stdlib_arguments(app):
+    assert app.json.dumps({'b': 1, 'a': [1, 2]}, indent=2) == '{\n  "a": [\n    1,\n    2\n  ],\n  "b": 1\n}'
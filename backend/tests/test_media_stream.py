@@ -0,0 +1,322 @@
+"""
+MediaStreamSession driven end to end with scripted Twilio events
+
+The WebSocket and the OpenAI client are stubs: Twilio's start/media/mark/stop
+messages come from a script, Whisper returns canned text, the chat model
+streams canned deltas and TTS returns a constant PCM tone per request, so the
+μ-law frames sent back to Twilio can be checked byte for byte.
+"""
+import asyncio
+import base64
+import json
+from array import array
+from types import SimpleNamespace
+import pytest
+from models import db, Call, CallLog, Customer, Job
+import services.media_stream as media_stream
+from services.ai_service import FALLBACK_RESPONSE
+from services.audio_codec import FRAME_BYTES, pcm16_to_ulaw
+from services.customer_audio import TRANSFER_UNAVAILABLE_MESSAGE
+from services.media_stream import END_SILENCE_FRAMES, MediaStreamSession
+
+GREETING = "Thanks for calling Maple Dental, how can I help?"
+CALL_SID = "CA0000000000000000000000000000test"
+STREAM_SID = "MZ0000000000000000000000000000test"
+
+TTS_SAMPLES = 2400  # 100ms at 24kHz -> 5 μ-law frames
+LOUD = pcm16_to_ulaw(array('h', [8000] * FRAME_BYTES))
+QUIET = b'\xff' * FRAME_BYTES  # μ-law silence
+
+
+def tone(n):
+    """Amplitude of the nth TTS request's audio"""
+    return 1000 * (n + 1)
+
+
+def tone_frames(n):
+    """μ-law frames the session should send for the nth TTS request"""
+    frame = pcm16_to_ulaw(array('h', [tone(n)] * FRAME_BYTES))
+    return [frame] * (TTS_SAMPLES // 3 // FRAME_BYTES)
+
+
+class StubOpenAI:
+    """Just the parts of AsyncOpenAI the session uses"""
+
+    def __init__(self, transcripts=(), replies=()):
+        self.transcripts = list(transcripts)
+        self.replies = list(replies)  # Lists of deltas (an exception is raised mid-stream), or 'transfer'
+        self.chat_requests = []
+        self.speech_inputs = []
+
+        self.audio = SimpleNamespace(
+            transcriptions=SimpleNamespace(create=self._transcribe),
+            speech=SimpleNamespace(with_streaming_response=SimpleNamespace(create=self._speech))
+        )
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat))
+
+    async def _transcribe(self, **kwargs):
+        return SimpleNamespace(text=self.transcripts.pop(0))
+
+    async def _chat(self, **kwargs):
+        self.chat_requests.append(kwargs)
+        reply = self.replies.pop(0)
+
+        async def chunks():
+            if reply == 'transfer':
+                yield _chunk(tool_calls=[SimpleNamespace(id='call_1')])
+                return
+            for delta in reply:
+                if isinstance(delta, Exception):
+                    raise delta
+                yield _chunk(content=delta)
+            yield SimpleNamespace(usage=SimpleNamespace(
+                prompt_tokens=1200, completion_tokens=12, prompt_tokens_details=None
+            ), choices=[])
+
+        return chunks()
+
+    def _speech(self, **kwargs):
+        assert kwargs['response_format'] == 'pcm'
+        self.speech_inputs.append(kwargs['input'])
+        return _SpeechResponse(array('h', [tone(len(self.speech_inputs) - 1)] * TTS_SAMPLES).tobytes())
+
+
+def _chunk(content=None, tool_calls=None):
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=delta)])
+
+
+class _SpeechResponse:
+    def __init__(self, pcm):
+        self.pcm = pcm
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def iter_bytes(self, chunk_size):
+        # Odd-sized chunks, so the transcoder has to carry leftovers
+        for i in range(0, len(self.pcm), 1001):
+            yield self.pcm[i:i + 1001]
+
+
+class ScriptedSocket:
+    """
+    Stands in for the Twilio WebSocket
+
+    script items are Twilio messages (dicts) or callables returning an async
+    iterator of messages (waiting on the session as they go).
+    """
+
+    def __init__(self, script):
+        self.script = script
+        self.sent = []
+        self.closed = False
+
+    async def send(self, data):
+        self.sent.append(json.loads(data))
+
+    async def close(self, code=1000, reason=''):
+        self.closed = True
+
+    def __aiter__(self):
+        return self._messages()
+
+    async def _messages(self):
+        for step in self.script:
+            if self.closed:
+                return
+            if callable(step):
+                async for message in step():
+                    yield json.dumps(message)
+            else:
+                yield json.dumps(step)
+
+
+def start(call_id, call_sid=CALL_SID):
+    return {'event': 'start', 'start': {
+        'streamSid': STREAM_SID, 'callSid': call_sid, 'customParameters': {'call_id': str(call_id)}
+    }}
+
+
+def media(frames):
+    return [
+        {'event': 'media', 'media': {'track': 'inbound', 'payload': base64.b64encode(frame).decode('ascii')}}
+        for frame in frames
+    ]
+
+
+def utterance():
+    """400ms of speech followed by enough silence to end the utterance"""
+    return media([LOUD] * 20 + [QUIET] * END_SILENCE_FRAMES)
+
+
+def played(session, timeout=5):
+    """Step: wait for the current reply, acknowledging marks like Twilio would"""
+    async def step():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            for _ in range(session._pending_marks):
+                yield {'event': 'mark', 'streamSid': STREAM_SID, 'mark': {'name': 'played'}}
+            task = session._reply_task
+            if (task is None or task.done()) and not session._pending_marks:
+                return
+            assert loop.time() < deadline, "reply didn't finish"
+            await asyncio.sleep(0.01)
+    return step
+
+
+def run_session(app, client, script):
+    """Run a session over script (items may need the session, so pass a callable)"""
+    socket = ScriptedSocket([])
+    session = MediaStreamSession(socket, app, client)
+    socket.script = script(session)
+    asyncio.run(session.run())
+    return session, socket
+
+
+def sent_frames(socket):
+    return [base64.b64decode(m['media']['payload']) for m in socket.sent if m['event'] == 'media']
+
+
+@pytest.fixture
+def call(app):
+    customer = Customer(
+        business_name="Maple Dental",
+        email="office@mapledental.example",
+        deskringer_number="+15550100200",
+        greeting_message=GREETING,
+        call_mode='stream',
+        faqs=[{'question': "Do you take walk-ins?", 'answer': "Yes, walk-ins are welcome any time."}]
+    )
+    db.session.add(customer)
+    db.session.flush()
+    call = Call(customer_id=customer.id, caller_phone="+15557654321", twilio_call_sid=CALL_SID, status='in_progress')
+    db.session.add(call)
+    db.session.commit()
+    return call
+
+
+def logs(call):
+    return [(log.speaker, log.message) for log in CallLog.query.filter_by(call_id=call.id).order_by(CallLog.id)]
+
+
+def test_greets_then_streams_reply_sentence_by_sentence(app, call):
+    client = StubOpenAI(
+        transcripts=["Can I book a cleaning for Friday?"],
+        replies=[["Sure", ", we have Friday", " at ten. Does that", " work for you?"]]
+    )
+    session, socket = run_session(app, client, lambda session: [
+        start(call.id), played(session), *utterance(), played(session), {'event': 'stop'}
+    ])
+
+    # Greeting, then each sentence through TTS as soon as it was complete
+    assert client.speech_inputs == [GREETING, "Sure, we have Friday at ten.", "Does that work for you?"]
+    assert sent_frames(socket) == tone_frames(0) + tone_frames(1) + tone_frames(2)
+    assert all(m['streamSid'] == STREAM_SID for m in socket.sent)
+    assert [m['event'] for m in socket.sent].count('mark') == 3
+    assert not any(m['event'] == 'clear' for m in socket.sent)
+
+    request = client.chat_requests[0]
+    assert request['stream'] is True
+    assert request['messages'][-1] == {'role': 'user', 'content': "Can I book a cleaning for Friday?"}
+
+    db.session.expire_all()
+    assert logs(call) == [
+        ('caller', "Can I book a cleaning for Friday?"),
+        ('ai', "Sure, we have Friday at ten. Does that work for you?")
+    ]
+    assert db.session.get(Call, call.id).get_transcript() == (
+        "Caller: Can I book a cleaning for Friday?\nAI: Sure, we have Friday at ten. Does that work for you?"
+    )
+    assert Job.query.filter_by(job_type='update_call_summary').count() == 1
+
+
+def test_faq_answered_without_the_model(app, call):
+    client = StubOpenAI(transcripts=["Do you take walk-ins?"])
+    session, socket = run_session(app, client, lambda session: [
+        start(call.id), played(session), *utterance(), played(session), {'event': 'stop'}
+    ])
+
+    assert client.chat_requests == []
+    assert client.speech_inputs == [GREETING, "Yes, walk-ins are welcome any time."]
+    assert sent_frames(socket) == tone_frames(0) + tone_frames(1)
+    db.session.expire_all()
+    assert logs(call) == [('caller', "Do you take walk-ins?"), ('ai', "Yes, walk-ins are welcome any time.")]
+
+
+def test_repeated_greeting_comes_from_the_tts_cache(app, call):
+    client = StubOpenAI()
+    first_session, first = run_session(app, client, lambda session: [start(call.id), played(session), {'event': 'stop'}])
+    second_session, second = run_session(app, client, lambda session: [start(call.id), played(session), {'event': 'stop'}])
+
+    assert client.speech_inputs == [GREETING]
+    assert sent_frames(second) == sent_frames(first) == tone_frames(0)
+
+
+def test_barge_in_clears_playback(app, call):
+    client = StubOpenAI(transcripts=["Sorry, is this Maple Dental?"], replies=[["Yes it is!"]])
+
+    def script(session):
+        async def greeted():
+            # Greeting sent but its mark not played yet - Twilio is still talking
+            while not session._pending_marks:
+                await asyncio.sleep(0.01)
+            return
+            yield
+        return [start(call.id), greeted, *utterance(), played(session), {'event': 'stop'}]
+
+    session, socket = run_session(app, client, script)
+
+    events = [m['event'] for m in socket.sent]
+    assert events.count('clear') == 1
+    assert events.index('clear') > events.index('mark')
+    db.session.expire_all()
+    assert logs(call) == [('caller', "Sorry, is this Maple Dental?"), ('ai', "Yes it is!")]
+
+
+def test_model_error_mid_reply_falls_back(app, call):
+    client = StubOpenAI(
+        transcripts=["Can I book a cleaning for Friday?"],
+        replies=[["Sure, let me check.", " We have", RuntimeError("connection reset")]]
+    )
+    session, socket = run_session(app, client, lambda session: [
+        start(call.id), played(session), *utterance(), played(session), {'event': 'stop'}
+    ])
+
+    assert client.speech_inputs == [GREETING, "Sure, let me check.", FALLBACK_RESPONSE]
+    db.session.expire_all()
+    assert logs(call) == [
+        ('caller', "Can I book a cleaning for Friday?"),
+        ('ai', f"Sure, let me check. {FALLBACK_RESPONSE}")
+    ]
+
+
+def test_transfer_without_forward_number_hangs_up(app, call, monkeypatch):
+    redirects = []
+    monkeypatch.setattr(media_stream, 'redirect_call', lambda call_sid, twiml: redirects.append((call_sid, twiml)))
+    client = StubOpenAI(transcripts=["Can I talk to a person?"], replies=['transfer'])
+
+    session, socket = run_session(app, client, lambda session: [
+        start(call.id), played(session), *utterance(), played(session), {'event': 'stop'}
+    ])
+
+    assert client.speech_inputs == [GREETING, TRANSFER_UNAVAILABLE_MESSAGE]
+    assert redirects == [(CALL_SID, '<Response><Hangup/></Response>')]
+    db.session.expire_all()
+    assert logs(call) == [('caller', "Can I talk to a person?"), ('ai', TRANSFER_UNAVAILABLE_MESSAGE)]
+
+
+def test_stream_for_another_call_sid_is_closed(app, call):
+    client = StubOpenAI()
+    session, socket = run_session(app, client, lambda session: [
+        start(call.id, call_sid="CAsomeoneelse"), *utterance(), {'event': 'stop'}
+    ])
+
+    assert socket.closed
+    assert socket.sent == []
+    assert client.speech_inputs == []
+    assert logs(call) == []
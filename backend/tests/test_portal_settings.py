@@ -0,0 +1,23 @@
+"""
+Portal settings: an invalid request changes nothing
+"""
+from flask_jwt_extended import create_access_token
+from models import db, Customer
+
+
+def test_invalid_timezone_leaves_the_customer_unchanged(app):
+    customer = Customer(business_name="Maple Dental", email="office@mapledental.example", timezone='America/Chicago')
+    db.session.add(customer)
+    db.session.commit()
+    token = create_access_token(identity=str(customer.id), additional_claims={'type': 'customer'})
+
+    response = app.test_client().put('/api/portal/settings', headers={'Authorization': f"Bearer {token}"}, json={
+        'business_name': "Maple Family Dental", 'timezone': 'Mars/Olympus_Mons'
+    })
+    assert response.status_code == 400
+
+    # The request's session is gone - this reads what was committed
+    db.session.expire_all()
+    customer = db.session.get(Customer, customer.id)
+    assert customer.business_name == "Maple Dental"
+    assert customer.timezone == 'America/Chicago'
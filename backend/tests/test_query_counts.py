@@ -0,0 +1,79 @@
+"""
+Query counts: listing endpoints must not issue more SQL for bigger pages
+
+Each endpoint is called through the test client with a small and a large
+page. A statement count that grows with the page size means a per-row lazy
+load (N+1) crept back in - e.g. call.customer.business_name in an admin
+listing.
+"""
+from datetime import datetime, timedelta
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from models import db, Admin, Call, Customer
+from services.call_stats import rebuild_daily_stats
+
+SMALL_PAGE = 2
+LARGE_PAGE = 40
+
+
+@pytest.fixture
+def tokens(app):
+    admin = Admin(email="admin@example.com", name="Admin")
+    admin.set_password("secret")
+    db.session.add(admin)
+
+    customers = [Customer(business_name=f"Business {i}", email=f"owner{i}@example.com") for i in range(LARGE_PAGE)]
+    db.session.add_all(customers)
+    db.session.flush()
+
+    now = datetime.utcnow()
+    for i in range(LARGE_PAGE * 3):
+        # The newest calls each belong to a different customer, so a per-row
+        # lazy load can't hide in the identity map; the rest fill the first
+        # customer's portal list
+        customer = customers[i] if i < LARGE_PAGE else customers[0]
+        db.session.add(Call(
+            customer_id=customer.id, caller_phone="+15550000000", status='completed',
+            summary="Test call", transcript="Caller: hi\nAI: hello", created_at=now - timedelta(minutes=i)
+        ))
+    db.session.commit()
+    rebuild_daily_stats()
+
+    return {
+        'admin': create_access_token(identity=str(admin.id)),
+        'customer': create_access_token(identity=str(customers[0].id), additional_claims={'type': 'customer'})
+    }
+
+
+def count_statements(client, url, token):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        response = client.get(url, headers={'Authorization': f"Bearer {token}"})
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    assert response.status_code == 200, response.get_data(as_text=True)[:200]
+    return len(statements)
+
+
+@pytest.mark.parametrize('url, role', [
+    ("/api/calls?admin_view=true&per_page={n}", 'admin'),
+    ("/api/calls/recent?admin_view=true&limit={n}", 'admin'),
+    ("/api/customers?per_page={n}", 'admin'),
+    ("/api/portal/calls?limit={n}", 'customer'),
+])
+def test_statement_count_does_not_grow_with_page_size(app, tokens, url, role):
+    client = app.test_client()
+
+    # Warm per-process caches (routing table) so both runs see the same state
+    count_statements(client, url.format(n=SMALL_PAGE), tokens[role])
+    small = count_statements(client, url.format(n=SMALL_PAGE), tokens[role])
+    large = count_statements(client, url.format(n=LARGE_PAGE), tokens[role])
+
+    assert large <= small
@@ -0,0 +1,122 @@
+"""
+Query plans: the call list, stats and search queries use their indexes
+
+Runs EXPLAIN (Postgres) / EXPLAIN QUERY PLAN (SQLite) on the portal and
+admin queries and fails if a plan doesn't use one of the indexes declared in
+models.py - e.g. after a query change that wraps created_at in a function
+again. The calls table is seeded and analyzed first, so the planner picks
+by cost rather than by which of two equally good-looking indexes it saw
+first. On Postgres sequential scans are disabled too, so the small table
+still shows which index the planner can use.
+"""
+import random
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import func, text
+from models import db, Call, Customer
+from services.call_search import SEARCH_LANGUAGE
+from services.call_stats import call_totals_query, local_day_range
+
+CUSTOMER_ID = 1
+CUSTOMERS = 20
+CALLS = 4000
+
+
+@pytest.fixture(autouse=True)
+def analyzed_calls(app):
+    """A few thousand calls, most of them archived, with planner statistics"""
+    db.session.execute(Customer.__table__.insert(), [
+        {'id': i, 'business_name': f"Business {i}", 'email': f"owner{i}@example.com"} for i in range(1, CUSTOMERS + 1)
+    ])
+
+    now = datetime.utcnow()
+    rng = random.Random(7)
+    db.session.execute(Call.__table__.insert(), [{
+        'customer_id': rng.randint(1, CUSTOMERS),
+        'caller_phone': "+15550000000",
+        'status': 'completed',
+        'archived': rng.random() < 0.8,
+        'handled': rng.random() < 0.5,
+        'created_at': now - timedelta(minutes=i)
+    } for i in range(CALLS)])
+    db.session.commit()
+    db.session.execute(text("ANALYZE"))
+    db.session.commit()
+
+
+def explain(query):
+    """Plan text for an ORM query, on the current connection"""
+    connection = db.session.connection()
+    dialect = connection.dialect
+    compiled = query.statement.compile(dialect=dialect)
+
+    if dialect.name == 'postgresql':
+        connection.exec_driver_sql("SET enable_seqscan = off")
+        rows = connection.exec_driver_sql(f"EXPLAIN {compiled}", compiled.params).all()
+        return "\n".join(row[0] for row in rows)
+
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+    return "\n".join(str(row[-1]) for row in rows)
+
+
+def assert_uses_any(query, indexes):
+    plan = explain(query)
+    assert any(name in plan for name in indexes), f"none of {indexes} in plan:\n{plan}"
+
+
+def open_list():
+    return Call.query.filter_by(customer_id=CUSTOMER_ID, archived=False)
+
+
+def test_portal_list_unhandled(app):
+    assert_uses_any(
+        open_list().filter_by(handled=False).order_by(Call.created_at.desc()).limit(50),
+        ['ix_calls_customer_archived_handled_created']
+    )
+
+
+def test_portal_list_all_open(app):
+    assert_uses_any(
+        open_list().order_by(Call.created_at.desc()).limit(50),
+        ['ix_calls_customer_open_created', 'ix_calls_customer_archived_handled_created']
+    )
+
+
+def test_portal_calls_today(app):
+    today_start, today_end = local_day_range('America/Chicago')
+    assert_uses_any(
+        call_totals_query(CUSTOMER_ID, False, today_start, today_end),
+        ['ix_calls_customer_open_created', 'idx_calls_customer_created', 'ix_calls_customer_archived_handled_created']
+    )
+
+
+def test_admin_list_one_customer(app):
+    assert_uses_any(
+        Call.query.filter_by(customer_id=CUSTOMER_ID).order_by(Call.created_at.desc()).limit(50),
+        ['idx_calls_customer_created']
+    )
+
+
+def test_admin_stats_window(app):
+    now = datetime.utcnow()
+    assert_uses_any(call_totals_query(None, True, now - timedelta(hours=5), now), ['ix_calls_created_at'])
+
+
+@pytest.mark.postgres
+def test_portal_search(app):
+    query_ts = func.websearch_to_tsquery(SEARCH_LANGUAGE, 'kitchen leak')
+    assert_uses_any(
+        db.session.query(Call.id).filter(
+            Call.customer_id == CUSTOMER_ID, Call.archived == False, Call.search_vector.op('@@')(query_ts)
+        ),
+        ['ix_calls_customer_search']
+    )
+
+
+@pytest.mark.postgres
+def test_customer_typeahead(app):
+    assert_uses_any(
+        db.session.query(Customer.id).filter(Customer.search_text.like('%riverside%')),
+        ['ix_customers_search_text_trgm']
+    )
@@ -0,0 +1,110 @@
+"""
+Hanging up while a streamed Gather reply is still generating
+"""
+import threading
+from datetime import timedelta
+import time
+from types import SimpleNamespace
+import pytest
+from models import db, Call, CallLog, Customer, Job
+import services.call_jobs as call_jobs
+import services.reply_continuation as reply_continuation
+from services.job_queue import claim, run_job
+from services.reply_continuation import continue_reply
+
+CALL_SID = "CA0000000000000000000000000000gath"
+
+
+@pytest.fixture
+def call(app, monkeypatch):
+    monkeypatch.setattr(reply_continuation, 'prefetch_speech', lambda *texts: None)
+    monkeypatch.setattr(call_jobs, 'REPLY_RETRY_SECONDS', 0)
+    monkeypatch.setattr(call_jobs.NotificationService, 'generate_summary', lambda self, customer, call: "Wants Friday")
+
+    customer = Customer(business_name="Maple Dental", email="office@mapledental.example")
+    db.session.add(customer)
+    db.session.flush()
+    call = Call(customer_id=customer.id, caller_phone="+15557654321", twilio_call_sid=CALL_SID, status='in_progress')
+    db.session.add(call)
+    db.session.flush()
+    db.session.add(CallLog(call_id=call.id, speaker='caller', message="Can I come in Friday?"))
+    db.session.commit()
+    return call
+
+
+def caller_log_id(call):
+    return CallLog.query.filter_by(call_id=call.id, speaker='caller').one().id
+
+
+def hang_up(app):
+    response = app.test_client().post('/api/webhooks/twilio/status', data={
+        'CallSid': CALL_SID, 'CallStatus': 'completed', 'CallDuration': '42'
+    })
+    assert response.status_code == 200
+
+
+def run_post_call(timeout=5):
+    """Run the queued summarize_call job (as worker.py would) until it's done"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        claimed = claim(['summarize_call'])
+        if claimed is not None and run_job(claimed):
+            return
+        time.sleep(0.05)
+    raise AssertionError("summarize_call did not finish")
+
+
+def slow_sentences(*sentences):
+    for sentence in sentences:
+        time.sleep(0.2)
+        yield sentence
+
+
+def test_status_webhook_only_queues_the_post_call_job(app, call):
+    hang_up(app)
+    hang_up(app)  # Twilio may repeat the callback
+
+    call = db.session.get(Call, call.id)
+    assert call.status == 'completed'
+    assert call.transcript is None
+    assert Job.query.filter_by(job_type='summarize_call').count() == 1
+
+
+def test_post_call_job_waits_for_the_reply_streaming_on_this_worker(app, call):
+    state = SimpleNamespace(call_id=call.id, append_turn=lambda caller, ai: None)
+    continue_reply(state, caller_log_id(call), "Can I come in Friday?", "Sure.",
+                   slow_sentences("We have ten or two.", "Which works?"))
+
+    hang_up(app)
+    run_post_call()
+
+    call = db.session.get(Call, call.id)
+    assert call.transcript == "Caller: Can I come in Friday?\nAI: Sure. We have ten or two. Which works?"
+    assert call.summary == "Wants Friday"
+
+
+def test_post_call_job_waits_for_a_reply_recorded_by_another_worker(app, call):
+    call_id = call.id
+
+    def other_worker():
+        time.sleep(0.3)
+        with app.app_context():
+            reply_continuation.record_reply(call_id, "Sure, we have ten or two.")
+
+    thread = threading.Thread(target=other_worker)
+    thread.start()
+    hang_up(app)
+    run_post_call()
+    thread.join()
+
+    call = db.session.get(Call, call_id)
+    assert call.transcript == "Caller: Can I come in Friday?\nAI: Sure, we have ten or two."
+
+
+def test_post_call_job_gives_up_on_a_reply_that_never_came(app, call):
+    hang_up(app)
+    db.session.get(Call, call.id).ended_at -= timedelta(seconds=call_jobs.REPLY_GRACE_SECONDS)
+    db.session.commit()
+    run_post_call()
+
+    assert db.session.get(Call, call.id).transcript == "Caller: Can I come in Friday?"
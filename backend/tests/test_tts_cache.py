@@ -0,0 +1,82 @@
+"""
+TTS single-flight: one synthesis per phrase, unrelated phrases never wait
+"""
+import threading
+import time
+from types import SimpleNamespace
+from services.ai_service import AIService
+from services.tts_cache import TTSCache
+
+KEY = "a" * 64
+OTHER_KEY = "a" * 3 + "b" * 61  # Same leading hex chars
+
+
+def test_unrelated_key_does_not_wait_on_another_workers_synthesis(tmp_path):
+    worker, other_worker = TTSCache(str(tmp_path)), TTSCache(str(tmp_path))
+
+    with worker.single_flight(KEY) as flight:
+        assert flight.audio is None
+
+        started = time.monotonic()
+        with other_worker.single_flight(OTHER_KEY) as other_flight:
+            assert other_flight.audio is None
+        assert time.monotonic() - started < 1
+
+
+def test_same_key_waits_for_the_other_worker_and_reads_its_audio(tmp_path):
+    worker, other_worker = TTSCache(str(tmp_path)), TTSCache(str(tmp_path))
+    joined = []
+
+    def join():
+        with other_worker.single_flight(KEY) as flight:
+            joined.append(flight.audio)
+
+    with worker.single_flight(KEY) as flight:
+        thread = threading.Thread(target=join)
+        thread.start()
+        time.sleep(0.1)
+        assert joined == []
+        worker.put(KEY, b"audio")
+        flight.release()
+        thread.join(5)
+
+    assert joined == [b"audio"]
+
+
+class _SpeechResponse:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_bytes(self, chunk_size):
+        return iter(self.chunks)
+
+
+def test_stream_publishes_the_audio_before_the_reader_finishes(app):
+    from services.tts_cache import get_tts_cache
+
+    service = AIService.__new__(AIService)
+    service.client = SimpleNamespace(audio=SimpleNamespace(speech=SimpleNamespace(
+        with_streaming_response=SimpleNamespace(create=lambda **kwargs: _SpeechResponse([b"one", b"two", b"three"]))
+    )))
+    key = AIService.tts_key("Thanks for calling!")
+    cache = get_tts_cache()
+
+    audio_stream = service.stream_speech("Thanks for calling!")
+    assert next(audio_stream) == b"one"
+
+    # The reader is still on its first chunk - waiting requests already get the audio
+    deadline = time.monotonic() + 5
+    while cache.get(key) is None:
+        assert time.monotonic() < deadline, "audio not published"
+        time.sleep(0.01)
+    assert cache.get(key) == b"onetwothree"
+    with cache.single_flight(key) as flight:
+        assert flight.audio == b"onetwothree"
+
+    assert list(audio_stream) == [b"two", b"three"]
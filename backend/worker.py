@@ -0,0 +1,95 @@
+"""
+Background job worker (see services/job_queue.py)
+
+Runs post-call summaries and notifications queued by the Twilio status
+webhook. Run alongside the Flask API:
+
+    python worker.py                                 # every job type
+    python worker.py summarize_call                  # only some types
+    python worker.py send_call_email send_call_sms
+
+Each job type gets as many threads as its concurrency limit, so summaries
+and notifications drain in parallel. Several worker processes can run
+against the same database.
+"""
+import signal
+import sys
+import threading
+from app import app
+from models import db
+from services import call_jobs  # noqa: F401 - registers the job types
+from services.job_queue import (
+    JOB_POLL_INTERVAL, JOB_TYPES, claim, requeue_stale, run_job, worker_id
+)
+
+REAPER_INTERVAL = 60  # Seconds between stale-job sweeps
+
+stop = threading.Event()
+
+
+def work(job_type):
+    """Claim and run jobs of one type until stopped"""
+    with app.app_context():
+        locked_by = worker_id()
+        while not stop.is_set():
+            try:
+                claimed = claim([job_type], locked_by)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error claiming {job_type} job: {e}")
+                stop.wait(JOB_POLL_INTERVAL)
+                continue
+
+            if claimed is None:
+                stop.wait(JOB_POLL_INTERVAL)
+                continue
+
+            try:
+                run_job(claimed)
+            except Exception as e:
+                # Couldn't even record the outcome - the reaper re-queues it
+                db.session.rollback()
+                print(f"Error recording {job_type} job {claimed.id}: {e}")
+            finally:
+                db.session.remove()
+
+
+def main(job_types):
+    unknown = [name for name in job_types if name not in JOB_TYPES]
+    if unknown:
+        print(f"Unknown job type(s): {', '.join(unknown)}")
+        print(f"Available job types: {', '.join(sorted(JOB_TYPES))}")
+        sys.exit(1)
+
+    def shutdown(signum, frame):
+        print("Stopping - finishing running jobs...")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    threads = []
+    for name in job_types:
+        for _ in range(JOB_TYPES[name].concurrency):
+            thread = threading.Thread(target=work, args=(name,), daemon=True)
+            thread.start()
+            threads.append(thread)
+        print(f"Worker started: {name} x{JOB_TYPES[name].concurrency}")
+
+    with app.app_context():
+        while not stop.is_set():
+            try:
+                stale, pruned = requeue_stale()
+                if stale or pruned:
+                    print(f"Re-queued {stale} stale job(s), pruned {pruned} finished job(s)")
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error sweeping jobs: {e}")
+            stop.wait(REAPER_INTERVAL)
+
+    for thread in threads:
+        thread.join()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or sorted(JOB_TYPES))